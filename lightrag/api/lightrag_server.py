@@ -265,6 +265,7 @@ def create_app(args):
     embedding_func = EmbeddingFunc(
         embedding_dim=args.embedding_dim,
         max_token_size=args.max_embed_tokens,
+        model_name=f"{args.embedding_binding}:{args.embedding_model}",
         func=lambda texts: lollms_embed(
             texts,
             embed_model=args.embedding_model,
@@ -16,11 +16,8 @@ from ascii_colors import trace_exception
 router = APIRouter(tags=["query"], dependencies=[Depends(get_auth_dependency())])
 
 
-class QueryRequest(BaseModel):
-    query: str = Field(
-        min_length=1,
-        description="The query text",
-    )
+class QueryOptions(BaseModel):
+    """Query parameters shared by the single and batch query requests"""
 
     mode: Literal["local", "global", "hybrid", "naive", "mix"] = Field(
         default="hybrid",
@@ -88,11 +85,6 @@ class QueryRequest(BaseModel):
         description="Number of complete conversation turns (user-assistant pairs) to consider in the response context.",
     )
 
-    @field_validator("query", mode="after")
-    @classmethod
-    def query_strip_after(cls, query: str) -> str:
-        return query.strip()
-
     @field_validator("hl_keywords", mode="after")
     @classmethod
     def hl_keywords_strip_after(cls, hl_keywords: List[str] | None) -> List[str] | None:
@@ -124,7 +116,7 @@ class QueryRequest(BaseModel):
     def to_query_params(self, is_stream: bool) -> "QueryParam":
         """Converts a QueryRequest instance into a QueryParam instance."""
         # Use Pydantic's `.model_dump(exclude_none=True)` to remove None values automatically
-        request_data = self.model_dump(exclude_none=True, exclude={"query"})
+        request_data = self.model_dump(exclude_none=True, exclude={"query", "queries"})
 
         # Ensure `mode` and `stream` are set explicitly
         param = QueryParam(**request_data)
@@ -132,6 +124,33 @@ class QueryRequest(BaseModel):
         return param
 
 
+class QueryRequest(QueryOptions):
+    query: str = Field(
+        min_length=1,
+        description="The query text",
+    )
+
+    @field_validator("query", mode="after")
+    @classmethod
+    def query_strip_after(cls, query: str) -> str:
+        return query.strip()
+
+
+class QueryBatchRequest(QueryOptions):
+    queries: List[str] = Field(
+        min_length=1,
+        description="The query texts, answered with the same parameters",
+    )
+
+    @field_validator("queries", mode="after")
+    @classmethod
+    def queries_strip_after(cls, queries: List[str]) -> List[str]:
+        queries = [query.strip() for query in queries]
+        if not all(queries):
+            raise ValueError("Queries must not be empty.")
+        return queries
+
+
 class QueryResponse(BaseModel):
     response: str = Field(
         description="The generated response",
@@ -176,6 +195,51 @@ def create_query_routes(rag, api_key: Optional[str] = None, top_k: int = 60):
             trace_exception(e)
             raise HTTPException(status_code=500, detail=str(e))
 
+    @router.post("/query/batch", dependencies=[Depends(optional_api_key)])
+    async def query_text_batch(request: QueryBatchRequest):
+        """
+        Answer several queries with the same parameters in one request.
+
+        Duplicate queries are answered once. The keyword extraction, vector
+        searches and graph reads of the queries are batched, see
+        LightRAG.aquery_batch_stream.
+
+        Parameters:
+            request (QueryBatchRequest): The queries and the query parameters.
+
+        Returns:
+            StreamingResponse: One NDJSON line per distinct query as its answer completes,
+                       {"query": ..., "response": ...} or {"query": ..., "error": ...}.
+        """
+        try:
+            param = request.to_query_params(False)
+
+            from fastapi.responses import StreamingResponse
+
+            async def batch_generator():
+                async for query, response in rag.aquery_batch_stream(
+                    request.queries, param=param
+                ):
+                    if isinstance(response, Exception):
+                        line = {"query": query, "error": str(response)}
+                    else:
+                        line = {"query": query, "response": response}
+                    yield f"{json.dumps(line, ensure_ascii=False)}\n"
+
+            return StreamingResponse(
+                batch_generator(),
+                media_type="application/x-ndjson",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "Connection": "keep-alive",
+                    "Content-Type": "application/x-ndjson",
+                    "X-Accel-Buffering": "no",  # Ensure proper handling of streaming response when proxied by Nginx
+                },
+            )
+        except Exception as e:
+            trace_exception(e)
+            raise HTTPException(status_code=500, detail=str(e))
+
     @router.post("/query/stream", dependencies=[Depends(optional_api_key)])
     async def query_text_stream(request: QueryRequest):
         """
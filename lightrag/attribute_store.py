@@ -0,0 +1,501 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Iterable, final
+
+import numpy as np
+
+from .base import StorageNameSpace
+from .kg.shared_storage import get_storage_lock, get_update_flag, set_all_update_flags
+from .utils import logger
+
+ATTRIBUTE_COLUMNS = (
+    "current_price",
+    "original_price",
+    "discount_rate",
+    "rating_average",
+    "quantity_sold",
+)
+
+_COLUMN_LABELS = {
+    "current_price": "Current Price",
+    "original_price": "Original Price",
+    "discount_rate": "Discount Rate",
+    "rating_average": "Rating",
+    "quantity_sold": "Quantity Sold",
+}
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@final
+@dataclass
+class AttributeStore(StorageNameSpace):
+    """Columnar store of the numeric catalog attributes, keyed by book id.
+
+    Each book is a row holding its name, the id of its chunk and one float64
+    value per column of ATTRIBUTE_COLUMNS (NaN when unknown), so range
+    filters and sorts are vectorized over whole columns. The store is
+    persisted as <working_dir>/<namespace>.npz.
+
+    Workers share the file like the other file storages: a save happens
+    under the storage lock and sets the update flags of the other workers,
+    which reload the file before their next access. Books changed locally
+    since the last save are kept over the reloaded ones.
+    """
+
+    columns: tuple[str, ...] = field(default=ATTRIBUTE_COLUMNS)
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._file_name = os.path.join(working_dir, f"{self.namespace}.npz")
+        self._lock = asyncio.Lock()
+        self._reset()
+        # Book ids upserted or deleted since the last save
+        self._changed: set[str] = set()
+        self._storage_lock = None
+        self.storage_updated = None
+
+    def _reset(self) -> None:
+        self._rows: dict[str, int] = {}  # book id -> row
+        self._ids: list[str] = []
+        self._names: list[str] = []
+        self._chunk_ids: list[str] = []
+        self._values = np.empty((len(self.columns), 0), dtype=np.float64)
+
+    def _reserve(self, size: int) -> None:
+        capacity = self._values.shape[1]
+        if size <= capacity:
+            return
+        values = np.full((len(self.columns), max(size, 2 * capacity, 64)), np.nan)
+        values[:, :capacity] = self._values
+        self._values = values
+
+    async def initialize(self):
+        # Get the update flag for cross-process update notification
+        self.storage_updated = await get_update_flag(self.namespace)
+        # Get the storage lock for use in other methods
+        self._storage_lock = get_storage_lock()
+        async with self._lock:
+            self._load()
+
+    def _load(self) -> None:
+        self._reset()
+        if not os.path.exists(self._file_name):
+            return
+        try:
+            with np.load(self._file_name, allow_pickle=False) as stored:
+                ids = stored["ids"].tolist()
+                names = stored["names"].tolist()
+                chunk_ids = stored["chunk_ids"].tolist()
+                values = np.full((len(self.columns), len(ids)), np.nan)
+                for i, column in enumerate(self.columns):
+                    if column in stored:
+                        values[i] = stored[column]
+        except Exception as e:
+            logger.warning(f"Failed to load attribute store {self._file_name}: {e}")
+            return
+        self._ids, self._names, self._chunk_ids = ids, names, chunk_ids
+        self._rows = {id: row for row, id in enumerate(ids)}
+        self._values = values
+        logger.info(f"Load attribute store {self.namespace} with {len(ids)} books")
+
+    def _is_stale(self) -> bool:
+        # A manager Value in multiprocess mode, a plain bool otherwise
+        if hasattr(self.storage_updated, "value"):
+            return self.storage_updated.value
+        return bool(self.storage_updated)
+
+    def _reset_update_flag(self) -> None:
+        if hasattr(self.storage_updated, "value"):
+            self.storage_updated.value = False
+        else:
+            self.storage_updated = False
+
+    def _catch_up(self) -> None:
+        """Reload the file saved by another process, keeping the local changes"""
+        changes = {}
+        for book_id in self._changed:
+            row = self._rows.get(book_id)
+            changes[book_id] = None if row is None else (
+                self._names[row],
+                self._chunk_ids[row],
+                self._values[:, row].copy(),
+            )
+        self._load()
+        for book_id, change in changes.items():
+            if change is not None:
+                self._set_row(book_id, *change)
+            elif book_id in self._rows:
+                self._remove_row(self._rows[book_id])
+
+    async def _reload_if_stale(self) -> None:
+        """Called with self._lock held"""
+        if not self._is_stale():
+            return
+        async with self._storage_lock:
+            logger.info(
+                f"Process {os.getpid()} reloading {self.namespace} due to update by another process"
+            )
+            self._catch_up()
+            self._reset_update_flag()
+
+    def _set_row(
+        self, book_id: str, name: str, chunk_id: str, values: np.ndarray
+    ) -> None:
+        row = self._rows.get(book_id)
+        if row is None:
+            self._reserve(len(self._ids) + 1)
+            row = self._rows[book_id] = len(self._ids)
+            self._ids.append(book_id)
+            self._names.append("")
+            self._chunk_ids.append("")
+        self._names[row] = name
+        self._chunk_ids[row] = chunk_id
+        self._values[:, row] = values
+
+    async def upsert(self, records: dict[str, dict[str, Any]]) -> None:
+        """Insert or replace books, keyed by book id.
+
+        A record holds "name", "chunk_id" and any of the attribute columns.
+        """
+        if not records:
+            return
+        async with self._lock:
+            await self._reload_if_stale()
+            self._reserve(len(self._ids) + len(records))
+            for book_id, record in records.items():
+                self._set_row(
+                    book_id,
+                    str(record.get("name", "")),
+                    str(record.get("chunk_id", "")),
+                    np.array([_to_float(record.get(c)) for c in self.columns]),
+                )
+            self._changed.update(records)
+
+    async def delete_by_chunk_ids(self, chunk_ids: Iterable[str]) -> None:
+        chunk_ids = set(chunk_ids)
+        async with self._lock:
+            await self._reload_if_stale()
+            for row in range(len(self._ids) - 1, -1, -1):
+                if self._chunk_ids[row] in chunk_ids:
+                    self._changed.add(self._ids[row])
+                    self._remove_row(row)
+
+    def _remove_row(self, row: int) -> None:
+        # Move the last row into the freed one
+        last = len(self._ids) - 1
+        del self._rows[self._ids[row]]
+        if row != last:
+            self._ids[row] = self._ids[last]
+            self._names[row] = self._names[last]
+            self._chunk_ids[row] = self._chunk_ids[last]
+            self._values[:, row] = self._values[:, last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._names.pop()
+        self._chunk_ids.pop()
+        self._values[:, last] = np.nan
+
+    def _select(
+        self,
+        filters: dict[str, Any],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> np.ndarray:
+        size = len(self._ids)
+        mask = np.ones(size, dtype=bool)
+        for column, bounds in filters.items():
+            if column not in self.columns:
+                continue
+            low, high = bounds
+            values = self._values[self.columns.index(column), :size]
+            # NaN compares False, books without the attribute never match
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        rows = np.flatnonzero(mask)
+        if sort_by in self.columns:
+            keys = self._values[self.columns.index(sort_by), rows]
+            # argsort puts NaN last in both directions
+            rows = rows[np.argsort(-keys if descending else keys, kind="stable")]
+        if limit is not None:
+            rows = rows[:limit]
+        return rows
+
+    async def query(
+        self,
+        filters: dict[str, Any],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Books whose attributes fall in the given ranges.
+
+        Args:
+            filters: column -> (low, high), inclusive, None for an open bound.
+            sort_by: Column to sort by, NaN values last.
+            descending: Sort order.
+            limit: Maximum number of books returned.
+        """
+        async with self._lock:
+            await self._reload_if_stale()
+            rows = self._select(filters, sort_by, descending, limit)
+            return [
+                {
+                    "id": self._ids[row],
+                    "name": self._names[row],
+                    "chunk_id": self._chunk_ids[row],
+                    **{
+                        column: float(self._values[i, row])
+                        for i, column in enumerate(self.columns)
+                        if not np.isnan(self._values[i, row])
+                    },
+                }
+                for row in rows
+            ]
+
+    async def matching_chunk_ids(self, filters: dict[str, Any]) -> set[str]:
+        """Chunk ids of the books matching filters, to restrict retrieval to them"""
+        async with self._lock:
+            await self._reload_if_stale()
+            return {self._chunk_ids[row] for row in self._select(filters)} - {""}
+
+    async def index_done_callback(self) -> None:
+        async with self._lock:
+            if not self._changed:
+                return
+            async with self._storage_lock:
+                if self._is_stale():
+                    # Reload before writing, so the books saved by another
+                    # process are not overwritten
+                    self._catch_up()
+                size = len(self._ids)
+                arrays = {
+                    "ids": np.array(self._ids, dtype=str),
+                    "names": np.array(self._names, dtype=str),
+                    "chunk_ids": np.array(self._chunk_ids, dtype=str),
+                    **{
+                        column: self._values[i, :size].copy()
+                        for i, column in enumerate(self.columns)
+                    },
+                }
+                await asyncio.to_thread(self._write, arrays)
+                self._changed.clear()
+                # Notify other processes that data has been updated
+                await set_all_update_flags(self.namespace)
+                # Reset own update flag to avoid self-reloading
+                self._reset_update_flag()
+
+    def _write(self, arrays: dict[str, np.ndarray]) -> None:
+        tmp_file_name = self._file_name + ".tmp"
+        with open(tmp_file_name, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_file_name, self._file_name)
+
+    async def finalize(self):
+        await self.index_done_callback()
+
+    async def drop(self) -> None:
+        async with self._lock:
+            self._changed.update(self._ids)
+            self._reset()
+        await self.index_done_callback()
+
+
+@dataclass
+class FacetQuery:
+    """Attribute constraints parsed from a question"""
+
+    filters: dict[str, tuple[float | None, float | None]] = field(default_factory=dict)
+    sort_by: str | None = None
+    descending: bool = False
+    limit: int | None = None
+    pure: bool = False
+    """True when the question asks for nothing but the facets, and can be answered from the store alone"""
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics, keeping digits and punctuation"""
+    text = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+_NUMBER = r"(\d+(?:[.,]\d+)*)\s*(k|nghin|ngan|tr|trieu|m|vnd|d|dong|%|sao|stars?|diem)?(?!\w)"
+_UPPER = (
+    r"under|below|less than|cheaper than|at most|up to|no more than|"
+    r"duoi|nho hon|it hon|re hon|khong qua|toi da"
+)
+_LOWER = (
+    r"above|over|more than|greater than|higher than|at least|"
+    r"tren|lon hon|nhieu hon|cao hon|it nhat|toi thieu"
+)
+_BOUND = re.compile(rf"(?P<op>{_UPPER}|{_LOWER}|<=|>=|<|>)\s*(?:(?:gia|price)\s+)?{_NUMBER}")
+_RANGE = re.compile(
+    rf"(?:between|from|tu|khoang)\s+{_NUMBER}\s*(?:and|to|den|toi|-)\s*{_NUMBER}"
+)
+_LIMIT = re.compile(r"\btop\s+(\d+)\b|\b(\d+)\s+(?:cuon|quyen|books?)\b")
+_SORTS = (
+    (re.compile(r"cheapest|re nhat|gia thap nhat"), "current_price", False),
+    (re.compile(r"most expensive|dat nhat|gia cao nhat"), "current_price", True),
+    (
+        re.compile(r"best rated|highest rated|top rated|danh gia cao nhat|nhieu sao nhat"),
+        "rating_average",
+        True,
+    ),
+    (re.compile(r"best sell\w*|most sold|ban chay nhat|ban nhieu nhat"), "quantity_sold", True),
+    (
+        re.compile(r"biggest discount|highest discount|giam gia (?:nhieu|cao) nhat"),
+        "discount_rate",
+        True,
+    ),
+)
+_MONEY_UNITS = {"k", "nghin", "ngan", "tr", "trieu", "m", "vnd", "d", "dong"}
+_RATING_UNITS = {"sao", "star", "stars", "diem"}
+# Words naming the column of a number, whole words only: "ban" alone is also
+# "bạn", "bàn" or the end of "xuất bản"
+_SOLD_AFTER = re.compile(r"\s*(?:copies|sold|cuon|quyen|ban|da ban|luot ban)\b")
+_DISCOUNT_WORDS = re.compile(r"\b(?:discount\w*|giam)\b")
+_RATING_WORDS = re.compile(r"\b(?:rated|rating|ratings|danh gia)\b")
+_SOLD_WORDS = re.compile(
+    r"\b(?:sold|sells?|selling|sales|da ban|ban duoc|ban ra|ban chay|luot ban)\b"
+)
+_PRICE_WORDS = re.compile(r"\b(?:price[ds]?|pricing|costs?|costing|gia)\b")
+_MULTIPLIERS = {"k": 1e3, "nghin": 1e3, "ngan": 1e3, "tr": 1e6, "trieu": 1e6, "m": 1e6}
+# Words a pure facet question may contain besides the facets themselves
+_FILLER = set(
+    """
+    a an the of with and or in for to me show list find give which what are is
+    book books price priced cost costs costing rated rating ratings stars star
+    discount discounted sold copies vnd
+    sach cuon quyen nhung cac cho toi minh tim liet ke danh co la nao gi gia
+    duoc voi va hoac ban da luot sao diem giam giam gia danh gia
+    """.split()
+)
+
+
+def _parse_number(raw: str, unit: str | None) -> float:
+    if re.fullmatch(r"\d+(?:[.,]\d{3})+", raw):
+        # 100.000 or 1,000,000: thousands separators
+        value = float(re.sub(r"[.,]", "", raw))
+    else:
+        value = float(raw.replace(",", "."))
+    return value * _MULTIPLIERS.get(unit or "", 1.0)
+
+
+def _attribute_for(unit: str | None, context: str, after: str = "") -> str | None:
+    """Which column a number refers to, from its unit and the words around it.
+
+    A bare number without unit or keyword, as in "cho trẻ dưới 3 tuổi", is
+    not a facet.
+    """
+    if unit in _MONEY_UNITS:
+        return "current_price"
+    if unit == "%":
+        return "discount_rate"
+    if unit in _RATING_UNITS:
+        return "rating_average"
+    if _SOLD_AFTER.match(after):
+        return "quantity_sold"
+    if _DISCOUNT_WORDS.search(context):
+        return "discount_rate"
+    if _RATING_WORDS.search(context):
+        return "rating_average"
+    if _SOLD_WORDS.search(context):
+        return "quantity_sold"
+    if _PRICE_WORDS.search(context):
+        return "current_price"
+    return None
+
+
+def parse_facet_query(query: str) -> FacetQuery | None:
+    """Parse price, rating, discount and sales constraints from a question.
+
+    Understands English and Vietnamese phrasings such as "under 100k VND",
+    "rated above 4.5", "giảm giá trên 30%", "từ 50 đến 100 nghìn" or "bán
+    chạy nhất". Returns None when the question has no facet.
+    """
+    text = _fold(query)
+    facet = FacetQuery()
+    spans: list[tuple[int, int]] = []
+
+    def add(column: str | None, low: float | None, high: float | None) -> None:
+        if column is None:
+            return
+        old_low, old_high = facet.filters.get(column, (None, None))
+        facet.filters[column] = (
+            low if low is not None else old_low,
+            high if high is not None else old_high,
+        )
+
+    last_end = 0
+    for m in _RANGE.finditer(text):
+        unit = m.group(4) or m.group(2)
+        low = _parse_number(m.group(1), m.group(2) or m.group(4))
+        high = _parse_number(m.group(3), unit)
+        context = text[max(last_end, m.start() - 30) : m.start()]
+        add(_attribute_for(unit, context, text[m.end() :]), low, high)
+        spans.append(m.span())
+        last_end = m.end()
+    for m in _BOUND.finditer(text):
+        if any(start <= m.start() < end for start, end in spans):
+            continue
+        value = _parse_number(m.group(2), m.group(3))
+        context = text[max(0, m.start() - 30) : m.start()]
+        # Only the words since the previous facet describe this one
+        for start, end in spans:
+            if end <= m.start():
+                context = text[max(end, m.start() - 30) : m.start()]
+        column = _attribute_for(m.group(3), context, text[m.end() :])
+        if m.group("op") in ("<", "<=") or re.fullmatch(_UPPER, m.group("op")):
+            add(column, None, value)
+        else:
+            add(column, value, None)
+        spans.append(m.span())
+    for pattern, column, descending in _SORTS:
+        m = pattern.search(text)
+        if m:
+            facet.sort_by, facet.descending = column, descending
+            spans.append(m.span())
+            break
+    for m in _LIMIT.finditer(text):
+        # "trên 500 cuốn" is a bound, not a limit
+        if any(start < m.end() and m.start() < end for start, end in spans):
+            continue
+        facet.limit = int(m.group(1) or m.group(2))
+        spans.append(m.span())
+        break
+
+    if not facet.filters and facet.sort_by is None:
+        return None
+    rest = text
+    for start, end in sorted(spans, reverse=True):
+        rest = rest[:start] + " " + rest[end:]
+    words = re.findall(r"[a-z]+|\d+", rest)
+    facet.pure = all(w in _FILLER for w in words)
+    return facet
+
+
+def format_facet_answer(books: list[dict[str, Any]]) -> str:
+    """Render the books returned for a pure facet question as a markdown list"""
+    lines = []
+    for book in books:
+        details = ", ".join(
+            f"{_COLUMN_LABELS[column]}: {book[column]:g}"
+            for column in ATTRIBUTE_COLUMNS
+            if column in book
+        )
+        lines.append(f"- {book['name']} ({details})")
+    return "\n".join(lines)
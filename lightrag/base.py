@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+import asyncio
 from enum import Enum
+import heapq
 import os
 from dotenv import load_dotenv
 from dataclasses import dataclass, field
@@ -12,7 +14,7 @@ from typing import (
     TypeVar,
 )
 import numpy as np
-from .utils import EmbeddingFunc
+from .utils import EmbeddingFunc, edge_weight
 from .types import KnowledgeGraph
 
 load_dotenv()
@@ -81,6 +83,40 @@ class QueryParam:
     history_turns: int = 3
     """Number of complete conversation turns (user-assistant pairs) to consider in the response context."""
 
+    nprobe: int | None = None
+    """IVF cells probed by approximate vector indexes. None uses the storage default."""
+
+    ef_search: int | None = None
+    """HNSW search depth of approximate vector indexes. None uses the storage default."""
+
+    speculative_retrieval: bool = (
+        os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+    )
+    """If True, search entities and relations with the raw query while the keywords are extracted, and merge those hits into the keyword search."""
+
+    chunk_retrieval: Literal["vector", "lexical", "hybrid"] = os.getenv(
+        "CHUNK_RETRIEVAL", "vector"
+    )
+    """How 'naive' and 'mix' modes search text chunks, when LightRAG.enable_lexical_index is set:
+    - "vector": Dense search in the chunks vector storage.
+    - "lexical": BM25 search in the lexical index, without an embedding call.
+    - "hybrid": Both, fused with reciprocal-rank fusion. An exact lexical match skips the dense search.
+    """
+
+    attribute_filter: dict[str, list[float | None]] = field(default_factory=dict)
+    """Ranges on the catalog attributes, e.g. {"current_price": [None, 100000], "rating_average": [4.5, None]}.
+    Merged with the facets parsed from the query when LightRAG.enable_attribute_store is set.
+    """
+
+    facet_fast_path: bool = os.getenv("FACET_FAST_PATH", "true").lower() == "true"
+    """If True, questions made only of facets are answered from the attribute store without the LLM."""
+
+    chunk_filter: set[str] | None = None
+    """Chunk ids retrieval is restricted to, set by LightRAG from the attribute filters. None for no restriction."""
+
+    max_edges_per_node: int = int(os.getenv("MAX_EDGES_PER_NODE", "200"))
+    """Maximum number of edges followed from each retrieved entity, best ranked by weight and degree. 0 for no limit."""
+
 
 @dataclass
 class StorageNameSpace(ABC):
@@ -122,6 +158,32 @@ class BaseVectorStorage(StorageNameSpace, ABC):
     async def delete_entity_relation(self, entity_name: str) -> None:
         """Delete relations for a given entity."""
 
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        """Get the stored vectors of several records, keyed by id. Missing records are omitted.
+
+        Backends keeping their vectors should override this; the default
+        returns nothing, so callers embed the content again.
+        """
+        return {}
+
+    async def query_batch(
+        self, queries: list[str], top_k: int, **kwargs: Any
+    ) -> list[list[dict[str, Any]]]:
+        """Query the vector storage with several queries, results in the order of queries.
+
+        The default embeds all queries in one call, so that each `query`
+        finds its embedding in the embedding cache, and runs the queries
+        concurrently. Backends that can score many queries at once override it.
+        """
+        if not queries:
+            return []
+        await self.embedding_func(list(dict.fromkeys(queries)))
+        return list(
+            await asyncio.gather(
+                *(self.query(query, top_k=top_k, **kwargs) for query in queries)
+            )
+        )
+
 
 @dataclass
 class BaseKVStorage(StorageNameSpace, ABC):
@@ -135,6 +197,15 @@ class BaseKVStorage(StorageNameSpace, ABC):
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         """Get values by ids"""
 
+    async def get_field_by_ids(self, ids: list[str], field: str) -> list[Any]:
+        """Get one field of the values by ids, None for missing values or fields.
+
+        Used to read small fields such as the chunk "tokens" without loading
+        the whole records; backends that can project a field should override it.
+        """
+        values = await self.get_by_ids(ids)
+        return [None if v is None else v.get(field) for v in values]
+
     @abstractmethod
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Return un-exist keys"""
@@ -208,6 +279,100 @@ class BaseGraphStorage(StorageNameSpace, ABC):
     ) -> KnowledgeGraph:
         """Retrieve a subgraph of the knowledge graph starting from a given node."""
 
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict[str, str]]:
+        """Get several nodes at once, keyed by node id. Missing nodes are omitted.
+
+        Backends that can answer in a single round trip should override this;
+        the default falls back to concurrent get_node calls.
+        """
+        nodes = await asyncio.gather(*[self.get_node(n) for n in node_ids])
+        return {n: data for n, data in zip(node_ids, nodes) if data is not None}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        """Get the degree of several nodes at once, keyed by node id."""
+        degrees = await asyncio.gather(*[self.node_degree(n) for n in node_ids])
+        return dict(zip(node_ids, degrees))
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict[str, str]]:
+        """Get several edges at once, keyed by (source, target). Missing edges are omitted."""
+        edges = await asyncio.gather(*[self.get_edge(s, t) for s, t in pairs])
+        return {
+            (s, t): data for (s, t), data in zip(pairs, edges) if data is not None
+        }
+
+    async def edge_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        """Get the degree of several edges at once, keyed by (source, target).
+
+        The edge degree is the sum of the degrees of both endpoints, so each
+        distinct endpoint is only looked up once.
+        """
+        node_ids = list({n for pair in pairs for n in pair})
+        degrees = await self.node_degrees_batch(node_ids)
+        return {
+            (s, t): degrees.get(s, 0) + degrees.get(t, 0) for s, t in pairs
+        }
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        """Get the edges of several nodes at once, keyed by node id."""
+        edges = await asyncio.gather(*[self.get_node_edges(n) for n in node_ids])
+        return {n: e or [] for n, e in zip(node_ids, edges)}
+
+    async def get_nodes_top_edges_batch(
+        self, node_ids: list[str], limit: int
+    ) -> dict[str, list[tuple[str, str]]]:
+        """Get at most `limit` edges of several nodes, keyed by node id.
+
+        The edges of a node over the limit are ranked by weight, then by the
+        degree of the other endpoint, best first. This bounds the fan-out of
+        hub nodes such as a price or a rating shared by thousands of books.
+        A limit <= 0 returns every edge. The default loads and ranks every
+        edge of a hub on each call, backends should override it to rank on
+        the server (Neo4j) or keep a precomputed ranking (NetworkX).
+        """
+        edges = await self.get_nodes_edges_batch(node_ids)
+        if limit <= 0:
+            return edges
+        hubs = {n: e for n, e in edges.items() if len(e) > limit}
+        if not hubs:
+            return edges
+        pairs = [e for hub_edges in hubs.values() for e in hub_edges]
+        edge_datas, degrees = await asyncio.gather(
+            self.get_edges_batch(pairs),
+            self.node_degrees_batch(list({t for _, t in pairs})),
+        )
+        for n, hub_edges in hubs.items():
+            edges[n] = heapq.nlargest(
+                limit,
+                hub_edges,
+                key=lambda e: (edge_weight(edge_datas.get(e)), degrees.get(e[1], 0)),
+            )
+        return edges
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """Upsert several nodes at once, keyed by node id.
+
+        Backends that can write a batch in a single round trip should override
+        this; the default falls back to concurrent upsert_node calls.
+        """
+        await asyncio.gather(*[self.upsert_node(n, data) for n, data in nodes.items()])
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """Upsert several edges at once, keyed by (source, target).
+
+        Both endpoints are expected to exist, upsert their nodes first.
+        """
+        await asyncio.gather(
+            *[self.upsert_edge(s, t, data) for (s, t), data in edges.items()]
+        )
+
 
 class DocStatus(str, Enum):
     """Document processing status"""
@@ -222,8 +387,6 @@ class DocStatus(str, Enum):
 class DocProcessingStatus:
     """Document processing status data structure"""
 
-    content: str
-    """Original content of the document"""
     content_summary: str
     """First 100 chars of document content, used for preview"""
     content_length: int
@@ -240,6 +403,8 @@ class DocProcessingStatus:
     """Error message if failed"""
     metadata: dict[str, Any] = field(default_factory=dict)
     """Additional metadata"""
+    content: str | None = None
+    """Original content of the document. Only set by legacy records, the content lives in full_docs"""
 
 
 @dataclass
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Iterable
+
+from .base import BaseGraphStorage
+from .utils import logger, normalize_search_text
+
+# Trie key holding the labels that end at a node, tokens are never empty
+_END = ""
+
+
+def _normalize_type(entity_type: Any) -> str:
+    return normalize_search_text(entity_type or "")
+
+
+class EntityLinker:
+    """Word trie over the graph node ids, to find entities named in a query.
+
+    Node ids and queries are compared after `normalize_search_text`, so
+    "Nguyễn Nhật Ánh" is found in "sach cua nguyen nhat anh". Only labels of
+    `entity_types` with at least `min_chars` characters that are not plain
+    numbers are indexed, which keeps prices, ratings or descriptions created
+    by the catalog import from producing spurious matches. A query only links
+    when the matched labels span at least `min_coverage` of its words: a
+    name dropped in a longer question does not say what the question is
+    about, and is left to keyword extraction.
+
+    The index is built from get_all_labels on first use and then kept up to
+    date with `refresh`, called for the entities a graph update touched.
+    """
+
+    def __init__(self, config: dict[str, Any]):
+        self.entity_types = {
+            _normalize_type(t) for t in config.get("entity_types") or () if t
+        }
+        self.min_chars = int(config.get("min_chars", 4))
+        self.max_tokens = int(config.get("max_tokens", 16))
+        self.min_coverage = float(config.get("min_coverage", 0.5))
+        self._root: dict[str, Any] = {}
+        self._labels: dict[str, tuple[str, ...]] = {}  # label -> its tokens
+        self._built = False
+        self._build_lock = asyncio.Lock()
+
+    def _accepts(self, label: str, entity_type: Any) -> tuple[str, ...] | None:
+        if self.entity_types and _normalize_type(entity_type) not in self.entity_types:
+            return None
+        tokens = tuple(normalize_search_text(label).split())
+        if not tokens or len(tokens) > self.max_tokens:
+            return None
+        if sum(len(t) for t in tokens) < self.min_chars:
+            return None
+        if all(t.isdigit() for t in tokens):
+            return None
+        return tokens
+
+    def add(self, label: str, entity_type: Any = None) -> None:
+        self.remove(label)
+        tokens = self._accepts(label, entity_type)
+        if tokens is None:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(_END, set()).add(label)
+        self._labels[label] = tokens
+
+    def remove(self, label: str) -> None:
+        tokens = self._labels.pop(label, None)
+        if tokens is None:
+            return
+        path = [self._root]
+        for token in tokens:
+            path.append(path[-1][token])
+        labels = path[-1][_END]
+        labels.discard(label)
+        if not labels:
+            del path[-1][_END]
+        # Prune the branches left empty
+        for parent, token, node in zip(
+            reversed(path[:-1]), reversed(tokens), reversed(path[1:])
+        ):
+            if node:
+                break
+            del parent[token]
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def match(self, text: str) -> list[str]:
+        """Labels mentioned in text, leftmost-longest and without overlaps.
+
+        [] when they span less than `min_coverage` of the words of text.
+        """
+        tokens = normalize_search_text(text).split()
+        found: list[str] = []
+        covered = 0
+        i = 0
+        while i < len(tokens):
+            node = self._root
+            best_end, best_labels = i, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if _END in node:
+                    best_end, best_labels = j + 1, node[_END]
+            if best_labels:
+                found.extend(sorted(best_labels))
+                covered += best_end - i
+                i = best_end
+            else:
+                i += 1
+        if covered < self.min_coverage * len(tokens):
+            return []
+        return list(dict.fromkeys(found))
+
+    async def _read_types(
+        self, graph: BaseGraphStorage, labels: list[str]
+    ) -> dict[str, Any]:
+        if not self.entity_types:
+            return {}
+        nodes = await graph.get_nodes_batch(labels)
+        return {label: (data or {}).get("entity_type") for label, data in nodes.items()}
+
+    async def ensure_built(self, graph: BaseGraphStorage, batch_size: int = 1000):
+        if self._built:
+            return
+        async with self._build_lock:
+            if self._built:
+                return
+            labels = await graph.get_all_labels()
+            for start in range(0, len(labels), batch_size):
+                batch = labels[start : start + batch_size]
+                types = await self._read_types(graph, batch)
+                for label in batch:
+                    self.add(label, types.get(label))
+            self._built = True
+            logger.info(
+                f"Entity linker indexed {len(self)} of {len(labels)} graph nodes"
+            )
+
+    async def refresh(self, graph: BaseGraphStorage, labels: Iterable[str]) -> None:
+        """Re-read the given nodes: index them if they exist, drop them otherwise"""
+        if not self._built:
+            # The first build reads the current graph anyway
+            return
+        labels = list(dict.fromkeys(labels))
+        if not labels:
+            return
+        nodes = await graph.get_nodes_batch(labels)
+        for label in labels:
+            data = nodes.get(label)
+            if data is None:
+                self.remove(label)
+            else:
+                self.add(label, data.get("entity_type"))
+
+
+# (working_dir, namespace) -> linker, per process
+_entity_linkers: dict[tuple[str, str], EntityLinker] = {}
+
+
+def get_entity_linker(graph: BaseGraphStorage | None) -> EntityLinker | None:
+    """Entity linker of a graph storage, None when entity_linker_config is not enabled"""
+    if graph is None:
+        return None
+    global_config = getattr(graph, "global_config", {})
+    config = global_config.get("entity_linker_config")
+    if not config or not config.get("enabled"):
+        return None
+    # Instances of the same namespace in two working dirs hold different graphs
+    key = (global_config.get("working_dir", ""), graph.namespace)
+    linker = _entity_linkers.get(key)
+    if linker is None:
+        linker = _entity_linkers[key] = EntityLinker(config)
+    return linker
+
+
+async def link_query_entities(graph: BaseGraphStorage, query: str) -> list[str]:
+    """Graph entities named in the query, [] when the linker is disabled"""
+    linker = get_entity_linker(graph)
+    if linker is None:
+        return []
+    try:
+        await linker.ensure_built(graph)
+    except Exception as e:
+        logger.warning(f"Failed to build the entity linker: {e}")
+        return []
+    return linker.match(query)
+
+
+async def refresh_entity_linker(
+    graph: BaseGraphStorage, entities: Iterable[str]
+) -> None:
+    """Bring the linker up to date after the given entities changed"""
+    linker = get_entity_linker(graph)
+    if linker is None:
+        return
+    try:
+        await linker.refresh(graph, entities)
+    except Exception as e:
+        logger.warning(f"Failed to refresh the entity linker: {e}")
@@ -20,6 +20,7 @@ from tenacity import (
 from lightrag.utils import logger
 
 from ..base import BaseGraphStorage
+from .degree_table import DegreeTable
 
 if sys.platform.startswith("win"):
     import asyncio.windows_events
@@ -86,6 +87,7 @@ class AGEStorage(BaseGraphStorage):
         connection_string = f"dbname='{DB}' user='{USER}' password='{PASSWORD}' host='{HOST}' port={PORT}"
 
         self._driver = AsyncConnectionPool(connection_string, open=False)
+        self._degree_table = DegreeTable(self._load_degrees, self.graph_name)
 
         return None
 
@@ -454,6 +456,27 @@ class AGEStorage(BaseGraphStorage):
         )
         return degrees
 
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        """Degrees served by the in-memory degree table, built on first use"""
+        return await self._degree_table.degrees([n.strip('"') for n in node_ids])
+
+    async def _load_degrees(self) -> dict[str, int]:
+        """Distinct neighbor count of every connected node, in one query"""
+        # DISTINCT stays out of RETURN, _wrap_query parses the fields after it
+        query = """
+                MATCH (n)-[]-(m)
+                WITH DISTINCT n, m
+                RETURN labels(n) AS node_labels, count(m) AS degree
+                """
+        degrees = {}
+        for record in await self._query(query):
+            for label in record["node_labels"]:
+                if label:
+                    degrees[AGEStorage._decode_graph_label(label)] = int(
+                        record["degree"]
+                    )
+        return degrees
+
     async def get_edge(
         self, source_node_id: str, target_node_id: str
     ) -> dict[str, str] | None:
@@ -572,9 +595,11 @@ class AGEStorage(BaseGraphStorage):
                 MATCH (source:`{src_label}`)
                 WITH source
                 MATCH (target:`{tgt_label}`)
+                OPTIONAL MATCH (source)-[old]-(target)
+                WITH source, target, count(old) AS existed
                 MERGE (source)-[r:DIRECTED]->(target)
                 SET r += {properties}
-                RETURN r
+                RETURN existed
                 """
         params = {
             "src_label": AGEStorage._encode_graph_label(source_node_label),
@@ -582,7 +607,12 @@ class AGEStorage(BaseGraphStorage):
             "properties": AGEStorage._format_properties(edge_properties),
         }
         try:
-            await self._query(query, **params)
+            async with self._degree_table.writing():
+                result = await self._query(query, **params)
+                # Edges linking the nodes in either direction before the
+                # MERGE, 0 when it created the first one
+                if result and not result[0]["existed"]:
+                    self._degree_table.add_edge(source_node_label, target_node_label)
             logger.debug(
                 "Upserted edge from '{%s}' to '{%s}' with properties: {%s}",
                 source_node_label,
@@ -626,7 +656,13 @@ class AGEStorage(BaseGraphStorage):
         """
         params = {"label": AGEStorage._encode_graph_label(entity_name_label)}
         try:
-            await self._query(query, **params)
+            async with self._degree_table.writing():
+                neighbors = []
+                if self._degree_table.built:
+                    edges = await self.get_node_edges(entity_name_label) or []
+                    neighbors = [t if s == entity_name_label else s for s, t in edges]
+                await self._query(query, **params)
+                self._degree_table.remove_node(entity_name_label, neighbors)
             logger.debug(f"Deleted node with label '{entity_name_label}'")
         except Exception as e:
             logger.error(f"Error during node deletion: {str(e)}")
@@ -660,7 +696,15 @@ class AGEStorage(BaseGraphStorage):
                 "tgt_label": AGEStorage._encode_graph_label(entity_name_label_target),
             }
             try:
-                await self._query(query, **params)
+                async with self._degree_table.writing():
+                    existed = self._degree_table.built and await self.has_edge(
+                        entity_name_label_source, entity_name_label_target
+                    )
+                    await self._query(query, **params)
+                    if existed:
+                        self._degree_table.remove_edge(
+                            entity_name_label_source, entity_name_label_target
+                        )
                 logger.debug(
                     f"Deleted edge from '{entity_name_label_source}' to '{entity_name_label_target}'"
                 )
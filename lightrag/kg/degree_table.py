@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+import numpy as np
+
+from lightrag.utils import logger
+
+DEGREE_TABLE_TTL = float(os.getenv("DEGREE_TABLE_TTL", 600))
+
+
+class DegreeTable:
+    """Node degrees of a remote graph, kept in memory for ranking.
+
+    Backends such as AGE or Gremlin answer each `node_degree` with a query,
+    so ranking the results of a retrieval costs one round trip per node.
+    The table interns node ids to slots of a compact int64 array, is built
+    from `load`, a single aggregate query of the backend returning the
+    degree of every connected node, and is then updated by the storage on
+    edge upserts and deletions, so degrees are served in bulk without any
+    query.
+
+    Degrees count the distinct neighbors of a node in both directions, like
+    the NetworkX and Neo4j backends. Updates made by other processes are
+    not seen, so the table is rebuilt once it is older than `ttl` seconds
+    (DEGREE_TABLE_TTL, 0 to never expire). Only the first build blocks a
+    read; later rebuilds run in the background while the current table
+    keeps serving.
+
+    The storage wraps each edge write and its update in `writing()`. A load
+    waits for the writes in flight and holds back new ones until it
+    returns, so every update is either in the loaded degrees or applied on
+    top of them, never both.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[dict[str, int]]],
+        name: str,
+        ttl: float = DEGREE_TABLE_TTL,
+    ):
+        self.ttl = ttl
+        self._load = load
+        self._name = name
+        self._slots: dict[str, int] = {}
+        self._free: list[int] = []
+        self._degrees = np.zeros(1024, dtype=np.int64)
+        self._built_at: float | None = None
+        self._build_lock = asyncio.Lock()
+        self._refresh: asyncio.Task | None = None
+        # Edge writes in flight, and whether a load holds back new ones
+        self._writes = asyncio.Condition()
+        self._writers = 0
+        self._loading = False
+
+    @property
+    def built(self) -> bool:
+        return self._built_at is not None
+
+    @property
+    def stale(self) -> bool:
+        return (
+            self.built
+            and bool(self.ttl)
+            and time.monotonic() - self._built_at >= self.ttl
+        )
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot(self, node_id: str) -> int:
+        slot = self._slots.get(node_id)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._slots)
+            if slot == len(self._degrees):
+                self._degrees = np.concatenate(
+                    [self._degrees, np.zeros_like(self._degrees)]
+                )
+        self._degrees[slot] = 0
+        self._slots[node_id] = slot
+        return slot
+
+    def _count_edge(self, src_id: str, tgt_id: str, delta: int) -> None:
+        for node_id in (src_id, tgt_id):
+            if delta > 0:
+                self._degrees[self._slot(node_id)] += 1
+                continue
+            slot = self._slots.get(node_id)
+            if slot is not None and self._degrees[slot] > 0:
+                self._degrees[slot] -= 1
+
+    def _drop_node(self, node_id: str, neighbors: tuple[str, ...]) -> None:
+        for neighbor in neighbors:
+            self._count_edge(node_id, neighbor, -1)
+        slot = self._slots.pop(node_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    @asynccontextmanager
+    async def writing(self) -> AsyncIterator[None]:
+        """Wrap an edge write and its update, so no load overlaps them"""
+        async with self._writes:
+            await self._writes.wait_for(lambda: not self._loading)
+            self._writers += 1
+        try:
+            yield
+        finally:
+            async with self._writes:
+                self._writers -= 1
+                self._writes.notify_all()
+
+    def add_edge(self, src_id: str, tgt_id: str) -> None:
+        """Count a new edge, the caller checks it did not exist"""
+        if self.built:
+            self._count_edge(src_id, tgt_id, 1)
+
+    def remove_edge(self, src_id: str, tgt_id: str) -> None:
+        """Uncount an edge, the caller checks it existed"""
+        if self.built:
+            self._count_edge(src_id, tgt_id, -1)
+
+    def remove_node(self, node_id: str, neighbors: Iterable[str]) -> None:
+        """Free the slot of a deleted node and uncount its edges"""
+        if self.built:
+            self._drop_node(node_id, tuple(set(neighbors) - {node_id}))
+
+    async def degrees(self, node_ids: list[str]) -> dict[str, int]:
+        """Degrees keyed by node id, 0 for unknown nodes.
+
+        The first call builds the table, a stale table is rebuilt in the
+        background and serves this call as it is.
+        """
+        if not self.built:
+            async with self._build_lock:
+                if not self.built:
+                    await self._build()
+        elif self.stale and self._refresh is None:
+            self._refresh = asyncio.create_task(self._refresh_in_background())
+        slots = np.fromiter(
+            (self._slots.get(n, -1) for n in node_ids),
+            dtype=np.int64,
+            count=len(node_ids),
+        )
+        values = np.where(slots >= 0, self._degrees[np.maximum(slots, 0)], 0)
+        return dict(zip(node_ids, values.tolist()))
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            async with self._build_lock:
+                await self._build()
+        except Exception as e:
+            # Keep serving the stale table, the next read retries
+            logger.warning(f"Rebuilding degree table of {self._name} failed: {e}")
+        finally:
+            self._refresh = None
+
+    async def _build(self) -> None:
+        start = time.monotonic()
+        async with self._writes:
+            self._loading = True
+            await self._writes.wait_for(lambda: not self._writers)
+        try:
+            degrees = await self._load()
+            self._slots = {}
+            self._free = []
+            self._degrees = np.zeros(max(1024, len(degrees)), dtype=np.int64)
+            for node_id, degree in degrees.items():
+                self._degrees[self._slot(node_id)] = degree
+            self._built_at = time.monotonic()
+        finally:
+            async with self._writes:
+                self._loading = False
+                self._writes.notify_all()
+        logger.info(
+            f"Built degree table of {self._name} with {len(self)} nodes "
+            f"in {time.monotonic() - start:.2f}s"
+        )
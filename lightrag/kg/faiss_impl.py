@@ -19,9 +19,10 @@ from .shared_storage import (
     get_storage_lock,
     get_update_flag,
     set_all_update_flags,
-    is_multiprocess,
 )
 
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
 
 @final
 @dataclass
@@ -29,6 +30,21 @@ class FaissVectorDBStorage(BaseVectorStorage):
     """
     A Faiss-based Vector DB Storage for LightRAG.
     Uses cosine similarity by storing normalized vectors in a Faiss index with inner product search.
+
+    The index type is chosen with `vector_db_storage_cls_kwargs` (or the
+    matching FAISS_* environment variables):
+
+    - index_type: "flat" (exact, default), "ivf_flat", "ivf_pq" or "hnsw"
+    - nlist: number of IVF cells (default 1024)
+    - pq_m / pq_nbits: PQ sub-quantizers and bits per code (default 16 / 8)
+    - hnsw_m / ef_construction: HNSW graph degree and build depth (default 32 / 200)
+    - nprobe / ef_search: default search breadth, overridable per query
+    - train_threshold: IVF indexes stay exact until the collection reaches this
+      size, then they are trained on the stored vectors (default 39 * nlist)
+
+    Vectors are kept in an IndexIDMap2 under stable int64 ids. HNSW cannot
+    remove vectors, so deletions there are tombstoned and the index is
+    rebuilt on save once tombstones exceed `tombstone_ratio` of the index.
     """
 
     def __post_init__(self):
@@ -41,6 +57,24 @@ class FaissVectorDBStorage(BaseVectorStorage):
             )
         self.cosine_better_than_threshold = cosine_threshold
 
+        def option(name: str, default: Any) -> Any:
+            return kwargs.get(name, os.getenv(f"FAISS_{name.upper()}", default))
+
+        self._index_type = str(option("index_type", "flat")).lower()
+        if self._index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unsupported Faiss index_type {self._index_type}, expected one of {INDEX_TYPES}"
+            )
+        self._nlist = int(option("nlist", 1024))
+        self._pq_m = int(option("pq_m", 16))
+        self._pq_nbits = int(option("pq_nbits", 8))
+        self._hnsw_m = int(option("hnsw_m", 32))
+        self._ef_construction = int(option("ef_construction", 200))
+        self._nprobe = int(option("nprobe", 16))
+        self._ef_search = int(option("ef_search", 64))
+        self._train_threshold = int(option("train_threshold", 39 * self._nlist))
+        self._tombstone_ratio = float(option("tombstone_ratio", 0.2))
+
         # Where to save index file if you want persistent storage
         self._faiss_index_file = os.path.join(
             self.global_config["working_dir"], f"faiss_index_{self.namespace}.index"
@@ -51,15 +85,18 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Embedding dimension (e.g. 768) must match your embedding function
         self._dim = self.embedding_func.embedding_dim
 
-        # Create an empty Faiss index for inner product (useful for normalized vectors = cosine similarity).
-        # If you have a large number of vectors, you might want IVF or other indexes.
-        # For demonstration, we use a simple IndexFlatIP.
-        self._index = faiss.IndexFlatIP(self._dim)
+        self._reset()
+        self._load_faiss_index()
+
+    def _reset(self):
+        self._index = self._new_index(0)
         # Keep a local store for metadata, IDs, etc.
         # Maps <int faiss_id> → metadata (including your original ID).
         self._id_to_meta = {}
-
-        self._load_faiss_index()
+        self._custom_id_to_fid = {}
+        # Faiss ids deleted from the metadata but still in an HNSW index
+        self._tombstones = set()
+        self._next_fid = 0
 
     async def initialize(self):
         """Initialize storage data"""
@@ -68,26 +105,114 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Get the storage lock for use in other methods
         self._storage_lock = get_storage_lock()
 
+    def _is_stale(self) -> bool:
+        # A manager Value in multiprocess mode, a plain bool otherwise
+        if hasattr(self.storage_updated, "value"):
+            return self.storage_updated.value
+        return self.storage_updated
+
+    def _reset_update_flag(self):
+        if hasattr(self.storage_updated, "value"):
+            self.storage_updated.value = False
+        else:
+            self.storage_updated = False
+
+    def _reload_if_stale(self):
+        """Reload the index if another process saved it, called with the lock held"""
+        if self._is_stale():
+            logger.info(
+                f"Process {os.getpid()} FAISS reloading {self.namespace} due to update by another process"
+            )
+            self._reset()
+            self._load_faiss_index()
+            self._reset_update_flag()
+
     async def _get_index(self):
         """Check if the shtorage should be reloaded"""
         # Acquire lock to prevent concurrent read and write
         async with self._storage_lock:
-            # Check if storage was updated by another process
-            if (is_multiprocess and self.storage_updated.value) or (
-                not is_multiprocess and self.storage_updated
-            ):
+            self._reload_if_stale()
+        return self._index
+
+    # --------------------------------------------------------------------------------
+    # Index construction
+    # --------------------------------------------------------------------------------
+
+    def _new_index(self, n_vectors: int):
+        """
+        Create an empty index for a collection of `n_vectors`.
+        IVF indexes fall back to an exact flat index below the training threshold.
+        """
+        if self._index_type == "hnsw":
+            base = faiss.index_factory(
+                self._dim, f"HNSW{self._hnsw_m},Flat", faiss.METRIC_INNER_PRODUCT
+            )
+            base.hnsw.efConstruction = self._ef_construction
+        elif self._index_type.startswith("ivf") and n_vectors >= self._train_threshold:
+            # Faiss wants about 39 training points per cell
+            nlist = max(1, min(self._nlist, n_vectors // 39))
+            codec = (
+                f"PQ{self._pq_m}x{self._pq_nbits}"
+                if self._index_type == "ivf_pq"
+                else "Flat"
+            )
+            base = faiss.index_factory(
+                self._dim, f"IVF{nlist},{codec}", faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            base = faiss.IndexFlatIP(self._dim)
+        return faiss.IndexIDMap2(base)
+
+    def _inner_index(self):
+        return faiss.downcast_index(self._index.index)
+
+    def _needs_training(self) -> bool:
+        return (
+            self._index_type.startswith("ivf")
+            and not isinstance(self._inner_index(), faiss.IndexIVF)
+            and len(self._id_to_meta) >= self._train_threshold
+        )
+
+    def _rebuild_index(self):
+        """
+        Rebuild the index from the stored vectors, training it if needed.
+        Drops the HNSW tombstones.
+        """
+        fids = np.fromiter(self._id_to_meta.keys(), dtype=np.int64)
+        vectors = np.array(
+            [meta["__vector__"] for meta in self._id_to_meta.values()],
+            dtype=np.float32,
+        ).reshape(-1, self._dim)
+        index = self._new_index(len(fids))
+        if len(fids):
+            if not index.is_trained:
                 logger.info(
-                    f"Process {os.getpid()} FAISS reloading {self.namespace} due to update by another process"
+                    f"Training Faiss {self._index_type} index for {self.namespace} on {len(fids)} vectors"
                 )
-                # Reload data
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
-                self._load_faiss_index()
-                if is_multiprocess:
-                    self.storage_updated.value = False
-                else:
-                    self.storage_updated = False
-        return self._index
+                index.train(vectors)
+            index.add_with_ids(vectors, fids)
+        self._index = index
+        self._tombstones = set()
+
+    def _remove_fids(self, fids: list[int]):
+        """Remove internal ids from the index, tombstoning them where Faiss cannot remove"""
+        if not fids:
+            return
+        if isinstance(self._inner_index(), faiss.IndexHNSW):
+            self._tombstones.update(fids)
+        else:
+            self._index.remove_ids(np.array(fids, dtype=np.int64))
+
+    def _apply_search_params(self, nprobe: int | None, ef_search: int | None):
+        inner = self._inner_index()
+        if isinstance(inner, faiss.IndexIVF):
+            inner.nprobe = nprobe or self._nprobe
+        elif isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = ef_search or self._ef_search
+
+    # --------------------------------------------------------------------------------
+    # Storage API
+    # --------------------------------------------------------------------------------
 
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         """
@@ -143,37 +268,51 @@ class FaissVectorDBStorage(BaseVectorStorage):
         embeddings = embeddings.astype(np.float32)
         faiss.normalize_L2(embeddings)
 
-        # Upsert logic:
-        # 1. Identify which vectors to remove if they exist
-        # 2. Remove them
-        # 3. Add the new vectors
-        existing_ids_to_remove = []
-        for meta, emb in zip(list_data, embeddings):
-            faiss_internal_id = self._find_faiss_id_by_custom_id(meta["__id__"])
-            if faiss_internal_id is not None:
-                existing_ids_to_remove.append(faiss_internal_id)
-
-        if existing_ids_to_remove:
-            await self._remove_faiss_ids(existing_ids_to_remove)
-
-        # Step 2: Add new vectors
-        index = await self._get_index()
-        start_idx = index.ntotal
-        index.add(embeddings)
-
-        # Step 3: Store metadata + vector for each new ID
-        for i, meta in enumerate(list_data):
-            fid = start_idx + i
-            # Store the raw vector so we can rebuild if something is removed
-            meta["__vector__"] = embeddings[i].tolist()
-            self._id_to_meta.update({fid: meta})
+        async with self._storage_lock:
+            self._reload_if_stale()
+
+            # Upsert logic:
+            # 1. Remove the vectors of the ids that already exist
+            existing_fids = []
+            for meta in list_data:
+                fid = self._custom_id_to_fid.pop(meta["__id__"], None)
+                if fid is not None:
+                    existing_fids.append(fid)
+                    self._id_to_meta.pop(fid, None)
+            self._remove_fids(existing_fids)
+
+            # 2. Add the new vectors under fresh ids
+            fids = np.arange(
+                self._next_fid, self._next_fid + len(list_data), dtype=np.int64
+            )
+            self._next_fid += len(list_data)
+            self._index.add_with_ids(embeddings, fids)
+
+            # 3. Store metadata + vector for each new ID
+            for fid, meta, emb in zip(fids.tolist(), list_data, embeddings):
+                # Store the raw vector so we can rebuild if something is removed
+                meta["__vector__"] = emb.tolist()
+                self._id_to_meta[fid] = meta
+                self._custom_id_to_fid[meta["__id__"]] = fid
+
+            # 4. Switch to the approximate index once the collection is large enough
+            if self._needs_training():
+                self._rebuild_index()
 
         logger.info(f"Upserted {len(list_data)} vectors into Faiss index.")
         return [m["__id__"] for m in list_data]
 
-    async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
+    async def query(
+        self,
+        query: str,
+        top_k: int,
+        nprobe: int | None = None,
+        ef_search: int | None = None,
+    ) -> list[dict[str, Any]]:
         """
         Search by a textual query; returns top_k results with their metadata + similarity distance.
+
+        nprobe (IVF) and ef_search (HNSW) override the configured search breadth.
         """
         embedding = await self.embedding_func([query])
         # embedding is shape (1, dim)
@@ -185,37 +324,46 @@ class FaissVectorDBStorage(BaseVectorStorage):
         )
 
         # Perform the similarity search
-        index = await self._get_index()
-        distances, indices = index.search(embedding, top_k)
-
-        distances = distances[0]
-        indices = indices[0]
-
-        results = []
-        for dist, idx in zip(distances, indices):
-            if idx == -1:
-                # Faiss returns -1 if no neighbor
-                continue
-
-            # Cosine similarity threshold
-            if dist < self.cosine_better_than_threshold:
-                continue
-
-            meta = self._id_to_meta.get(idx, {})
-            results.append(
-                {
-                    **meta,
-                    "id": meta.get("__id__"),
-                    "distance": float(dist),
-                    "created_at": meta.get("__created_at__"),
-                }
-            )
+        async with self._storage_lock:
+            self._reload_if_stale()
+            index = self._index
+            if index.ntotal == 0:
+                return []
+            self._apply_search_params(nprobe, ef_search)
+            # Over-fetch so tombstoned vectors do not shrink the result
+            k = min(top_k + len(self._tombstones), index.ntotal)
+            distances, indices = index.search(embedding, k)
+
+            results = []
+            for dist, idx in zip(distances[0], indices[0]):
+                if idx == -1:
+                    # Faiss returns -1 if no neighbor
+                    continue
+                meta = self._id_to_meta.get(int(idx))
+                if meta is None:
+                    continue
+
+                # Cosine similarity threshold
+                if dist < self.cosine_better_than_threshold:
+                    continue
+
+                results.append(
+                    {
+                        **{k: v for k, v in meta.items() if k != "__vector__"},
+                        "id": meta.get("__id__"),
+                        "distance": float(dist),
+                        "created_at": meta.get("__created_at__"),
+                    }
+                )
+                if len(results) >= top_k:
+                    break
 
         return results
 
     @property
-    def client_storage(self):
+    async def client_storage(self):
         # Return whatever structure LightRAG might need for debugging
+        await self._get_index()
         return {"data": list(self._id_to_meta.values())}
 
     async def delete(self, ids: list[str]):
@@ -223,14 +371,15 @@ class FaissVectorDBStorage(BaseVectorStorage):
         Delete vectors for the provided custom IDs.
         """
         logger.info(f"Deleting {len(ids)} vectors from {self.namespace}")
-        to_remove = []
-        for cid in ids:
-            fid = self._find_faiss_id_by_custom_id(cid)
-            if fid is not None:
-                to_remove.append(fid)
-
-        if to_remove:
-            await self._remove_faiss_ids(to_remove)
+        async with self._storage_lock:
+            self._reload_if_stale()
+            to_remove = []
+            for cid in ids:
+                fid = self._custom_id_to_fid.pop(cid, None)
+                if fid is not None:
+                    self._id_to_meta.pop(fid, None)
+                    to_remove.append(fid)
+            self._remove_fids(to_remove)
         logger.debug(
             f"Successfully deleted {len(to_remove)} vectors from {self.namespace}"
         )
@@ -245,58 +394,30 @@ class FaissVectorDBStorage(BaseVectorStorage):
         Delete relations for a given entity by scanning metadata.
         """
         logger.debug(f"Searching relations for entity {entity_name}")
-        relations = []
-        for fid, meta in self._id_to_meta.items():
-            if meta.get("src_id") == entity_name or meta.get("tgt_id") == entity_name:
-                relations.append(fid)
+        await self._get_index()
+        relations = [
+            meta["__id__"]
+            for meta in self._id_to_meta.values()
+            if meta.get("src_id") == entity_name or meta.get("tgt_id") == entity_name
+        ]
 
         logger.debug(f"Found {len(relations)} relations for {entity_name}")
         if relations:
-            await self._remove_faiss_ids(relations)
+            await self.delete(relations)
             logger.debug(f"Deleted {len(relations)} relations for {entity_name}")
 
     # --------------------------------------------------------------------------------
     # Internal helper methods
     # --------------------------------------------------------------------------------
 
-    def _find_faiss_id_by_custom_id(self, custom_id: str):
-        """
-        Return the Faiss internal ID for a given custom ID, or None if not found.
-        """
-        for fid, meta in self._id_to_meta.items():
-            if meta.get("__id__") == custom_id:
-                return fid
-        return None
-
-    async def _remove_faiss_ids(self, fid_list):
-        """
-        Remove a list of internal Faiss IDs from the index.
-        Because IndexFlatIP doesn't support 'removals',
-        we rebuild the index excluding those vectors.
-        """
-        keep_fids = [fid for fid in self._id_to_meta if fid not in fid_list]
-
-        # Rebuild the index
-        vectors_to_keep = []
-        new_id_to_meta = {}
-        for new_fid, old_fid in enumerate(keep_fids):
-            vec_meta = self._id_to_meta[old_fid]
-            vectors_to_keep.append(vec_meta["__vector__"])  # stored as list
-            new_id_to_meta[new_fid] = vec_meta
-
-        async with self._storage_lock:
-            # Re-init index
-            self._index = faiss.IndexFlatIP(self._dim)
-            if vectors_to_keep:
-                arr = np.array(vectors_to_keep, dtype=np.float32)
-                self._index.add(arr)
-
-            self._id_to_meta = new_id_to_meta
-
     def _save_faiss_index(self):
         """
         Save the current Faiss index + metadata to disk so it can persist across runs.
         """
+        if self._tombstones and len(self._tombstones) > self._tombstone_ratio * max(
+            self._index.ntotal, 1
+        ):
+            self._rebuild_index()
         faiss.write_index(self._index, self._faiss_index_file)
 
         # Save metadata dict to JSON. Convert all keys to strings for JSON storage.
@@ -307,7 +428,14 @@ class FaissVectorDBStorage(BaseVectorStorage):
             serializable_dict[str(fid)] = meta
 
         with open(self._meta_file, "w", encoding="utf-8") as f:
-            json.dump(serializable_dict, f)
+            json.dump(
+                {
+                    "tombstones": sorted(self._tombstones),
+                    "next_fid": self._next_fid,
+                    "data": serializable_dict,
+                },
+                f,
+            )
 
     def _load_faiss_index(self):
         """
@@ -320,16 +448,35 @@ class FaissVectorDBStorage(BaseVectorStorage):
 
         try:
             # Load the Faiss index
-            self._index = faiss.read_index(self._faiss_index_file)
+            index = faiss.read_index(self._faiss_index_file)
             # Load metadata
             with open(self._meta_file, "r", encoding="utf-8") as f:
-                stored_dict = json.load(f)
+                stored = json.load(f)
+            if "data" not in stored:
+                # Files written before the id map: the dict itself maps positions to metadata
+                stored = {"data": stored}
 
             # Convert string keys back to int
-            self._id_to_meta = {}
-            for fid_str, meta in stored_dict.items():
-                fid = int(fid_str)
-                self._id_to_meta[fid] = meta
+            self._id_to_meta = {
+                int(fid_str): meta for fid_str, meta in stored["data"].items()
+            }
+            self._custom_id_to_fid = {
+                meta["__id__"]: fid for fid, meta in self._id_to_meta.items()
+            }
+            self._tombstones = set(stored.get("tombstones", []))
+            self._next_fid = stored.get(
+                "next_fid", max(self._id_to_meta, default=-1) + 1
+            )
+
+            if isinstance(index, faiss.IndexIDMap2):
+                self._index = index
+            else:
+                logger.info(
+                    f"Converting Faiss index {self._faiss_index_file} to an id-mapped index"
+                )
+                self._rebuild_index()
+            if self._needs_training():
+                self._rebuild_index()
 
             logger.info(
                 f"Faiss index loaded with {self._index.ntotal} vectors from {self._faiss_index_file}"
@@ -337,35 +484,28 @@ class FaissVectorDBStorage(BaseVectorStorage):
         except Exception as e:
             logger.error(f"Failed to load Faiss index or metadata: {e}")
             logger.warning("Starting with an empty Faiss index.")
-            self._index = faiss.IndexFlatIP(self._dim)
-            self._id_to_meta = {}
+            self._reset()
 
     async def index_done_callback(self) -> None:
-        # Check if storage was updated by another process
-        if is_multiprocess and self.storage_updated.value:
-            # Storage was updated by another process, reload data instead of saving
-            logger.warning(
-                f"Storage for FAISS {self.namespace} was updated by another process, reloading..."
-            )
-            async with self._storage_lock:
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+        async with self._storage_lock:
+            # Check if storage was updated by another process
+            if self._is_stale():
+                # Storage was updated by another process, reload data instead of saving
+                logger.warning(
+                    f"Storage for FAISS {self.namespace} was updated by another process, reloading..."
+                )
+                self._reset()
                 self._load_faiss_index()
-                self.storage_updated.value = False
-            return False  # Return error
+                self._reset_update_flag()
+                return False  # Return error
 
-        # Acquire lock and perform persistence
-        async with self._storage_lock:
             try:
                 # Save data to disk
                 self._save_faiss_index()
                 # Notify other processes that data has been updated
                 await set_all_update_flags(self.namespace)
                 # Reset own update flag to avoid self-reloading
-                if is_multiprocess:
-                    self.storage_updated.value = False
-                else:
-                    self.storage_updated = False
+                self._reset_update_flag()
             except Exception as e:
                 logger.error(f"Error saving FAISS index for {self.namespace}: {e}")
                 return False  # Return error
@@ -381,6 +521,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         Returns:
             List of records with matching ID prefixes
         """
+        await self._get_index()
         matching_records = []
 
         # Search for records with IDs starting with the prefix
@@ -20,6 +20,7 @@ from lightrag.types import KnowledgeGraph, KnowledgeGraphNode, KnowledgeGraphEdg
 from lightrag.utils import logger
 
 from ..base import BaseGraphStorage
+from .degree_table import DegreeTable
 
 if not pm.is_installed("gremlinpython"):
     pm.install("gremlinpython")
@@ -71,6 +72,7 @@ class GremlinStorage(BaseGraphStorage):
             message_serializer=serializer.GraphSONSerializersV3d0(),
             transport_factory=lambda: AiohttpTransport(call_from_event_loop=True),
         )
+        self._degree_table = DegreeTable(self._load_degrees, namespace)
 
     def __post_init__(self):
         self._node_embed_algorithms = {
@@ -245,6 +247,23 @@ class GremlinStorage(BaseGraphStorage):
 
         return edge_count
 
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        """Degrees served by the in-memory degree table, built on first use"""
+        return await self._degree_table.degrees(node_ids)
+
+    async def _load_degrees(self) -> dict[str, int]:
+        """Distinct neighbor count of every connected node, in one query"""
+        query = f"""g
+                 .V().has('graph', {self.graph_name}).as('n')
+                 .both().has('graph', {self.graph_name}).as('m')
+                 .select('n', 'm').dedup()
+                 .select('n')
+                 .groupCount().by('entity_name')
+                 """
+        result = await self._query(query)
+        counts = result[0] if result else {}
+        return {name: int(count) for name, count in counts.items()}
+
     async def edge_degree(self, src_id: str, tgt_id: str) -> int:
         src_degree = await self.node_degree(src_id)
         trg_degree = await self.node_degree(tgt_id)
@@ -373,15 +392,22 @@ class GremlinStorage(BaseGraphStorage):
                  .has('entity_name', {source_node_name}).as('source')
                  .V().has('graph', {self.graph_name})
                  .has('entity_name', {target_node_name}).as('target')
-                 .coalesce(
-                      __.select('source').outE('DIRECTED').where(__.inV().as('target')),
-                      __.select('source').addE('DIRECTED').to(__.select('target'))
-                  )
-                  .property('graph', {self.graph_name})
-                 {edge_properties}
+                 .project('existed', 'edge')
+                    .by(__.select('source').both().where(eq('target')).count())
+                    .by(__.coalesce(
+                          __.select('source').outE('DIRECTED').where(__.inV().as('target')),
+                          __.select('source').addE('DIRECTED').to(__.select('target'))
+                      )
+                      .property('graph', {self.graph_name})
+                     {edge_properties})
                  """
         try:
-            await self._query(query)
+            async with self._degree_table.writing():
+                result = await self._query(query)
+                # Neighbors linked in either direction before the upsert, 0
+                # when it added the first edge between the nodes
+                if result and not result[0]["existed"]:
+                    self._degree_table.add_edge(source_node_id, target_node_id)
             logger.debug(
                 "Upserted edge from {%s} to {%s} with properties: {%s}",
                 source_node_name,
@@ -409,7 +435,13 @@ class GremlinStorage(BaseGraphStorage):
                  .drop()
                  """
         try:
-            await self._query(query)
+            async with self._degree_table.writing():
+                neighbors = []
+                if self._degree_table.built:
+                    edges = await self.get_node_edges(node_id) or []
+                    neighbors = [t if s == node_id else s for s, t in edges]
+                await self._query(query)
+                self._degree_table.remove_node(node_id, neighbors)
             logger.debug(
                 "{%s}: Deleted node with entity_name '%s'",
                 inspect.currentframe().f_code.co_name,
@@ -685,7 +717,13 @@ class GremlinStorage(BaseGraphStorage):
                      .drop()
                      """
             try:
-                await self._query(query)
+                async with self._degree_table.writing():
+                    existed = self._degree_table.built and await self.has_edge(
+                        source, target
+                    )
+                    await self._query(query)
+                    if existed:
+                        self._degree_table.remove_edge(source, target)
                 logger.debug(
                     "{%s}: Deleted edge from '%s' to '%s'",
                     inspect.currentframe().f_code.co_name,
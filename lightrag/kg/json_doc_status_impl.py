@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 import os
+import time
 from typing import Any, Union, final
 
 from lightrag.base import (
@@ -15,26 +16,49 @@ from lightrag.utils import (
 from .shared_storage import (
     get_namespace_data,
     get_storage_lock,
+    get_update_flag,
+    set_all_update_flags,
     try_initialize_namespace,
 )
 
 
+def _status_key(status: Any) -> str:
+    # DocStatus is a str Enum but hashes by name, normalize before indexing
+    return status.value if isinstance(status, DocStatus) else str(status)
+
+
 @final
 @dataclass
 class JsonDocStatusStorage(DocStatusStorage):
-    """JSON implementation of document status storage"""
+    """JSON implementation of document status storage
+
+    Records only hold status metadata; the document content lives in full_docs.
+    A per-process index by status keeps get_docs_by_status and
+    get_status_counts proportional to their result, and upserts are flushed
+    in batches (every `DOC_STATUS_FLUSH_BATCH` changed records or
+    `DOC_STATUS_FLUSH_INTERVAL` seconds, and on index_done_callback).
+    """
 
     def __post_init__(self):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
         self._storage_lock = get_storage_lock()
         self._data = None
+        self.storage_updated = None
+        self._status_index: dict[str, set[str]] = {}
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+        self._flush_batch_size = int(os.getenv("DOC_STATUS_FLUSH_BATCH", 50))
+        self._flush_interval = float(os.getenv("DOC_STATUS_FLUSH_INTERVAL", 5))
 
     async def initialize(self):
         """Initialize storage data"""
         # check need_init must before get_namespace_data
         need_init = try_initialize_namespace(self.namespace)
         self._data = await get_namespace_data(self.namespace)
+        # Other processes share the data but keep their own index, the flag
+        # tells them to rebuild it after this process changed a status
+        self.storage_updated = await get_update_flag(self.namespace)
         if need_init:
             loaded_data = load_json(self._file_name) or {}
             async with self._storage_lock:
@@ -42,6 +66,33 @@ class JsonDocStatusStorage(DocStatusStorage):
                 logger.info(
                     f"Loaded document status storage with {len(loaded_data)} records"
                 )
+        async with self._storage_lock:
+            self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        self._status_index = {status.value: set() for status in DocStatus}
+        for doc_id, doc in self._data.items():
+            self._status_index.setdefault(_status_key(doc["status"]), set()).add(
+                doc_id
+            )
+        self._reset_update_flag()
+
+    def _reset_update_flag(self) -> None:
+        # A manager Value in multiprocess mode, a plain bool otherwise
+        if hasattr(self.storage_updated, "value"):
+            self.storage_updated.value = False
+        else:
+            self.storage_updated = False
+
+    def _index_is_stale(self) -> bool:
+        if hasattr(self.storage_updated, "value"):
+            return self.storage_updated.value
+        return self.storage_updated
+
+    def _index_remove(self, doc_id: str) -> None:
+        old = self._data.get(doc_id)
+        if old is not None:
+            self._status_index.get(_status_key(old["status"]), set()).discard(doc_id)
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Return keys that should be processed (not in storage or not successfully processed)"""
@@ -59,10 +110,12 @@ class JsonDocStatusStorage(DocStatusStorage):
 
     async def get_status_counts(self) -> dict[str, int]:
         """Get counts of documents in each status"""
-        counts = {status.value: 0 for status in DocStatus}
         async with self._storage_lock:
-            for doc in self._data.values():
-                counts[doc["status"]] += 1
+            if self._index_is_stale():
+                self._rebuild_index()
+            counts = {status.value: 0 for status in DocStatus}
+            for status, doc_ids in self._status_index.items():
+                counts[status] = len(doc_ids)
         return counts
 
     async def get_docs_by_status(
@@ -71,26 +124,32 @@ class JsonDocStatusStorage(DocStatusStorage):
         """Get all documents with a specific status"""
         result = {}
         async with self._storage_lock:
-            for k, v in self._data.items():
-                if v["status"] == status.value:
-                    try:
-                        # Make a copy of the data to avoid modifying the original
-                        data = v.copy()
-                        # If content is missing, use content_summary as content
-                        if "content" not in data and "content_summary" in data:
-                            data["content"] = data["content_summary"]
-                        result[k] = DocProcessingStatus(**data)
-                    except KeyError as e:
-                        logger.error(f"Missing required field for document {k}: {e}")
-                        continue
+            if self._index_is_stale():
+                self._rebuild_index()
+            for k in self._status_index.get(status.value, ()):
+                v = self._data.get(k)
+                if v is None:
+                    continue
+                try:
+                    # Make a copy of the data to avoid modifying the original
+                    result[k] = DocProcessingStatus(**dict(v))
+                except (KeyError, TypeError) as e:
+                    logger.error(f"Missing required field for document {k}: {e}")
+                    continue
         return result
 
     async def index_done_callback(self) -> None:
         async with self._storage_lock:
-            data_dict = (
-                dict(self._data) if hasattr(self._data, "_getvalue") else self._data
-            )
-            write_json(data_dict, self._file_name)
+            if not self._dirty_count:
+                return
+            self._flush()
+
+    def _flush(self) -> None:
+        """Write the status file, must be called with the storage lock held"""
+        data_dict = dict(self._data) if hasattr(self._data, "_getvalue") else self._data
+        write_json(data_dict, self._file_name)
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
 
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         logger.info(f"Inserting {len(data)} to {self.namespace}")
@@ -98,8 +157,29 @@ class JsonDocStatusStorage(DocStatusStorage):
             return
 
         async with self._storage_lock:
-            self._data.update(data)
-        await self.index_done_callback()
+            if self._index_is_stale():
+                self._rebuild_index()
+            for doc_id, doc in data.items():
+                # Content is kept in full_docs only
+                doc = {k: v for k, v in doc.items() if k != "content"}
+                if "status" in doc:
+                    doc["status"] = _status_key(doc["status"])
+                self._index_remove(doc_id)
+                self._data[doc_id] = doc
+                self._status_index.setdefault(doc["status"], set()).add(doc_id)
+            self._dirty_count += len(data)
+            if (
+                self._dirty_count >= self._flush_batch_size
+                or time.monotonic() - self._last_flush >= self._flush_interval
+            ):
+                self._flush()
+            await self._notify_index_changed()
+
+    async def _notify_index_changed(self) -> None:
+        """Tell other processes to rebuild their index, called with the storage lock held"""
+        await set_all_update_flags(self.namespace)
+        # Our own index is already up to date
+        self._reset_update_flag()
 
     async def get_by_id(self, id: str) -> Union[dict[str, Any], None]:
         async with self._storage_lock:
@@ -108,10 +188,18 @@ class JsonDocStatusStorage(DocStatusStorage):
     async def delete(self, doc_ids: list[str]):
         async with self._storage_lock:
             for doc_id in doc_ids:
+                self._index_remove(doc_id)
                 self._data.pop(doc_id, None)
+            self._flush()
+            await self._notify_index_changed()
+
+    async def finalize(self):
         await self.index_done_callback()
 
     async def drop(self) -> None:
         """Drop the storage"""
         async with self._storage_lock:
             self._data.clear()
+            self._status_index = {status.value: set() for status in DocStatus}
+            self._flush()
+            await self._notify_index_changed()
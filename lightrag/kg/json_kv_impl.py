@@ -1,10 +1,13 @@
+import asyncio
+import json
 import os
 from dataclasses import dataclass
-from typing import Any, final
+from typing import Any, Union, final
 
 from lightrag.base import (
     BaseKVStorage,
 )
+from lightrag.namespace import NameSpace, is_namespace
 from lightrag.utils import (
     load_json,
     logger,
@@ -20,29 +23,211 @@ from .shared_storage import (
 @final
 @dataclass
 class JsonKVStorage(BaseKVStorage):
+    """Key-value storage persisted as a JSON file in the working directory.
+
+    Two persistence modes are supported, selected with
+    `kv_storage_cls_kwargs={"append_log": True}` or the `JSON_KV_APPEND_LOG`
+    environment variable:
+
+    - snapshot (default): every flush rewrites `kv_store_<namespace>.json`.
+    - append log: a flush only appends the changed keys as JSONL records to
+      `kv_store_<namespace>.log.jsonl`. The snapshot is rewritten in the
+      background once the log holds `compaction_threshold` records, and the
+      log is replayed on top of the snapshot at startup.
+
+    In both modes only keys touched since the last flush are tracked, so a
+    flush without changes does no I/O.
+    """
+
     def __post_init__(self):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
+        self._log_file_name = os.path.join(
+            working_dir, f"kv_store_{self.namespace}.log.jsonl"
+        )
+        # The log being folded into the snapshot by a running (or interrupted) compaction
+        self._compacting_file_name = self._log_file_name + ".compacting"
+
+        kwargs = self.global_config.get("kv_storage_cls_kwargs") or {}
+        self._append_log = bool(
+            kwargs.get(
+                "append_log",
+                os.getenv("JSON_KV_APPEND_LOG", "false").lower() == "true",
+            )
+        )
+        self._compaction_threshold = int(
+            kwargs.get(
+                "compaction_threshold",
+                os.getenv("JSON_KV_COMPACTION_THRESHOLD", 10000),
+            )
+        )
+        # The LLM cache stores {mode: {args_hash: entry}}; track it per entry
+        # so a new cache entry does not re-serialize the whole mode.
+        self._nested = is_namespace(
+            self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
+        )
+
         self._storage_lock = get_storage_lock()
         self._data = None
+        # mode -> write counter, shared by the workers (LLM cache only)
+        self._mode_versions = None
+        # key -> None (whole value changed) or set of changed sub keys
+        self._dirty: dict[str, set[str] | None] = {}
+        self._log_records = 0
+        self._compaction_task: asyncio.Task | None = None
 
     async def initialize(self):
         """Initialize storage data"""
         # check need_init must before get_namespace_data
         need_init = try_initialize_namespace(self.namespace)
         self._data = await get_namespace_data(self.namespace)
+        if self._nested:
+            self._mode_versions = await get_namespace_data(
+                f"{self.namespace}_mode_versions"
+            )
         if need_init:
             loaded_data = load_json(self._file_name) or {}
+            replayed = 0
+            for log_file in (self._compacting_file_name, self._log_file_name):
+                replayed += self._replay_log(log_file, loaded_data)
             async with self._storage_lock:
                 self._data.update(loaded_data)
-                logger.info(f"Load KV {self.namespace} with {len(loaded_data)} data")
+                self._log_records = replayed
+                logger.info(
+                    f"Load KV {self.namespace} with {len(loaded_data)} data"
+                    + (f" ({replayed} log records replayed)" if replayed else "")
+                )
+            if os.path.exists(self._compacting_file_name) or (
+                replayed and not self._append_log
+            ):
+                # Finish an interrupted compaction, or fold a log left by the
+                # append mode into the snapshot before falling back to it
+                await self._compact()
+
+    async def finalize(self):
+        """Flush pending changes and fold the log into the snapshot"""
+        await self.index_done_callback()
+        if self._compaction_task is not None:
+            await self._compaction_task
+        if self._append_log and self._log_records:
+            await self._compact()
+
+    @staticmethod
+    def _replay_log(file_name: str, data: dict[str, Any]) -> int:
+        """Apply the JSONL records of `file_name` to `data`, return the record count"""
+        if not os.path.exists(file_name):
+            return 0
+        count = 0
+        with open(file_name, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write at the tail of the log, ignore it
+                    logger.warning(f"Skipping corrupted record in {file_name}")
+                    continue
+                count += 1
+                key = record["k"]
+                if "s" in record:
+                    # data is freshly loaded and not shared yet, update in place
+                    value = data.setdefault(key, {})
+                    if record.get("d"):
+                        value.pop(record["s"], None)
+                    else:
+                        value[record["s"]] = record["v"]
+                elif record.get("d"):
+                    data.pop(key, None)
+                else:
+                    data[key] = record["v"]
+        return count
+
+    def _mark_dirty(self, key: str, sub_keys: list[str] | None = None) -> None:
+        if sub_keys is None:
+            self._dirty[key] = None
+        elif key not in self._dirty:
+            self._dirty[key] = set(sub_keys)
+        elif self._dirty[key] is not None:
+            self._dirty[key].update(sub_keys)
+
+    def _dirty_records(self) -> list[str]:
+        """Render the tracked changes as JSONL records from the current data"""
+        lines = []
+        for key, sub_keys in self._dirty.items():
+            value = self._data.get(key)
+            if sub_keys is None:
+                record = {"k": key, "d": 1} if value is None else {"k": key, "v": value}
+                lines.append(json.dumps(record, ensure_ascii=False))
+                continue
+            value = value or {}
+            for sub_key in sub_keys:
+                if sub_key in value:
+                    record = {"k": key, "s": sub_key, "v": value[sub_key]}
+                else:
+                    record = {"k": key, "s": sub_key, "d": 1}
+                lines.append(json.dumps(record, ensure_ascii=False))
+        return lines
 
     async def index_done_callback(self) -> None:
+        need_compaction = False
         async with self._storage_lock:
-            data_dict = (
-                dict(self._data) if hasattr(self._data, "_getvalue") else self._data
-            )
-            write_json(data_dict, self._file_name)
+            if not self._dirty:
+                return
+            if self._append_log:
+                lines = self._dirty_records()
+                with open(self._log_file_name, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                self._log_records += len(lines)
+                need_compaction = self._log_records >= self._compaction_threshold
+            else:
+                data_dict = (
+                    dict(self._data) if hasattr(self._data, "_getvalue") else self._data
+                )
+                write_json(data_dict, self._file_name)
+            self._dirty.clear()
+
+        if need_compaction and (
+            self._compaction_task is None or self._compaction_task.done()
+        ):
+            self._compaction_task = asyncio.create_task(self._compact())
+
+    async def _compact(self) -> None:
+        """Rewrite the snapshot and drop the log records it now contains.
+
+        The log is rotated under the storage lock so new records go to a fresh
+        log while the snapshot is written off the event loop.
+        """
+        async with self._storage_lock:
+            if os.path.exists(self._log_file_name):
+                if os.path.exists(self._compacting_file_name):
+                    # Leftover from an interrupted compaction: keep record order
+                    with open(self._log_file_name, encoding="utf-8") as src, open(
+                        self._compacting_file_name, "a", encoding="utf-8"
+                    ) as dst:
+                        dst.write(src.read())
+                    os.remove(self._log_file_name)
+                else:
+                    os.replace(self._log_file_name, self._compacting_file_name)
+            # Cache modes are updated in place, copy them for the writer thread;
+            # other values are only ever replaced, a shallow copy is enough
+            snapshot = {
+                key: dict(value) if self._nested and isinstance(value, dict) else value
+                for key, value in self._data.items()
+            }
+            self._log_records = 0
+
+        tmp_file_name = self._file_name + ".tmp"
+        try:
+            await asyncio.to_thread(write_json, snapshot, tmp_file_name)
+            os.replace(tmp_file_name, self._file_name)
+            if os.path.exists(self._compacting_file_name):
+                os.remove(self._compacting_file_name)
+            logger.info(f"Compacted KV {self.namespace} with {len(snapshot)} data")
+        except Exception as e:
+            # The rotated log is kept and replayed on next startup
+            logger.error(f"Error compacting KV {self.namespace}: {e}")
 
     async def get_all(self) -> dict[str, Any]:
         """Get all data from storage
@@ -57,6 +242,16 @@ class JsonKVStorage(BaseKVStorage):
         async with self._storage_lock:
             return self._data.get(id)
 
+    async def get_by_mode_and_id(self, mode: str, id: str) -> Union[dict, None]:
+        """Specifically for llm_response_cache."""
+        if not self._nested:
+            return None
+        async with self._storage_lock:
+            mode_cache = self._data.get(mode) or {}
+            if id in mode_cache:
+                return {id: mode_cache[id]}
+            return None
+
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         async with self._storage_lock:
             return [
@@ -68,6 +263,10 @@ class JsonKVStorage(BaseKVStorage):
                 for id in ids
             ]
 
+    async def get_field_by_ids(self, ids: list[str], field: str) -> list[Any]:
+        async with self._storage_lock:
+            return [(self._data.get(id) or {}).get(field) for id in ids]
+
     async def filter_keys(self, keys: set[str]) -> set[str]:
         async with self._storage_lock:
             return set(keys) - set(self._data.keys())
@@ -77,11 +276,67 @@ class JsonKVStorage(BaseKVStorage):
         if not data:
             return
         async with self._storage_lock:
+            if self._nested:
+                # Merge cache entries into their mode in place, _compact copies
+                # the modes it snapshots
+                for mode, entries in data.items():
+                    mode_cache = self._data.get(mode)
+                    if mode_cache is None:
+                        self._data[mode] = dict(entries)
+                    else:
+                        mode_cache.update(entries)
+                        self._store_mode(mode, mode_cache)
+                    self._mark_dirty(mode, list(entries))
+                    self._bump_mode_version(mode)
+                return
             left_data = {k: v for k, v in data.items() if k not in self._data}
             self._data.update(left_data)
+            for k in left_data:
+                self._mark_dirty(k)
+
+    async def delete_by_mode_and_ids(self, mode: str, ids: list[str]) -> None:
+        """Specifically for llm_response_cache, delete entries of a mode.
+
+        The change is persisted by the next index_done_callback.
+        """
+        if not self._nested:
+            return
+        async with self._storage_lock:
+            mode_cache = self._data.get(mode)
+            if not mode_cache:
+                return
+            removed = [id for id in ids if id in mode_cache]
+            if not removed:
+                return
+            for id in removed:
+                del mode_cache[id]
+            self._store_mode(mode, mode_cache)
+            self._mark_dirty(mode, removed)
+            self._bump_mode_version(mode)
+
+    async def get_mode_version(self, mode: str) -> int | None:
+        """Specifically for llm_response_cache, a counter bumped by every
+        write to the mode, so readers can tell a mode changed even when its
+        size did not"""
+        if not self._nested:
+            return None
+        async with self._storage_lock:
+            return self._mode_versions.get(mode, 0)
+
+    def _bump_mode_version(self, mode: str) -> None:
+        self._mode_versions[mode] = self._mode_versions.get(mode, 0) + 1
+
+    def _store_mode(self, mode: str, mode_cache: dict[str, Any]) -> None:
+        """Write back a mode updated in place, the shared dict of the
+        multiprocess mode hands out copies of its values"""
+        if hasattr(self._data, "_getvalue"):
+            self._data[mode] = mode_cache
 
     async def delete(self, ids: list[str]) -> None:
         async with self._storage_lock:
             for doc_id in ids:
-                self._data.pop(doc_id, None)
+                if self._data.pop(doc_id, None) is not None:
+                    self._mark_dirty(doc_id)
+                    if self._nested:
+                        self._bump_mode_version(doc_id)
         await self.index_done_callback()
@@ -0,0 +1,694 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, final
+
+import numpy as np
+
+from lightrag.base import BaseVectorStorage
+from lightrag.utils import compute_mdhash_id, logger
+
+from .shared_storage import (
+    get_storage_lock,
+    get_update_flag,
+    set_all_update_flags,
+)
+
+
+@final
+@dataclass
+class MemmapVectorDBStorage(BaseVectorStorage):
+    """Vector storage backed by a memory-mapped `.npy` matrix.
+
+    Files in the working directory:
+
+    - `vdb_<namespace>.vectors.npy`: normalized vectors, one row per record,
+      opened with `np.memmap` so every worker shares the same page cache and
+      a reload only re-maps the file.
+    - `vdb_<namespace>.meta.json`: snapshot of the metadata stored column by
+      column, aligned with the matrix rows.
+    - `vdb_<namespace>.meta.log.jsonl`: rows changed since the snapshot, one
+      JSON line per row. A save appends the changed rows instead of rewriting
+      every column, and a worker catching up with another one only reads the
+      lines appended since its last load. The snapshot is rewritten on
+      compaction, or once the log holds more lines than there are rows.
+
+    Upserted vectors are kept in memory until index_done_callback writes them
+    to the file under the storage lock, so workers never write the shared
+    mapping concurrently. Deleted rows are tombstoned and skipped by queries;
+    the matrix is compacted on save once tombstones exceed `compaction_ratio`
+    of the rows.
+    Queries scan the matrix in blocks of `query_block_size` rows, so resident
+    memory does not grow with the catalog.
+
+    Options (vector_db_storage_cls_kwargs, or environment variables):
+        vector_dtype: "float32" (default) or "float16" (MEMMAP_VECTOR_DTYPE)
+        query_block_size: rows scored per block (MEMMAP_QUERY_BLOCK_SIZE)
+        compaction_ratio: tombstone ratio triggering compaction (MEMMAP_COMPACTION_RATIO)
+    """
+
+    def __post_init__(self):
+        kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
+        cosine_threshold = kwargs.get("cosine_better_than_threshold")
+        if cosine_threshold is None:
+            raise ValueError(
+                "cosine_better_than_threshold must be specified in vector_db_storage_cls_kwargs"
+            )
+        self.cosine_better_than_threshold = cosine_threshold
+
+        self._dtype = np.dtype(
+            kwargs.get("vector_dtype", os.getenv("MEMMAP_VECTOR_DTYPE", "float32"))
+        )
+        if self._dtype not in (np.dtype(np.float32), np.dtype(np.float16)):
+            raise ValueError(f"Unsupported vector_dtype {self._dtype}")
+        self._query_block_size = int(
+            kwargs.get(
+                "query_block_size", os.getenv("MEMMAP_QUERY_BLOCK_SIZE", 65536)
+            )
+        )
+        self._compaction_ratio = float(
+            kwargs.get(
+                "compaction_ratio", os.getenv("MEMMAP_COMPACTION_RATIO", 0.25)
+            )
+        )
+
+        working_dir = self.global_config["working_dir"]
+        self._vectors_file_name = os.path.join(
+            working_dir, f"vdb_{self.namespace}.vectors.npy"
+        )
+        self._meta_file_name = os.path.join(
+            working_dir, f"vdb_{self.namespace}.meta.json"
+        )
+        self._meta_log_file_name = os.path.join(
+            working_dir, f"vdb_{self.namespace}.meta.log.jsonl"
+        )
+        self._max_batch_size = self.global_config["embedding_batch_num"]
+        self._dim = self.embedding_func.embedding_dim
+
+        self._storage_lock = None
+        self.storage_updated = None
+        self._load()
+
+    async def initialize(self):
+        """Initialize storage data"""
+        # Get the update flag for cross-process update notification
+        self.storage_updated = await get_update_flag(self.namespace)
+        # Get the storage lock for use in other methods
+        self._storage_lock = get_storage_lock()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _reset_state(self) -> None:
+        self._vectors: np.memmap | None = None
+        self._count = 0
+        # Rows valid in the vector file, later rows only live in _pending
+        self._persisted_count = 0
+        # row -> normalized vector not written to the file yet
+        self._pending: dict[int, np.ndarray] = {}
+        # Rows to skip when scoring the file, rebuilt after changes
+        self._skip_mask: np.ndarray | None = None
+        # Columns aligned with the matrix rows, a None id marks a tombstone
+        self._columns: dict[str, list[Any]] = {"__id__": [], "__created_at__": []}
+        self._id_to_row: dict[str, int] = {}
+        self._tombstones = 0
+        # Rows changed since the last save, appended to the metadata log
+        self._dirty_rows: set[int] = set()
+        # Snapshot generation, and bytes and lines of its log applied so far
+        self._generation = 0
+        self._log_offset = 0
+        self._log_records = 0
+
+    def _load(self) -> None:
+        """Map the vector file, read the metadata snapshot and replay its log"""
+        self._reset_state()
+        if not (
+            os.path.exists(self._meta_file_name)
+            and os.path.exists(self._vectors_file_name)
+        ):
+            return
+        try:
+            with open(self._meta_file_name, encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(self._vectors_file_name, mmap_mode="r+")
+        except Exception as e:
+            logger.error(f"Failed to load vector storage {self.namespace}: {e}")
+            return
+        if vectors.shape[1] != self._dim or vectors.dtype != self._dtype:
+            raise ValueError(
+                f"{self._vectors_file_name} holds {vectors.dtype} vectors of dim "
+                f"{vectors.shape[1]}, expected {self._dtype} of dim {self._dim}"
+            )
+        self._count = meta["count"]
+        self._columns = meta["columns"]
+        self._generation = meta.get("generation", 0)
+        ids = self._columns["__id__"]
+        self._id_to_row = {id_: row for row, id_ in enumerate(ids) if id_ is not None}
+        log = self._read_log(self._generation, 0)
+        if log is not None:
+            entries, self._log_offset = log
+            self._apply_log(entries)
+        if vectors.shape[0] < self._count:
+            logger.error(
+                f"{self._vectors_file_name} holds fewer rows than its metadata, ignoring it"
+            )
+            self._reset_state()
+            return
+        self._vectors = vectors
+        self._persisted_count = self._count
+        self._tombstones = self._count - len(self._id_to_row)
+        logger.info(
+            f"Mapped {len(self._id_to_row)} vectors for {self.namespace} "
+            f"({self._tombstones} deleted rows)"
+        )
+
+    def _read_log(
+        self, generation: int, offset: int
+    ) -> tuple[list[dict[str, Any]], int] | None:
+        """Committed log lines after byte `offset` and the offset past them.
+
+        None if there is no log for the snapshot `generation`, e.g. after
+        another process compacted the storage. Lines after the last count
+        line are left out, they belong to a save that did not complete.
+        """
+        try:
+            f = open(self._meta_log_file_name, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            header = f.readline()
+            try:
+                if json.loads(header).get("generation") != generation:
+                    return None
+            except ValueError:
+                return None
+            end = max(offset, len(header))
+            f.seek(end)
+            committed: list[dict[str, Any]] = []
+            entries: list[dict[str, Any]] = []
+            position = end
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                position += len(line)
+                if "count" in entries[-1]:
+                    committed.extend(entries)
+                    entries = []
+                    end = position
+        return committed, end
+
+    def _apply_log(self, entries: list[dict[str, Any]]) -> None:
+        """Apply log lines to the columns, a row without record is a tombstone"""
+        ids = self._columns["__id__"]
+        for entry in entries:
+            if "count" in entry:
+                self._count = entry["count"]
+                missing = self._count - len(ids)
+            else:
+                missing = entry["row"] + 1 - len(ids)
+            if missing > 0:
+                for values in self._columns.values():
+                    values.extend([None] * missing)
+            if "count" in entry:
+                continue
+            row, record = entry["row"], entry.get("record")
+            if ids[row] is not None:
+                self._id_to_row.pop(ids[row], None)
+            if record is None:
+                for values in self._columns.values():
+                    values[row] = None
+                continue
+            for name in record.keys() - self._columns.keys():
+                self._columns[name] = [None] * len(ids)
+            for name, values in self._columns.items():
+                values[row] = record.get(name)
+            self._id_to_row[record["__id__"]] = row
+        self._log_records += len(entries)
+
+    def _catch_up(self) -> None:
+        """Apply the saves of other processes, called with the lock held.
+
+        Only the log lines appended since the last load are read; a full load
+        is needed after a compaction, or if this process has unsaved changes
+        since they may clash with the rows saved by the other process.
+        """
+        if self._dirty_rows or self._pending or self._count != self._persisted_count:
+            self._load()
+            return
+        log = self._read_log(self._generation, self._log_offset)
+        if log is None:
+            self._load()
+            return
+        entries, self._log_offset = log
+        self._apply_log(entries)
+        try:
+            vectors = np.load(self._vectors_file_name, mmap_mode="r+")
+        except Exception as e:
+            logger.error(f"Failed to map vectors of {self.namespace}: {e}")
+            self._load()
+            return
+        if vectors.shape[0] < self._count:
+            self._load()
+            return
+        self._vectors = vectors
+        self._persisted_count = self._count
+        self._tombstones = self._count - len(self._id_to_row)
+        self._skip_mask = None
+
+    def _save_snapshot(self) -> None:
+        """Rewrite the metadata snapshot and start an empty log for it"""
+        self._generation += 1
+        tmp_file_name = self._meta_file_name + ".tmp"
+        with open(tmp_file_name, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "count": self._count,
+                    "dim": self._dim,
+                    "dtype": self._dtype.name,
+                    "generation": self._generation,
+                    "columns": self._columns,
+                },
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_file_name, self._meta_file_name)
+        header = json.dumps({"generation": self._generation}) + "\n"
+        tmp_file_name = self._meta_log_file_name + ".tmp"
+        with open(tmp_file_name, "w", encoding="utf-8") as f:
+            f.write(header)
+        os.replace(tmp_file_name, self._meta_log_file_name)
+        self._log_offset = len(header.encode("utf-8"))
+        self._log_records = 0
+        self._dirty_rows.clear()
+
+    def _save_meta(self) -> None:
+        """Append the rows changed since the last save to the metadata log"""
+        if not self._log_offset or self._log_records + len(
+            self._dirty_rows
+        ) > max(self._count, 1024):
+            self._save_snapshot()
+            return
+        if not self._dirty_rows:
+            return
+        lines = [
+            json.dumps(
+                {"row": row, "record": self._record(row) or None},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            for row in sorted(self._dirty_rows)
+        ]
+        lines.append(json.dumps({"count": self._count}))
+        with open(self._meta_log_file_name, "r+b") as f:
+            # Drop the tail of a save that did not complete
+            f.seek(self._log_offset)
+            f.truncate()
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            self._log_offset = f.tell()
+        self._log_records += len(lines)
+        self._dirty_rows.clear()
+
+    def _write_matrix(self, capacity: int, rows: list[int]) -> None:
+        """Replace the vector file with a new one of `capacity` rows starting with `rows` of the current one.
+
+        Rows are copied block by block, and the file is swapped in with
+        os.replace so other processes keep their mapping of the old file until
+        they reload.
+        """
+        tmp_file_name = self._vectors_file_name + ".tmp"
+        new_vectors = np.lib.format.open_memmap(
+            tmp_file_name, mode="w+", dtype=self._dtype, shape=(capacity, self._dim)
+        )
+        for start in range(0, len(rows), self._query_block_size):
+            block = rows[start : start + self._query_block_size]
+            new_vectors[start : start + len(block)] = self._vectors[block]
+        new_vectors.flush()
+        del new_vectors
+        os.replace(tmp_file_name, self._vectors_file_name)
+        self._vectors = np.load(self._vectors_file_name, mmap_mode="r+")
+
+    def _ensure_capacity(self, rows_needed: int) -> None:
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows_needed <= capacity:
+            return
+        new_capacity = max(rows_needed, capacity * 2, 1024)
+        self._write_matrix(new_capacity, list(range(self._persisted_count)))
+
+    def _compact(self) -> None:
+        """Drop tombstoned rows from the matrix and the metadata columns"""
+        ids = self._columns["__id__"]
+        live_rows = [row for row in range(self._count) if ids[row] is not None]
+        self._write_matrix(max(len(live_rows), 1024), live_rows)
+        self._columns = {
+            name: [values[row] for row in live_rows]
+            for name, values in self._columns.items()
+        }
+        self._count = len(live_rows)
+        self._persisted_count = self._count
+        self._skip_mask = None
+        self._id_to_row = {
+            id_: row for row, id_ in enumerate(self._columns["__id__"])
+        }
+        self._tombstones = 0
+        logger.info(f"Compacted {self.namespace} to {self._count} vectors")
+
+    # ------------------------------------------------------------------
+    # Cross-process updates
+    # ------------------------------------------------------------------
+
+    def _is_stale(self) -> bool:
+        # A manager Value in multiprocess mode, a plain bool otherwise
+        if hasattr(self.storage_updated, "value"):
+            return self.storage_updated.value
+        return self.storage_updated
+
+    def _reset_update_flag(self) -> None:
+        if hasattr(self.storage_updated, "value"):
+            self.storage_updated.value = False
+        else:
+            self.storage_updated = False
+
+    def _reload_if_stale(self) -> None:
+        """Re-map the files after another process saved them, called with the lock held"""
+        if self._is_stale():
+            logger.info(
+                f"Process {os.getpid()} reloading {self.namespace} due to update by another process"
+            )
+            self._catch_up()
+            self._reset_update_flag()
+
+    # ------------------------------------------------------------------
+    # Records
+    # ------------------------------------------------------------------
+
+    def _record(self, row: int) -> dict[str, Any]:
+        return {
+            name: values[row]
+            for name, values in self._columns.items()
+            if values[row] is not None
+        }
+
+    def _tombstone(self, row: int) -> None:
+        for values in self._columns.values():
+            values[row] = None
+        self._pending.pop(row, None)
+        self._dirty_rows.add(row)
+        self._tombstones += 1
+        self._skip_mask = None
+
+    def _get_skip_mask(self) -> np.ndarray | None:
+        """Tombstoned or pending rows of the file, None if every row is live"""
+        if not self._tombstones and not self._pending:
+            return None
+        if self._skip_mask is None:
+            ids = self._columns["__id__"]
+            mask = np.fromiter(
+                (ids[row] is None for row in range(self._persisted_count)),
+                dtype=bool,
+                count=self._persisted_count,
+            )
+            mask[[row for row in self._pending if row < self._persisted_count]] = True
+            self._skip_mask = mask
+        return self._skip_mask
+
+    def _write_pending(self) -> None:
+        """Write the pending vectors to the file, called with the lock held"""
+        if self._count == self._persisted_count and not self._pending:
+            return
+        self._ensure_capacity(self._count)
+        if self._pending:
+            rows = sorted(self._pending)
+            self._vectors[rows] = np.stack(
+                [self._pending[row] for row in rows]
+            ).astype(self._dtype)
+            self._vectors.flush()
+            self._pending.clear()
+        self._persisted_count = self._count
+        self._skip_mask = None
+
+    def _delete_ids(self, ids: list[str]) -> int:
+        deleted = 0
+        for id_ in ids:
+            row = self._id_to_row.pop(id_, None)
+            if row is not None:
+                self._tombstone(row)
+                deleted += 1
+        return deleted
+
+    async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
+        logger.info(f"Inserting {len(data)} to {self.namespace}")
+        if not data:
+            return
+
+        contents = [v["content"] for v in data.values()]
+        batches = [
+            contents[i : i + self._max_batch_size]
+            for i in range(0, len(contents), self._max_batch_size)
+        ]
+        # Execute embedding outside of lock to avoid long lock times
+        embeddings_list = await asyncio.gather(
+            *[self.embedding_func(batch) for batch in batches]
+        )
+        embeddings = np.concatenate(embeddings_list).astype(np.float32)
+        if len(embeddings) != len(data):
+            # sometimes the embedding is not returned correctly. just log it.
+            logger.error(
+                f"embedding is not 1-1 with data, {len(embeddings)} != {len(data)}"
+            )
+            return
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+
+        current_time = time.time()
+        async with self._storage_lock:
+            self._reload_if_stale()
+            for id_ in data:
+                if id_ not in self._id_to_row:
+                    self._id_to_row[id_] = self._count
+                    for values in self._columns.values():
+                        values.append(None)
+                    self._count += 1
+
+            rows = [self._id_to_row[k] for k in data]
+            for row, vector in zip(rows, embeddings):
+                self._pending[row] = vector
+            self._dirty_rows.update(rows)
+            self._skip_mask = None
+            for row, (k, v) in zip(rows, data.items()):
+                record = {
+                    "__id__": k,
+                    "__created_at__": current_time,
+                    **{k1: v1 for k1, v1 in v.items() if k1 in self.meta_fields},
+                }
+                for name in record.keys() - self._columns.keys():
+                    self._columns[name] = [None] * self._count
+                for name, values in self._columns.items():
+                    values[row] = record.get(name)
+
+    async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
+        # Execute embedding outside of lock to avoid long lock times
+        embedding = await self.embedding_func([query])
+        query_vector = np.asarray(embedding[0], dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm:
+            query_vector /= norm
+
+        async with self._storage_lock:
+            self._reload_if_stale()
+            if not self._id_to_row or top_k <= 0:
+                return []
+            # Snapshot what the scan reads. Saves swap the vector file instead
+            # of rewriting scored rows in place, and the skip mask is rebuilt
+            # rather than mutated, so the scan can run without the lock.
+            vectors = self._vectors
+            persisted_count = self._persisted_count
+            skip_mask = self._get_skip_mask()
+            pending = dict(self._pending)
+            ids = self._columns["__id__"]
+
+        best_rows, best_scores = await asyncio.to_thread(
+            self._scan,
+            query_vector,
+            top_k,
+            vectors,
+            persisted_count,
+            skip_mask,
+            pending,
+        )
+
+        order = np.argsort(-best_scores)
+        results = []
+        for row, score in zip(best_rows[order], best_scores[order]):
+            if score < self.cosine_better_than_threshold:
+                break
+            # Rows may have been deleted or compacted away during the scan
+            id_ = ids[int(row)]
+            current_row = None if id_ is None else self._id_to_row.get(id_)
+            if current_row is None:
+                continue
+            record = self._record(current_row)
+            results.append(
+                {
+                    **record,
+                    "id": record["__id__"],
+                    "distance": float(score),
+                    "created_at": record.get("__created_at__"),
+                }
+            )
+        return results
+
+    def _scan(
+        self,
+        query_vector: np.ndarray,
+        top_k: int,
+        vectors: np.memmap | None,
+        persisted_count: int,
+        skip_mask: np.ndarray | None,
+        pending: dict[int, np.ndarray],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Rows and scores of the `top_k` best matches, scanning the file by blocks"""
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        def merge(rows: np.ndarray, scores: np.ndarray) -> None:
+            nonlocal best_rows, best_scores
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            best_rows = np.concatenate([best_rows, rows[top]])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1)[:top_k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        for start in range(0, persisted_count, self._query_block_size):
+            end = min(start + self._query_block_size, persisted_count)
+            scores = vectors[start:end].astype(np.float32) @ query_vector
+            if skip_mask is not None:
+                scores[skip_mask[start:end]] = -np.inf
+            merge(np.arange(start, end), scores)
+        if pending:
+            merge(
+                np.fromiter(pending, dtype=np.int64),
+                np.stack(list(pending.values())) @ query_vector,
+            )
+        return best_rows, best_scores
+
+    async def get_vector_by_id(self, id: str) -> np.ndarray | None:
+        vector = (await self.get_vectors_by_ids([id])).get(id)
+        if vector is None:
+            logger.warning(f"[get_vector_by_id] ID {id} not found in vector DB")
+        return vector
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        async with self._storage_lock:
+            self._reload_if_stale()
+            result = {}
+            mapped = []
+            for id in dict.fromkeys(ids):
+                row = self._id_to_row.get(id)
+                if row is None:
+                    continue
+                if row in self._pending:
+                    result[id] = self._pending[row].copy()
+                else:
+                    mapped.append((id, row))
+            if mapped:
+                # One gather from the mapped file for all persisted rows
+                rows = np.fromiter((row for _, row in mapped), dtype=np.int64)
+                vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+                result.update(zip((id for id, _ in mapped), vectors))
+            return result
+
+    @property
+    async def client_storage(self):
+        async with self._storage_lock:
+            self._reload_if_stale()
+            return {
+                "data": [self._record(row) for row in self._id_to_row.values()]
+            }
+
+    async def delete(self, ids: list[str]):
+        """Delete vectors with specified IDs
+
+        Args:
+            ids: List of vector IDs to be deleted
+        """
+        async with self._storage_lock:
+            self._reload_if_stale()
+            deleted = self._delete_ids(ids)
+        logger.debug(f"Successfully deleted {deleted} vectors from {self.namespace}")
+
+    async def delete_entity(self, entity_name: str) -> None:
+        entity_id = compute_mdhash_id(entity_name, prefix="ent-")
+        logger.debug(f"Attempting to delete entity {entity_name} with ID {entity_id}")
+        await self.delete([entity_id])
+
+    async def delete_entity_relation(self, entity_name: str) -> None:
+        async with self._storage_lock:
+            self._reload_if_stale()
+            src_ids = self._columns.get("src_id", [])
+            tgt_ids = self._columns.get("tgt_id", [])
+            ids = self._columns["__id__"]
+            relation_ids = [
+                ids[row]
+                for row in range(min(len(src_ids), len(tgt_ids)))
+                if src_ids[row] == entity_name or tgt_ids[row] == entity_name
+            ]
+            deleted = self._delete_ids(relation_ids)
+        logger.debug(f"Deleted {deleted} relations for {entity_name}")
+
+    async def search_by_prefix(self, prefix: str) -> list[dict[str, Any]]:
+        """Search for records with IDs starting with a specific prefix.
+
+        Args:
+            prefix: The prefix to search for in record IDs
+
+        Returns:
+            List of records with matching ID prefixes
+        """
+        async with self._storage_lock:
+            self._reload_if_stale()
+            matching_records = [
+                {**self._record(row), "id": id_}
+                for id_, row in self._id_to_row.items()
+                if id_.startswith(prefix)
+            ]
+        logger.debug(f"Found {len(matching_records)} records with prefix '{prefix}'")
+        return matching_records
+
+    async def index_done_callback(self) -> bool:
+        """Flush the vectors and save the metadata columns"""
+        async with self._storage_lock:
+            if self._is_stale():
+                # Storage was updated by another process, reload data instead of saving
+                logger.warning(
+                    f"Storage for {self.namespace} was updated by another process, reloading..."
+                )
+                self._load()
+                self._reset_update_flag()
+                return False
+            try:
+                self._write_pending()
+                if self._vectors is None:
+                    return True
+                if self._tombstones > self._count * self._compaction_ratio:
+                    self._compact()
+                    self._save_snapshot()
+                else:
+                    self._save_meta()
+                # Notify other processes that data has been updated
+                await set_all_update_flags(self.namespace)
+                # Reset own update flag to avoid self-reloading
+                self._reset_update_flag()
+                return True
+            except Exception as e:
+                logger.error(f"Error saving data for {self.namespace}: {e}")
+                return False
@@ -1,4 +1,5 @@
 import os
+import re
 from dataclasses import dataclass, field
 import numpy as np
 import configparser
@@ -30,7 +31,7 @@ from motor.motor_asyncio import (
     AsyncIOMotorDatabase,
     AsyncIOMotorCollection,
 )
-from pymongo.operations import SearchIndexModel
+from pymongo.operations import SearchIndexModel, UpdateOne
 from pymongo.errors import PyMongoError
 
 config = configparser.ConfigParser()
@@ -96,11 +97,25 @@ class MongoKVStorage(BaseKVStorage):
             self._data = None
 
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            # Cache entries are stored one per document as "{mode}_{id}",
+            # return the whole mode like the other backends
+            prefix = f"{id}_"
+            cursor = self._data.find({"_id": {"$regex": f"^{re.escape(prefix)}"}})
+            mode_cache = {doc["_id"][len(prefix) :]: doc async for doc in cursor}
+            return mode_cache or None
         return await self._data.find_one({"_id": id})
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         cursor = self._data.find({"_id": {"$in": ids}})
-        return await cursor.to_list()
+        # Aligned with ids like the other backends, None for missing ids
+        docs = {doc["_id"]: doc async for doc in cursor}
+        return [docs.get(id) for id in ids]
+
+    async def get_field_by_ids(self, ids: list[str], field: str) -> list[Any]:
+        cursor = self._data.find({"_id": {"$in": ids}}, {field: 1})
+        values = {doc["_id"]: doc.get(field) async for doc in cursor}
+        return [values.get(id) for id in ids]
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
         cursor = self._data.find({"_id": {"$in": list(keys)}}, {"_id": 1})
@@ -146,6 +161,14 @@ class MongoKVStorage(BaseKVStorage):
         else:
             return None
 
+    async def delete_by_mode_and_ids(self, mode: str, ids: list[str]) -> None:
+        """Specifically for llm_response_cache, delete entries of a mode."""
+        if not ids or not is_namespace(
+            self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
+        ):
+            return
+        await self._data.delete_many({"_id": {"$in": [f"{mode}_{id}" for id in ids]}})
+
     async def index_done_callback(self) -> None:
         # Mongo handles persistence automatically
         pass
@@ -214,7 +237,7 @@ class MongoDocStatusStorage(DocStatusStorage):
         result = await cursor.to_list()
         return {
             doc["_id"]: DocProcessingStatus(
-                content=doc["content"],
+                content=doc.get("content"),
                 content_summary=doc.get("content_summary"),
                 content_length=doc["content_length"],
                 status=doc["status"],
@@ -527,6 +550,78 @@ class MongoGraphStorage(BaseGraphStorage):
         edges = result[0].get("edges", [])
         return [(source_node_id, e["target"]) for e in edges]
 
+    #
+    # -------------------------------------------------------------------------
+    # BATCH GETTERS
+    # -------------------------------------------------------------------------
+    #
+
+    async def _find_edges_by_sources(self, node_ids: list[str]) -> dict[str, list]:
+        """Fetch the outbound 'edges' array of several nodes in one query."""
+        cursor = self.collection.find({"_id": {"$in": node_ids}}, {"edges": 1})
+        return {doc["_id"]: doc.get("edges", []) async for doc in cursor}
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict[str, str]]:
+        cursor = self.collection.find({"_id": {"$in": node_ids}})
+        return {doc["_id"]: doc async for doc in cursor}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        """
+        Outbound counts come from the nodes' own 'edges' arrays, inbound counts
+        from a single $unwind/$group over every doc pointing at one of them.
+        """
+        outbound = await self._find_edges_by_sources(node_ids)
+        inbound_pipeline = [
+            {"$match": {"edges.target": {"$in": node_ids}}},
+            {"$unwind": "$edges"},
+            {"$match": {"edges.target": {"$in": node_ids}}},
+            {"$group": {"_id": "$edges.target", "count": {"$sum": 1}}},
+        ]
+        cursor = self.collection.aggregate(inbound_pipeline)
+        inbound = {doc["_id"]: doc["count"] async for doc in cursor}
+        # Missing nodes report 0, like node_degree
+        return {
+            n: len(outbound[n]) + inbound.get(n, 0) if n in outbound else 0
+            for n in node_ids
+        }
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict[str, str]]:
+        edges_by_source = await self._find_edges_by_sources(
+            list({src for src, _ in pairs})
+        )
+        result = {}
+        for src, tgt in pairs:
+            for e in edges_by_source.get(src, []):
+                if e.get("target") == tgt:
+                    result[(src, tgt)] = e
+                    break
+        return result
+
+    async def edge_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        """Same semantics as edge_degree: number of src -> tgt edges."""
+        edges_by_source = await self._find_edges_by_sources(
+            list({src for src, _ in pairs})
+        )
+        return {
+            (src, tgt): sum(
+                1 for e in edges_by_source.get(src, []) if e.get("target") == tgt
+            )
+            for src, tgt in pairs
+        }
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        edges_by_source = await self._find_edges_by_sources(node_ids)
+        return {
+            n: [(n, e["target"]) for e in edges_by_source.get(n, [])]
+            for n in node_ids
+        }
+
     #
     # -------------------------------------------------------------------------
     # UPSERTS
@@ -564,6 +659,53 @@ class MongoGraphStorage(BaseGraphStorage):
             {"_id": source_node_id}, {"$push": {"edges": new_edge}}
         )
 
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Upsert several node documents with a single bulk_write.
+        """
+        if not nodes:
+            return
+        await self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": node_id},
+                    {"$set": {**node_data}, "$setOnInsert": {"edges": []}},
+                    upsert=True,
+                )
+                for node_id, node_data in nodes.items()
+            ]
+        )
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """
+        Upsert several edges with a single ordered bulk_write, replacing each
+        existing edge the same way as upsert_edge.
+        """
+        if not edges:
+            return
+        operations = []
+        for (source_node_id, target_node_id), edge_data in edges.items():
+            operations.extend(
+                [
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$setOnInsert": {"edges": []}},
+                        upsert=True,
+                    ),
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$pull": {"edges": {"target": target_node_id}}},
+                    ),
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$push": {"edges": {"target": target_node_id, **edge_data}}},
+                    ),
+                ]
+            )
+        await self.collection.bulk_write(operations, ordered=True)
+
     #
     # -------------------------------------------------------------------------
     # DELETION
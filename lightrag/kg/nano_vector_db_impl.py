@@ -33,6 +33,9 @@ class NanoVectorDBStorage(BaseVectorStorage):
         self._client = None
         self._storage_lock = None
         self.storage_updated = None
+        # id -> row of the client matrix, see _rows
+        self._row_index: dict[str, int] = {}
+        self._indexed_matrix = None
 
         # Use global config value if specified, otherwise use default
         kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
@@ -142,40 +145,87 @@ class NanoVectorDBStorage(BaseVectorStorage):
             for dp in results
         ]
         return results
-    
-    async def get_vector_by_id(self, id: str) -> np.ndarray | None:
-        storage = await self.client_storage
-        data = storage["data"]
-        matrix_base64 = storage.get("matrix")
-        dim = storage["embedding_dim"]
 
-        # Kiểm tra an toàn
-        if matrix_base64 is None or len(data) == 0 or not isinstance(matrix_base64, (str, bytes)):
-            logger.error("[get_vector_by_id] Invalid matrix or empty data")
-            return None
-
-        try:
-            matrix_bytes = base64.b64decode(matrix_base64)
-            total_floats = len(matrix_bytes) // 4
-            expected_floats = len(data) * dim
-
-            if total_floats < expected_floats:
-                logger.error(f"[get_vector_by_id] Matrix size mismatch: expected {expected_floats}, got {total_floats}")
-                return None
-
-            matrix = np.frombuffer(matrix_bytes, dtype=np.float32)
-            matrix = matrix[:len(data) * dim].reshape((len(data), dim))
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        """Score all queries against the stored vectors in one matrix product"""
+        if not queries:
+            return []
+        embeddings = np.asarray(await self.embedding_func(queries), dtype=np.float32)
+        storage = await self.client_storage
+        matrix = self._matrix(storage)
+        if matrix is None:
+            return [[] for _ in queries]
+        # Stored vectors are normalized by the client, normalize the queries alike
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+        scores = matrix @ embeddings.T
+        k = min(top_k, len(matrix))
+        results = []
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k] if k > 0 else []
+            hits = []
+            for i in sorted(top, key=lambda i: -column[i]):
+                if column[i] < self.cosine_better_than_threshold:
+                    break
+                dp = storage["data"][i]
+                hits.append(
+                    {
+                        **dp,
+                        "id": dp["__id__"],
+                        "distance": float(column[i]),
+                        "created_at": dp.get("__created_at__"),
+                    }
+                )
+            results.append(hits)
+        return results
 
-            for i, record in enumerate(data):
-                if record["__id__"] == id:
-                    return matrix[i]
+    def _rows(self, storage: dict[str, Any]) -> dict[str, int]:
+        """Row of each id in the client matrix.
 
-            logger.warning(f"[get_vector_by_id] ID {id} not found in vector DB")
+        The client replaces its matrix when rows are added or deleted, and
+        only updates rows in place otherwise, so the index is rebuilt when
+        the matrix object changes.
+        """
+        matrix = storage.get("matrix")
+        if self._indexed_matrix is not matrix or len(self._row_index) != len(
+            storage["data"]
+        ):
+            self._row_index = {r["__id__"]: i for i, r in enumerate(storage["data"])}
+            self._indexed_matrix = matrix
+        return self._row_index
+
+    @staticmethod
+    def _matrix(storage: dict[str, Any]) -> np.ndarray | None:
+        """The normalized vectors of the client, one row per record"""
+        matrix = storage.get("matrix")
+        if matrix is None or not storage["data"]:
             return None
+        if isinstance(matrix, (str, bytes)):
+            # Not decoded by the client yet
+            matrix = np.frombuffer(base64.b64decode(matrix), dtype=np.float32)
+            matrix = matrix[: len(storage["data"]) * storage["embedding_dim"]]
+            matrix = matrix.reshape(len(storage["data"]), storage["embedding_dim"])
+        return matrix
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        storage = await self.client_storage
+        matrix = self._matrix(storage)
+        if matrix is None:
+            return {}
+        rows = self._rows(storage)
+        found = [id for id in dict.fromkeys(ids) if id in rows]
+        if not found:
+            return {}
+        vectors = matrix[[rows[id] for id in found]]
+        return dict(zip(found, vectors))
 
-        except Exception as e:
-            logger.exception(f"[get_vector_by_id] Failed to extract vector: {e}")
-            return None
+    async def get_vector_by_id(self, id: str) -> np.ndarray | None:
+        vector = (await self.get_vectors_by_ids([id])).get(id)
+        if vector is None:
+            logger.warning(f"[get_vector_by_id] ID {id} not found in vector DB")
+        return vector
 
     @property
     async def client_storage(self):
@@ -36,6 +36,8 @@ config.read("config.ini", "utf-8")
 
 # Get maximum number of graph nodes from environment variable, default is 1000
 MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", 1000))
+# Number of MERGE clauses sent in one statement by the batch upserts
+UPSERT_BATCH_SIZE = int(os.getenv("NEO4J_UPSERT_BATCH_SIZE", 200))
 
 
 @final
@@ -377,6 +379,130 @@ class Neo4JStorage(BaseGraphStorage):
 
             return edges
 
+    @staticmethod
+    def _union_query(
+        keys: list[tuple[str, ...]], branch: str
+    ) -> tuple[str, dict[str, str]]:
+        """Build a single UNION ALL query running `branch` once per key.
+
+        Nodes are identified by their label in this storage, and labels cannot
+        be parameterised, so a plain UNWIND would fall back to scanning every
+        node. Each branch keeps its own label lookup instead while the whole
+        batch still goes to the server in one round trip.
+
+        Args:
+            keys: Tuples of node ids, formatted into the branch as {label0}, {label1}...
+                and bound as parameters {param0}, {param1}...
+            branch: Cypher template for one key
+        """
+        parts = []
+        params = {}
+        for i, key in enumerate(keys):
+            fmt = {}
+            for j, node_id in enumerate(key):
+                fmt[f"label{j}"] = node_id.strip('"').replace("`", "``")
+                fmt[f"param{j}"] = f"$k{i}_{j}"
+                params[f"k{i}_{j}"] = node_id
+            parts.append(branch.format(**fmt))
+        return "\nUNION ALL\n".join(parts), params
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict[str, str]]:
+        if not node_ids:
+            return {}
+        query, params = self._union_query(
+            [(n,) for n in node_ids],
+            "MATCH (n:`{label0}`) RETURN {param0} AS id, n LIMIT 1",
+        )
+        async with self._driver.session(database=self._DATABASE) as session:
+            result = await session.run(query, params)
+            nodes = {record["id"]: dict(record["n"]) async for record in result}
+        logger.debug(
+            f"{inspect.currentframe().f_code.co_name}: {len(nodes)}/{len(node_ids)} nodes found"
+        )
+        return nodes
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        if not node_ids:
+            return {}
+        query, params = self._union_query(
+            [(n,) for n in node_ids],
+            "MATCH (n:`{label0}`) RETURN {param0} AS id, COUNT {{ (n)--() }} AS degree",
+        )
+        degrees = {n: 0 for n in node_ids}
+        async with self._driver.session(database=self._DATABASE) as session:
+            result = await session.run(query, params)
+            async for record in result:
+                degrees[record["id"]] = record["degree"]
+        return degrees
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict[str, str]]:
+        if not pairs:
+            return {}
+        query, params = self._union_query(
+            pairs,
+            "MATCH (a:`{label0}`)-[r]->(b:`{label1}`) "
+            "RETURN {param0} AS src, {param1} AS tgt, properties(r) AS props LIMIT 1",
+        )
+        edges = {}
+        async with self._driver.session(database=self._DATABASE) as session:
+            result = await session.run(query, params)
+            async for record in result:
+                props = dict(record["props"])
+                # Same defaults as get_edge for partially written edges
+                for key, default_value in (
+                    ("weight", 0.0),
+                    ("source_id", None),
+                    ("description", None),
+                    ("keywords", None),
+                ):
+                    props.setdefault(key, default_value)
+                edges[(record["src"], record["tgt"])] = props
+        return edges
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        if not node_ids:
+            return {}
+        query, params = self._union_query(
+            [(n,) for n in node_ids],
+            "MATCH (n:`{label0}`) OPTIONAL MATCH (n)-[r]-(connected) "
+            "RETURN {param0} AS id, labels(n)[0] AS source, labels(connected)[0] AS target",
+        )
+        edges = {n: [] for n in node_ids}
+        async with self._driver.session(database=self._DATABASE) as session:
+            result = await session.run(query, params)
+            async for record in result:
+                if record["source"] and record["target"]:
+                    edges[record["id"]].append((record["source"], record["target"]))
+        return edges
+
+    async def get_nodes_top_edges_batch(
+        self, node_ids: list[str], limit: int
+    ) -> dict[str, list[tuple[str, str]]]:
+        """Rank and cut the edges on the server, so a hub only sends `limit` edges"""
+        if limit <= 0:
+            return await self.get_nodes_edges_batch(node_ids)
+        if not node_ids:
+            return {}
+        query, params = self._union_query(
+            [(n,) for n in node_ids],
+            "MATCH (n:`{label0}`)-[r]-(connected) "
+            "WITH n, connected, coalesce(toFloat(r.weight), 0.0) AS weight "
+            "ORDER BY weight DESC, COUNT {{ (connected)--() }} DESC LIMIT $limit "
+            "RETURN {param0} AS id, labels(n)[0] AS source, labels(connected)[0] AS target",
+        )
+        params["limit"] = limit
+        edges = {n: [] for n in node_ids}
+        async with self._driver.session(database=self._DATABASE) as session:
+            result = await session.run(query, params)
+            async for record in result:
+                if record["source"] and record["target"]:
+                    edges[record["id"]].append((record["source"], record["target"]))
+        return edges
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -466,6 +592,93 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during edge upsert: {str(e)}")
             raise
 
+    @staticmethod
+    def _escape_label(node_id: str) -> str:
+        return node_id.strip('"').replace("`", "``")
+
+    async def _run_write_batches(self, clauses: list[tuple[str, dict]]) -> None:
+        """Run (clause, params) pairs as a few multi-clause statements in one transaction.
+
+        Labels cannot be parameterised, so an UNWIND over the batch would have
+        to scan every node. Concatenating the per-item MERGE clauses keeps the
+        label lookups while sending `UPSERT_BATCH_SIZE` items per round trip.
+        """
+
+        async def _do_write(tx: AsyncManagedTransaction):
+            for start in range(0, len(clauses), UPSERT_BATCH_SIZE):
+                batch = clauses[start : start + UPSERT_BATCH_SIZE]
+                query = "\n".join(clause for clause, _ in batch)
+                params = {k: v for _, p in batch for k, v in p.items()}
+                result = await tx.run(query, params)
+                await result.consume()
+
+        async with self._driver.session(database=self._DATABASE) as session:
+            await session.execute_write(_do_write)
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        if not nodes:
+            return
+        clauses = [
+            (
+                f"MERGE (n{i}:`{self._escape_label(node_id)}`) SET n{i} += $p{i}",
+                {f"p{i}": node_data},
+            )
+            for i, (node_id, node_data) in enumerate(nodes.items())
+        ]
+        try:
+            await self._run_write_batches(clauses)
+        except Exception as e:
+            logger.error(f"Error during batch upsert: {str(e)}")
+            raise
+        logger.debug(f"Upserted {len(nodes)} nodes")
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        if not edges:
+            return
+        # MERGE rather than MATCH the endpoints: a failed MATCH would drop the
+        # row and skip every clause after it in the statement
+        clauses = [
+            (
+                f"MERGE (s{i}:`{self._escape_label(src)}`) "
+                f"MERGE (t{i}:`{self._escape_label(tgt)}`) "
+                f"MERGE (s{i})-[r{i}:DIRECTED]->(t{i}) SET r{i} += $p{i}",
+                {f"p{i}": edge_data},
+            )
+            for i, ((src, tgt), edge_data) in enumerate(edges.items())
+        ]
+        try:
+            await self._run_write_batches(clauses)
+        except Exception as e:
+            logger.error(f"Error during batch edge upsert: {str(e)}")
+            raise
+        logger.debug(f"Upserted {len(edges)} edges")
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
 
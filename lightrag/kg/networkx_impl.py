@@ -1,10 +1,11 @@
+import heapq
 import os
 from dataclasses import dataclass
 from typing import Any, final
 import numpy as np
 
 from lightrag.types import KnowledgeGraph, KnowledgeGraphNode, KnowledgeGraphEdge
-from lightrag.utils import logger
+from lightrag.utils import edge_weight, logger
 from lightrag.base import BaseGraphStorage
 
 import pipmaster as pm
@@ -93,6 +94,8 @@ class NetworkXStorage(BaseGraphStorage):
         else:
             logger.info("Created new empty graph")
         self._graph = preloaded_graph or nx.Graph()
+        # Hub node -> (limit, its best ranked edges), see get_nodes_top_edges_batch
+        self._top_edges: dict[str, tuple[int, list[tuple[str, str]]]] = {}
 
         self._node_embed_algorithms = {
             "node2vec": self._node2vec_embed,
@@ -120,6 +123,7 @@ class NetworkXStorage(BaseGraphStorage):
                 self._graph = (
                     NetworkXStorage.load_nx_graph(self._graphml_xml_file) or nx.Graph()
                 )
+                self._top_edges.clear()
                 # Reset update flag
                 if is_multiprocess:
                     self.storage_updated.value = False
@@ -160,6 +164,84 @@ class NetworkXStorage(BaseGraphStorage):
             return list(graph.edges(source_node_id))
         return None
 
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict[str, str]]:
+        graph = await self._get_graph()
+        nodes = graph.nodes
+        return {n: nodes[n] for n in node_ids if n in nodes}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        graph = await self._get_graph()
+        return {n: graph.degree(n) if n in graph else 0 for n in node_ids}
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict[str, str]]:
+        graph = await self._get_graph()
+        result = {}
+        for s, t in pairs:
+            edge = graph.edges.get((s, t))
+            if edge is not None:
+                result[(s, t)] = edge
+        return result
+
+    async def edge_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        graph = await self._get_graph()
+        return {
+            (s, t): (graph.degree(s) if s in graph else 0)
+            + (graph.degree(t) if t in graph else 0)
+            for s, t in pairs
+        }
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        graph = await self._get_graph()
+        return {
+            n: list(graph.edges(n)) if graph.has_node(n) else [] for n in node_ids
+        }
+
+    async def get_nodes_top_edges_batch(
+        self, node_ids: list[str], limit: int
+    ) -> dict[str, list[tuple[str, str]]]:
+        graph = await self._get_graph()
+        result = {}
+        for n in node_ids:
+            if not graph.has_node(n):
+                result[n] = []
+            elif limit <= 0 or graph.degree(n) <= limit:
+                result[n] = list(graph.edges(n))
+            else:
+                cached = self._top_edges.get(n)
+                if cached is None or cached[0] != limit:
+                    cached = (limit, self._rank_edges(graph, n, limit))
+                    self._top_edges[n] = cached
+                result[n] = list(cached[1])
+        return result
+
+    @staticmethod
+    def _rank_edges(graph: nx.Graph, node_id: str, limit: int) -> list[tuple[str, str]]:
+        adjacency = graph.adj[node_id]
+        best = heapq.nlargest(
+            limit,
+            adjacency,
+            key=lambda t: (edge_weight(adjacency[t]), graph.degree(t)),
+        )
+        return [(node_id, t) for t in best]
+
+    def _invalidate_top_edges(self, graph: nx.Graph, node_ids: set[str]) -> None:
+        """Drop the rankings of the hubs the changed nodes belong to.
+
+        A change to a node alters its edges or its degree, so the rankings of
+        the node itself and of the hubs it is a neighbor of are recomputed
+        on next use.
+        """
+        for hub in list(self._top_edges):
+            neighbors = graph.adj.get(hub, {})
+            if hub in node_ids or any(n in neighbors for n in node_ids):
+                del self._top_edges[hub]
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
         graph = await self._get_graph()
         graph.add_node(node_id, **node_data)
@@ -169,10 +251,26 @@ class NetworkXStorage(BaseGraphStorage):
     ) -> None:
         graph = await self._get_graph()
         graph.add_edge(source_node_id, target_node_id, **edge_data)
+        if self._top_edges:
+            self._invalidate_top_edges(graph, {source_node_id, target_node_id})
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        graph = await self._get_graph()
+        graph.add_nodes_from(nodes.items())
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        graph = await self._get_graph()
+        graph.add_edges_from((s, t, data) for (s, t), data in edges.items())
+        if self._top_edges:
+            self._invalidate_top_edges(graph, {n for pair in edges for n in pair})
 
     async def delete_node(self, node_id: str) -> None:
         graph = await self._get_graph()
         if graph.has_node(node_id):
+            if self._top_edges:
+                self._invalidate_top_edges(graph, {node_id, *graph.adj[node_id]})
             graph.remove_node(node_id)
             logger.debug(f"Node {node_id} deleted from the graph.")
         else:
@@ -202,6 +300,11 @@ class NetworkXStorage(BaseGraphStorage):
             nodes: List of node IDs to be deleted
         """
         graph = await self._get_graph()
+        if self._top_edges:
+            changed = {
+                n for node in nodes if graph.has_node(node) for n in graph.adj[node]
+            }
+            self._invalidate_top_edges(graph, changed | set(nodes))
         for node in nodes:
             if graph.has_node(node):
                 graph.remove_node(node)
@@ -213,6 +316,8 @@ class NetworkXStorage(BaseGraphStorage):
             edges: List of edges to be deleted, each edge is a (source, target) tuple
         """
         graph = await self._get_graph()
+        if self._top_edges:
+            self._invalidate_top_edges(graph, {n for pair in edges for n in pair})
         for source, target in edges:
             if graph.has_edge(source, target):
                 graph.remove_edge(source, target)
@@ -407,6 +512,7 @@ class NetworkXStorage(BaseGraphStorage):
             self._graph = (
                 NetworkXStorage.load_nx_graph(self._graphml_xml_file) or nx.Graph()
             )
+            self._top_edges.clear()
             # Reset update flag
             self.storage_updated.value = False
             return False  # Return error
@@ -41,6 +41,9 @@ if not pm.is_installed("asyncpg"):
 import asyncpg  # type: ignore
 from asyncpg import Pool  # type: ignore
 
+# Number of cypher statements sent in one round trip by the batch upserts
+UPSERT_BATCH_SIZE = int(os.getenv("AGE_UPSERT_BATCH_SIZE", 100))
+
 
 class PostgreSQLDB:
     def __init__(self, config: dict[str, Any], **kwargs: Any):
@@ -376,6 +379,21 @@ class PGKVStorage(BaseKVStorage):
 
                     await self.db.execute(upsert_sql, _data)
 
+    async def delete_by_mode_and_ids(self, mode: str, ids: list[str]) -> None:
+        """Specifically for llm_response_cache, delete entries of a mode."""
+        if not ids or not is_namespace(
+            self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
+        ):
+            return
+        ids_list = ",".join([f"'{id}'" for id in ids])
+        delete_sql = (
+            "DELETE FROM LIGHTRAG_LLM_CACHE "
+            f"WHERE workspace=$1 AND mode=$2 AND id IN ({ids_list})"
+        )
+        await self.db.execute(
+            delete_sql, {"workspace": self.db.workspace, "mode": mode}
+        )
+
     async def index_done_callback(self) -> None:
         # PG handles persistence automatically
         pass
@@ -732,7 +750,8 @@ class PGDocStatusStorage(DocStatusStorage):
                 {
                     "workspace": self.db.workspace,
                     "id": k,
-                    "content": v["content"],
+                    # Content is kept in full_docs, older callers may still pass it
+                    "content": v.get("content", ""),
                     "content_summary": v["content_summary"],
                     "content_length": v["content_length"],
                     "chunks_count": v["chunks_count"] if "chunks_count" in v else -1,
@@ -1107,25 +1126,148 @@ class PGGraphStorage(BaseGraphStorage):
 
         return edges
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((PGGraphQueryException,)),
-    )
-    async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
-        label = self._encode_graph_label(node_id.strip('"'))
-        properties = node_data
+    def _encode_node_id_list(self, node_ids: list[str]) -> str:
+        """Render node ids as an AGE list literal body for `WHERE n.node_id IN [...]`"""
+        encoded_node_ids = [
+            self._encode_graph_label(node_id.strip('"')) for node_id in node_ids
+        ]
+        return ", ".join([f'"{node_id}"' for node_id in encoded_node_ids])
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict[str, str]]:
+        if not node_ids:
+            return {}
+        query = """SELECT * FROM cypher('%s', $$
+                     MATCH (n:Entity)
+                     WHERE n.node_id IN [%s]
+                     RETURN n.node_id AS node_id, n
+                   $$) AS (node_id text, n agtype)""" % (
+            self.graph_name,
+            self._encode_node_id_list(node_ids),
+        )
+        results = await self._query(query)
+        nodes = {}
+        for record in results:
+            if record["node_id"] and record["n"]:
+                nodes[self._decode_graph_label(record["node_id"])] = record["n"]
+        return nodes
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        if not node_ids:
+            return {}
+        # Outgoing edges only, matching node_degree
+        query = """SELECT * FROM cypher('%s', $$
+                     MATCH (n:Entity)
+                     WHERE n.node_id IN [%s]
+                     OPTIONAL MATCH (n)-[]->(x)
+                     RETURN n.node_id AS node_id, count(x) AS degree
+                   $$) AS (node_id text, degree integer)""" % (
+            self.graph_name,
+            self._encode_node_id_list(node_ids),
+        )
+        results = await self._query(query)
+        degrees = {n: 0 for n in node_ids}
+        for record in results:
+            if record["node_id"]:
+                degrees[self._decode_graph_label(record["node_id"])] = int(
+                    record["degree"] or 0
+                )
+        return degrees
 
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict[str, str]]:
+        if not pairs:
+            return {}
+        encoded_edges = [
+            (
+                self._encode_graph_label(src.strip('"')),
+                self._encode_graph_label(tgt.strip('"')),
+            )
+            for src, tgt in pairs
+        ]
+        edge_list = ", ".join([f'["{src}", "{tgt}"]' for src, tgt in encoded_edges])
         query = """SELECT * FROM cypher('%s', $$
+                     MATCH (a:Entity)-[r]->(b:Entity)
+                     WHERE [a.node_id, b.node_id] IN [%s]
+                     RETURN a.node_id AS src, b.node_id AS tgt, properties(r) AS edge_properties
+                   $$) AS (src text, tgt text, edge_properties agtype)""" % (
+            self.graph_name,
+            edge_list,
+        )
+        results = await self._query(query)
+        edges = {}
+        for record in results:
+            if record["edge_properties"]:
+                key = (
+                    self._decode_graph_label(record["src"]),
+                    self._decode_graph_label(record["tgt"]),
+                )
+                edges.setdefault(key, record["edge_properties"])
+        return edges
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        if not node_ids:
+            return {}
+        query = """SELECT * FROM cypher('%s', $$
+                     MATCH (n:Entity)-[]-(connected:Entity)
+                     WHERE n.node_id IN [%s]
+                     RETURN n.node_id AS source, connected.node_id AS target
+                   $$) AS (source text, target text)""" % (
+            self.graph_name,
+            self._encode_node_id_list(node_ids),
+        )
+        results = await self._query(query)
+        edges = {n: [] for n in node_ids}
+        for record in results:
+            if record["source"] and record["target"]:
+                source = self._decode_graph_label(record["source"])
+                if source in edges:
+                    edges[source].append(
+                        (source, self._decode_graph_label(record["target"]))
+                    )
+        return edges
+
+    def _upsert_node_query(self, node_id: str, node_data: dict[str, str]) -> str:
+        label = self._encode_graph_label(node_id.strip('"'))
+        return """SELECT * FROM cypher('%s', $$
                      MERGE (n:Entity {node_id: "%s"})
                      SET n += %s
                      RETURN n
                    $$) AS (n agtype)""" % (
             self.graph_name,
             label,
-            self._format_properties(properties),
+            self._format_properties(node_data),
         )
 
+    def _upsert_edge_query(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ) -> str:
+        src_label = self._encode_graph_label(source_node_id.strip('"'))
+        tgt_label = self._encode_graph_label(target_node_id.strip('"'))
+        return """SELECT * FROM cypher('%s', $$
+                     MATCH (source:Entity {node_id: "%s"})
+                     WITH source
+                     MATCH (target:Entity {node_id: "%s"})
+                     MERGE (source)-[r:DIRECTED]->(target)
+                     SET r += %s
+                     RETURN r
+                   $$) AS (r agtype)""" % (
+            self.graph_name,
+            src_label,
+            tgt_label,
+            self._format_properties(edge_data),
+        )
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
+        query = self._upsert_node_query(node_id, node_data)
+
         try:
             await self._query(query, readonly=False, upsert=True)
 
@@ -1149,23 +1291,7 @@ class PGGraphStorage(BaseGraphStorage):
             target_node_id (str): Label of the target node (used as identifier)
             edge_data (dict): dictionary of properties to set on the edge
         """
-        src_label = self._encode_graph_label(source_node_id.strip('"'))
-        tgt_label = self._encode_graph_label(target_node_id.strip('"'))
-        edge_properties = edge_data
-
-        query = """SELECT * FROM cypher('%s', $$
-                     MATCH (source:Entity {node_id: "%s"})
-                     WITH source
-                     MATCH (target:Entity {node_id: "%s"})
-                     MERGE (source)-[r:DIRECTED]->(target)
-                     SET r += %s
-                     RETURN r
-                   $$) AS (r agtype)""" % (
-            self.graph_name,
-            src_label,
-            tgt_label,
-            self._format_properties(edge_properties),
-        )
+        query = self._upsert_edge_query(source_node_id, target_node_id, edge_data)
 
         try:
             await self._query(query, readonly=False, upsert=True)
@@ -1174,6 +1300,46 @@ class PGGraphStorage(BaseGraphStorage):
             logger.error("Error during edge upsert: {%s}", e)
             raise
 
+    async def _execute_batches(self, queries: list[str]) -> None:
+        """Send the statements `UPSERT_BATCH_SIZE` at a time.
+
+        Without parameters asyncpg uses the simple query protocol, which runs
+        a multi-statement string in one round trip and one implicit transaction.
+        """
+        for start in range(0, len(queries), UPSERT_BATCH_SIZE):
+            batch = queries[start : start + UPSERT_BATCH_SIZE]
+            await self._query(";\n".join(batch), readonly=False, upsert=True)
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        try:
+            await self._execute_batches(
+                [self._upsert_node_query(n, data) for n, data in nodes.items()]
+            )
+        except Exception as e:
+            logger.error("POSTGRES, Error during batch upsert: {%s}", e)
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        try:
+            await self._execute_batches(
+                [self._upsert_edge_query(s, t, data) for (s, t), data in edges.items()]
+            )
+        except Exception as e:
+            logger.error("Error during batch edge upsert: {%s}", e)
+            raise
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
 
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import asyncio
 from multiprocessing.synchronize import Lock as ProcessLock
 from multiprocessing import Manager
@@ -27,6 +28,7 @@ _initialized = None
 _shared_dicts: Optional[Dict[str, Any]] = None
 _init_flags: Optional[Dict[str, bool]] = None  # namespace -> initialized
 _update_flags: Optional[Dict[str, bool]] = None  # namespace -> updated
+_in_flight: Optional[Dict[str, float]] = None  # single-flight key -> claim time
 
 # locks for mutex access
 _storage_lock: Optional[LockType] = None
@@ -111,7 +113,8 @@ def initialize_share_data(workers: int = 1):
         _shared_dicts, \
         _init_flags, \
         _initialized, \
-        _update_flags
+        _update_flags, \
+        _in_flight
 
     # Check if already initialized
     if _initialized:
@@ -131,6 +134,7 @@ def initialize_share_data(workers: int = 1):
         _shared_dicts = _manager.dict()
         _init_flags = _manager.dict()
         _update_flags = _manager.dict()
+        _in_flight = _manager.dict()
         direct_log(
             f"Process {os.getpid()} Shared-Data created for Multiple Process (workers={workers})"
         )
@@ -142,6 +146,7 @@ def initialize_share_data(workers: int = 1):
         _shared_dicts = {}
         _init_flags = {}
         _update_flags = {}
+        _in_flight = {}
         direct_log(f"Process {os.getpid()} Shared-Data created for Single Process")
 
     # Mark as initialized
@@ -247,6 +252,42 @@ async def get_all_update_flags_status() -> Dict[str, list]:
     return result
 
 
+async def try_claim_flight(key: str, timeout: float) -> bool:
+    """
+    Claim a single-flight key for the current worker.
+    Returns False while another worker holds a claim younger than timeout seconds.
+    """
+    if _in_flight is None:
+        return True
+
+    async with get_internal_lock():
+        claimed_at = _in_flight.get(key)
+        now = time.time()
+        if claimed_at is not None and now - claimed_at < timeout:
+            return False
+        _in_flight[key] = now
+        return True
+
+
+async def refresh_flight(key: str):
+    """Renew the claim time of a single-flight key still being computed"""
+    if _in_flight is None:
+        return
+
+    async with get_internal_lock():
+        if key in _in_flight:
+            _in_flight[key] = time.time()
+
+
+async def release_flight(key: str):
+    """Release a single-flight key claimed by try_claim_flight"""
+    if _in_flight is None:
+        return
+
+    async with get_internal_lock():
+        _in_flight.pop(key, None)
+
+
 def try_initialize_namespace(namespace: str) -> bool:
     """
     Returns True if the current worker(process) gets initialization permission for loading data later.
@@ -307,7 +348,8 @@ def finalize_share_data():
         _shared_dicts, \
         _init_flags, \
         _initialized, \
-        _update_flags
+        _update_flags, \
+        _in_flight
 
     # Check if already initialized
     if not _initialized:
@@ -351,6 +393,8 @@ def finalize_share_data():
                 except Exception:
                     pass  # Ignore any errors during update flags cleanup
                 _update_flags.clear()
+            if _in_flight is not None:
+                _in_flight.clear()
 
             # Shut down the Manager - this will automatically clean up all shared resources
             _manager.shutdown()
@@ -370,5 +414,6 @@ def finalize_share_data():
     _internal_lock = None
     _pipeline_status_lock = None
     _update_flags = None
+    _in_flight = None
 
     direct_log(f"Process {os.getpid()} storage data finalization complete")
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Iterable, final
+
+from .base import BaseKVStorage, StorageNameSpace
+from .kg.shared_storage import get_storage_lock, get_update_flag, set_all_update_flags
+from .utils import exists_func, load_json, logger, normalize_search_text, write_json
+
+
+def tokenize(text: str) -> list[str]:
+    return normalize_search_text(text).split()
+
+
+def reciprocal_rank_fusion(
+    result_lists: Iterable[list[dict[str, Any]]], top_k: int, k: int = 60
+) -> list[dict[str, Any]]:
+    """Fuse ranked result lists by id, scoring each id with sum(1 / (k + rank)).
+
+    The fused score replaces "distance", other fields are kept from the first
+    list the id appears in.
+    """
+    scores: dict[str, float] = {}
+    records: dict[str, dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, r in enumerate(results, start=1):
+            scores[r["id"]] = scores.get(r["id"], 0.0) + 1.0 / (k + rank)
+            records.setdefault(r["id"], r)
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    return [{**records[id], "distance": score} for id, score in best]
+
+
+@final
+@dataclass
+class LexicalIndex(StorageNameSpace):
+    """BM25 inverted index over the text chunks, persisted as JSON files.
+
+    Chunks are tokenized with `normalize_search_text`, so matching ignores
+    case and Vietnamese diacritics, and exact titles or ISBN-like numbers
+    are found without an embedding call. Only the term frequencies of each
+    chunk are persisted, postings are rebuilt in memory when loading:
+
+    - `<namespace>.json`: snapshot of the term frequencies.
+    - `<namespace>.log.jsonl`: chunks indexed or deleted since the snapshot,
+      one JSON line each. A flush appends the changed chunks instead of
+      rewriting the index; the snapshot is rewritten once the log holds more
+      lines than there are chunks.
+
+    Workers share the files like the other file storages: a flush catches up
+    with the lines appended by the other workers under the storage lock,
+    then sets their update flags so they read the new lines before their
+    next search. When the snapshot does not exist yet, the index is
+    backfilled from `text_chunks` on first use.
+    """
+
+    text_chunks: BaseKVStorage | None = None
+    k1: float = field(default=float(os.getenv("LEXICAL_INDEX_K1", 1.5)))
+    b: float = field(default=float(os.getenv("LEXICAL_INDEX_B", 0.75)))
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._file_name = os.path.join(working_dir, f"{self.namespace}.json")
+        self._log_file_name = os.path.join(working_dir, f"{self.namespace}.log.jsonl")
+        self._reset()
+        self._loaded = False
+        self._dirty: set[str] = set()  # chunk ids changed since the last flush
+        self._lock = asyncio.Lock()
+        self._storage_lock = None
+        self.storage_updated = None
+
+    def _reset(self) -> None:
+        self._docs: dict[str, dict[str, int]] = {}  # chunk id -> term frequencies
+        self._doc_len: dict[str, int] = {}
+        self._postings: dict[str, dict[str, int]] = {}  # term -> chunk id -> tf
+        self._total_len = 0
+        # Snapshot generation, and bytes and lines of its log applied so far
+        self._generation = 0
+        self._log_offset = 0
+        self._log_records = 0
+
+    async def initialize(self):
+        """Load the index files, the backfill waits for the first use"""
+        self.storage_updated = await get_update_flag(self.namespace)
+        self._storage_lock = get_storage_lock()
+        async with self._storage_lock:
+            if self._load():
+                logger.info(
+                    f"Load lexical index {self.namespace} with {len(self._docs)} chunks"
+                )
+
+    def _load(self) -> bool:
+        """Read the snapshot and replay its log, False if there is no snapshot"""
+        data = load_json(self._file_name)
+        self._reset()
+        if data is None:
+            return False
+        for chunk_id, terms in data.get("docs", {}).items():
+            self._add(chunk_id, terms)
+        self._generation = data.get("generation", 0)
+        records = self._read_log()
+        if records is not None:
+            self._apply(records)
+        self._loaded = True
+        return True
+
+    def _read_log(self) -> list[dict[str, Any]] | None:
+        """Log lines appended since the last read, None if the log does not
+        belong to the loaded snapshot"""
+        try:
+            f = open(self._log_file_name, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            header = f.readline()
+            try:
+                if json.loads(header).get("generation") != self._generation:
+                    return None
+            except ValueError:
+                return None
+            end = max(self._log_offset, len(header))
+            f.seek(end)
+            records = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Torn write at the tail of the log
+                    break
+                end += len(line)
+        self._log_offset = end
+        return records
+
+    def _apply(self, records: list[dict[str, Any]]) -> None:
+        for record in records:
+            chunk_id = record["id"]
+            if chunk_id in self._dirty:
+                # Changed here since, the next flush writes our version
+                continue
+            self._remove(chunk_id)
+            if "terms" in record:
+                self._add(chunk_id, record["terms"])
+        self._log_records += len(records)
+
+    def _catch_up(self) -> None:
+        """Apply the flushes of other workers, called with the storage lock held"""
+        records = self._read_log()
+        if records is not None:
+            self._apply(records)
+            return
+        # Another worker rewrote the snapshot, reload it and keep the local changes
+        local = {chunk_id: self._docs.get(chunk_id) for chunk_id in self._dirty}
+        self._load()
+        for chunk_id, terms in local.items():
+            self._remove(chunk_id)
+            if terms is not None:
+                self._add(chunk_id, terms)
+
+    def _is_stale(self) -> bool:
+        # A manager Value in multiprocess mode, a plain bool otherwise
+        if hasattr(self.storage_updated, "value"):
+            return self.storage_updated.value
+        return bool(self.storage_updated)
+
+    def _reset_update_flag(self) -> None:
+        if hasattr(self.storage_updated, "value"):
+            self.storage_updated.value = False
+        else:
+            self.storage_updated = False
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            if self._is_stale():
+                async with self._storage_lock:
+                    logger.info(
+                        f"Process {os.getpid()} catching up with {self.namespace} updated by another process"
+                    )
+                    self._catch_up()
+                    self._reset_update_flag()
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            chunks = {}
+            if self.text_chunks is not None and exists_func(self.text_chunks, "get_all"):
+                # Read outside the storage lock, the KV storage takes it too
+                chunks = await self.text_chunks.get_all()
+            async with self._storage_lock:
+                if self._load():
+                    # Backfilled by another worker meanwhile
+                    return
+                self._index(chunks)
+                await asyncio.to_thread(self._write_snapshot, dict(self._docs))
+                self._dirty.clear()
+                self._loaded = True
+            logger.info(
+                f"Backfilled lexical index {self.namespace} with {len(chunks)} chunks"
+            )
+
+    def _add(self, chunk_id: str, terms: dict[str, int]) -> None:
+        self._docs[chunk_id] = terms
+        length = sum(terms.values())
+        self._doc_len[chunk_id] = length
+        self._total_len += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+
+    def _remove(self, chunk_id: str) -> None:
+        terms = self._docs.pop(chunk_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(chunk_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def _index(self, chunks: dict[str, dict[str, Any]]) -> None:
+        for chunk_id, chunk in chunks.items():
+            if not isinstance(chunk, dict) or not chunk.get("content"):
+                continue
+            self._remove(chunk_id)
+            self._add(chunk_id, dict(Counter(tokenize(chunk["content"]))))
+            self._dirty.add(chunk_id)
+
+    async def upsert(self, chunks: dict[str, dict[str, Any]]) -> None:
+        """Index chunks, keyed by chunk id, from their "content" """
+        await self._ensure_loaded()
+        self._index(chunks)
+
+    async def delete(self, chunk_ids: Iterable[str]) -> None:
+        await self._ensure_loaded()
+        for chunk_id in chunk_ids:
+            if chunk_id in self._docs:
+                self._remove(chunk_id)
+                self._dirty.add(chunk_id)
+
+    async def search(self, query: str, top_k: int) -> list[dict[str, Any]]:
+        """Top chunks by BM25 score.
+
+        Each result holds "id", the score as "distance", and "exact" when the
+        best chunk contains every query term and at least one of them is
+        selective (found in no more than top_k chunks), e.g. a title or ISBN.
+        """
+        await self._ensure_loaded()
+        terms = set(tokenize(query))
+        if not terms or not self._docs:
+            return []
+        n_docs = len(self._docs)
+        avg_len = self._total_len / n_docs or 1.0
+        scores: dict[str, float] = {}
+        matched: dict[str, int] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[chunk_id] / avg_len)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (
+                    tf + norm
+                )
+                matched[chunk_id] = matched.get(chunk_id, 0) + 1
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        if not best:
+            return []
+        selective = any(0 < len(self._postings.get(t, ())) <= top_k for t in terms)
+        results = [{"id": chunk_id, "distance": score} for chunk_id, score in best]
+        results[0]["exact"] = selective and matched[best[0][0]] == len(terms)
+        return results
+
+    def _write_snapshot(self, docs: dict[str, dict[str, int]]) -> None:
+        """Rewrite the snapshot and start an empty log for it"""
+        generation = self._generation + 1
+        tmp_file_name = self._file_name + ".tmp"
+        write_json({"generation": generation, "docs": docs}, tmp_file_name)
+        os.replace(tmp_file_name, self._file_name)
+        header = json.dumps({"generation": generation}) + "\n"
+        tmp_file_name = self._log_file_name + ".tmp"
+        with open(tmp_file_name, "w", encoding="utf-8") as f:
+            f.write(header)
+        os.replace(tmp_file_name, self._log_file_name)
+        self._generation = generation
+        self._log_offset = len(header.encode("utf-8"))
+        self._log_records = 0
+
+    def _append_log(self, chunk_ids: list[str]) -> None:
+        lines = []
+        for chunk_id in chunk_ids:
+            record: dict[str, Any] = {"id": chunk_id}
+            if chunk_id in self._docs:
+                record["terms"] = self._docs[chunk_id]
+            lines.append(json.dumps(record, ensure_ascii=False))
+        with open(self._log_file_name, "r+b") as f:
+            # Drop the tail of a flush that did not complete
+            f.seek(self._log_offset)
+            f.truncate()
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            self._log_offset = f.tell()
+        self._log_records += len(lines)
+
+    async def index_done_callback(self) -> None:
+        if not self._dirty:
+            return
+        async with self._storage_lock:
+            if self._is_stale():
+                self._catch_up()
+            dirty = list(self._dirty)
+            self._dirty.clear()
+            if not self._log_offset or self._log_records + len(dirty) > max(
+                len(self._docs), 1000
+            ):
+                # Only the term frequencies are persisted, postings are derived
+                await asyncio.to_thread(self._write_snapshot, dict(self._docs))
+            else:
+                self._append_log(dirty)
+            # Notify other processes that data has been updated
+            await set_all_update_flags(self.namespace)
+            # Reset own update flag to avoid self-reloading
+            self._reset_update_flag()
+
+    async def finalize(self):
+        await self.index_done_callback()
+
+    async def drop(self) -> None:
+        await self._ensure_loaded()
+        self._dirty.update(self._docs)
+        self._docs.clear()
+        self._doc_len.clear()
+        self._postings.clear()
+        self._total_len = 0
+        await self.index_done_callback()
@@ -5,10 +5,10 @@ import configparser
 import os
 import warnings
 import time
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
 from functools import partial
-from typing import Any, AsyncIterator, Callable, Iterator, cast, final
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, cast, final
 
 from lightrag.kg import (
     STORAGE_ENV_REQUIREMENTS,
@@ -36,18 +36,33 @@ from .operate import (
     kg_query_with_keywords,
     mix_kg_vector_query,
     naive_query,
+    prepare_query_batch,
+    update_deletion_index,
+    DELETION_INDEX_MARKER,
 )
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
 from .utils import (
+    LLM_CACHE_MODES,
     EmbeddingFunc,
     always_get_an_event_loop,
+    cache_entry_type,
     compute_mdhash_id,
     convert_response_to_json,
     encode_string_by_tiktoken,
+    exists_func,
+    get_llm_cache_manager,
+    invalidate_query_cache,
+    invalidate_semantic_cache_index,
     lazy_external_import,
     limit_async_func_call,
     logger,
+    persist_embedding_cache,
+    with_description_tokens,
 )
+from .entity_linker import refresh_entity_linker
+from .attribute_store import AttributeStore, format_facet_answer, parse_facet_query
+from .lexical_index import LexicalIndex
+from .request_scope import RequestScope
 from .types import KnowledgeGraph
 from dotenv import load_dotenv
 
@@ -203,6 +218,58 @@ class LightRAG:
     - use_llm_check: If True, validates cached embeddings using an LLM.
     """
 
+    llm_cache_config: dict[str, Any] = field(
+        default_factory=lambda: {
+            "eviction_policy": os.getenv("LLM_CACHE_EVICTION_POLICY", "lru"),
+            "query": {
+                "max_entries": int(os.getenv("LLM_CACHE_QUERY_MAX_ENTRIES", 10000)),
+                "max_bytes": int(os.getenv("LLM_CACHE_QUERY_MAX_BYTES", 0)),
+                "ttl": int(os.getenv("LLM_CACHE_QUERY_TTL", 3600)),
+            },
+            "keywords": {
+                "max_entries": int(os.getenv("LLM_CACHE_KEYWORDS_MAX_ENTRIES", 100000)),
+                "max_bytes": int(os.getenv("LLM_CACHE_KEYWORDS_MAX_BYTES", 0)),
+                "ttl": int(os.getenv("LLM_CACHE_KEYWORDS_TTL", 30 * 24 * 3600)),
+            },
+            "extract": {
+                "max_entries": int(os.getenv("LLM_CACHE_EXTRACT_MAX_ENTRIES", 0)),
+                "max_bytes": int(os.getenv("LLM_CACHE_EXTRACT_MAX_BYTES", 0)),
+                "ttl": int(os.getenv("LLM_CACHE_EXTRACT_TTL", 0)),
+            },
+        }
+    )
+    """Bounds of the LLM response cache, per cache_type ("query", "keywords", "extract").
+    - max_entries / max_bytes: Size kept for the type, 0 for no limit.
+    - ttl: Seconds an entry is served, 0 to keep it forever.
+    - eviction_policy: "lru" or "lfu", which entries go when a limit is exceeded.
+    Set to an empty dict to keep every response forever.
+    """
+
+    entity_linker_config: dict[str, Any] = field(
+        default_factory=lambda: {
+            "enabled": os.getenv("ENTITY_LINKER", "false").lower() == "true",
+            "entity_types": [
+                t.strip()
+                for t in os.getenv(
+                    "ENTITY_LINKER_TYPES",
+                    "Book Name,Author,Manufacturer,Seller Name",
+                ).split(",")
+                if t.strip()
+            ],
+            "min_chars": int(os.getenv("ENTITY_LINKER_MIN_CHARS", 4)),
+            "min_coverage": float(os.getenv("ENTITY_LINKER_MIN_COVERAGE", 0.5)),
+        }
+    )
+    """Local lookup of the graph entities named in a query.
+    When it finds some, a local mode kg_query seeds retrieval with them and
+    skips the keyword extraction LLM call.
+    - enabled: Turn the linker on.
+    - entity_types: Types of the nodes that can be linked, empty for all types.
+      Category hubs are left out by default, their names are common words.
+    - min_chars: Shortest node id (without spaces and punctuation) that can be linked.
+    - min_coverage: Share of the query words the linked names must span.
+    """
+
     # LLM Configuration
     # ---
 
@@ -227,6 +294,9 @@ class LightRAG:
     vector_db_storage_cls_kwargs: dict[str, Any] = field(default_factory=dict)
     """Additional parameters for vector database storage."""
 
+    kv_storage_cls_kwargs: dict[str, Any] = field(default_factory=dict)
+    """Additional parameters for key-value storage, e.g. {"append_log": True} for JsonKVStorage."""
+
     namespace_prefix: str = field(default="")
     """Prefix for namespacing stored data across different environments."""
 
@@ -236,6 +306,27 @@ class LightRAG:
     enable_llm_cache_for_entity_extract: bool = field(default=True)
     """If True, enables caching for entity extraction steps to reduce LLM costs."""
 
+    enable_lexical_index: bool = field(
+        default=os.getenv("LEXICAL_INDEX", "false").lower() == "true"
+    )
+    """Maintains a BM25 index over the text chunks for QueryParam.chunk_retrieval "lexical" and "hybrid"."""
+
+    enable_attribute_store: bool = field(
+        default=os.getenv("ATTRIBUTE_STORE", "false").lower() == "true"
+    )
+    """Keeps the numeric catalog attributes of custom KG "attributes" records in a columnar store,
+    used to filter retrieval by price, rating, discount or sales and to answer pure facet questions."""
+
+    enable_request_cache: bool = field(
+        default=os.getenv("REQUEST_CACHE", "true").lower() == "true"
+    )
+    """Memoizes the graph, chunk and vector reads made while answering one query, see RequestScope."""
+
+    query_batch_concurrency: int = field(
+        default=int(os.getenv("QUERY_BATCH_CONCURRENCY", 8))
+    )
+    """Maximum number of queries of aquery_batch, and of their keyword extractions, run at once."""
+
     # Extensions
     # ---
 
@@ -375,6 +466,23 @@ class LightRAG:
             ),
             embedding_func=self.embedding_func,
         )
+        # Reverse indexes used by adelete_by_doc_id: doc -> chunk ids and
+        # chunk -> entities / relations extracted from it
+        self.doc_chunks_index: BaseKVStorage = self.key_string_value_json_storage_cls(  # type: ignore
+            namespace=make_namespace(
+                self.namespace_prefix, NameSpace.KV_STORE_DOC_CHUNKS_INDEX
+            ),
+            embedding_func=self.embedding_func,
+        )
+        self.chunk_graph_index: BaseKVStorage = self.key_string_value_json_storage_cls(  # type: ignore
+            namespace=make_namespace(
+                self.namespace_prefix, NameSpace.KV_STORE_CHUNK_GRAPH_INDEX
+            ),
+            embedding_func=self.embedding_func,
+        )
+        # Set once the documents inserted before the index existed are indexed too
+        self._doc_chunks_indexed = False
+        self._doc_chunks_index_lock = asyncio.Lock()
         self.chunk_entity_relation_graph: BaseGraphStorage = self.graph_storage_cls(  # type: ignore
             namespace=make_namespace(
                 self.namespace_prefix, NameSpace.GRAPH_STORE_CHUNK_ENTITY_RELATION
@@ -402,6 +510,27 @@ class LightRAG:
             ),
             embedding_func=self.embedding_func,
         )
+        self.lexical_index: LexicalIndex | None = (
+            LexicalIndex(
+                namespace=make_namespace(
+                    self.namespace_prefix, NameSpace.LEXICAL_INDEX_CHUNKS
+                ),
+                global_config=global_config,
+                text_chunks=self.text_chunks,
+            )
+            if self.enable_lexical_index
+            else None
+        )
+        self.attribute_store: AttributeStore | None = (
+            AttributeStore(
+                namespace=make_namespace(
+                    self.namespace_prefix, NameSpace.ATTRIBUTE_STORE_BOOKS
+                ),
+                global_config=global_config,
+            )
+            if self.enable_attribute_store
+            else None
+        )
 
         # Initialize document status storage
         self.doc_status: DocStatusStorage = self.doc_status_storage_cls(
@@ -473,6 +602,10 @@ class LightRAG:
                 self.chunk_entity_relation_graph,
                 self.llm_response_cache,
                 self.doc_status,
+                self.doc_chunks_index,
+                self.chunk_graph_index,
+                self.lexical_index,
+                self.attribute_store,
             ):
                 if storage:
                     tasks.append(storage.initialize())
@@ -496,11 +629,16 @@ class LightRAG:
                 self.chunk_entity_relation_graph,
                 self.llm_response_cache,
                 self.doc_status,
+                self.doc_chunks_index,
+                self.chunk_graph_index,
+                self.lexical_index,
+                self.attribute_store,
             ):
                 if storage:
                     tasks.append(storage.finalize())
 
             await asyncio.gather(*tasks)
+            await persist_embedding_cache()
 
             self._storages_status = StoragesStatus.FINALIZED
             logger.debug("Finalized Storages")
@@ -658,7 +796,7 @@ class LightRAG:
                 self.chunks_vdb.upsert(inserting_chunks),
                 self._process_entity_relation_graph(inserting_chunks),
                 self.full_docs.upsert(new_docs),
-                self.text_chunks.upsert(inserting_chunks),
+                self._upsert_text_chunks(inserting_chunks),
             ]
             await asyncio.gather(*tasks)
 
@@ -709,10 +847,9 @@ class LightRAG:
             }.items()
         }
 
-        # 3. Generate document initial status
+        # 3. Generate document initial status, the content itself goes to full_docs
         new_docs: dict[str, Any] = {
             id_: {
-                "content": content,
                 "content_summary": self._get_content_summary(content),
                 "content_length": len(content),
                 "status": DocStatus.PENDING,
@@ -750,8 +887,16 @@ class LightRAG:
             logger.info("No new unique documents were found.")
             return
 
-        # 5. Store status document
+        # 5. Store document content and status
+        await self.full_docs.upsert(
+            {doc_id: {"content": unique_contents[doc_id]} for doc_id in new_docs}
+        )
         await self.doc_status.upsert(new_docs)
+        # Make the queue durable right away, processing may not follow immediately
+        await asyncio.gather(
+            self.full_docs.index_done_callback(),
+            self.doc_status.index_done_callback(),
+        )
         logger.info(f"Stored {len(new_docs)} new unique documents")
 
     async def apipeline_process_enqueue_documents(
@@ -869,7 +1014,29 @@ class LightRAG:
                             doc_id, status_doc = doc_id_processing_status
                             
                             start_time = time.time()
-                            
+
+                            # Status records reference full_docs, older ones still carry the content
+                            full_doc = await self.full_docs.get_by_id(doc_id)
+                            content = (
+                                full_doc["content"] if full_doc else status_doc.content
+                            )
+                            if content is None:
+                                error_msg = f"Content of document {doc_id} not found in full_docs"
+                                logger.error(error_msg)
+                                await self.doc_status.upsert(
+                                    {
+                                        doc_id: {
+                                            "status": DocStatus.FAILED,
+                                            "error": error_msg,
+                                            "content_summary": status_doc.content_summary,
+                                            "content_length": status_doc.content_length,
+                                            "created_at": status_doc.created_at,
+                                            "updated_at": datetime.now().isoformat(),
+                                        }
+                                    }
+                                )
+                                continue
+
                             # Generate chunks from document
                             chunks: dict[str, Any] = {
                                 compute_mdhash_id(dp["content"], prefix="chunk-"): {
@@ -877,7 +1044,7 @@ class LightRAG:
                                     "full_doc_id": doc_id,
                                 }
                                 for dp in self.chunking_func(
-                                    status_doc.content,
+                                    content,
                                     split_by_character,
                                     split_by_character_only,
                                     self.chunk_overlap_token_size,
@@ -893,7 +1060,6 @@ class LightRAG:
                                         doc_id: {
                                             "status": DocStatus.PROCESSING,
                                             "updated_at": datetime.now().isoformat(),
-                                            "content": status_doc.content,
                                             "content_summary": status_doc.content_summary,
                                             "content_length": status_doc.content_length,
                                             "created_at": status_doc.created_at,
@@ -909,11 +1075,11 @@ class LightRAG:
                             )
                             full_docs_task = asyncio.create_task(
                                 self.full_docs.upsert(
-                                    {doc_id: {"content": status_doc.content}}
+                                    {doc_id: {"content": content}}
                                 )
                             )
                             text_chunks_task = asyncio.create_task(
-                                self.text_chunks.upsert(chunks)
+                                self._upsert_text_chunks(chunks)
                             )
                             tasks = [
                                 doc_status_task,
@@ -929,7 +1095,6 @@ class LightRAG:
                                         doc_id: {
                                             "status": DocStatus.PROCESSED,
                                             "chunks_count": len(chunks),
-                                            "content": status_doc.content,
                                             "content_summary": status_doc.content_summary,
                                             "content_length": status_doc.content_length,
                                             "created_at": status_doc.created_at,
@@ -967,7 +1132,6 @@ class LightRAG:
                                         doc_id: {
                                             "status": DocStatus.FAILED,
                                             "error": str(e),
-                                            "content": status_doc.content,
                                             "content_summary": status_doc.content_summary,
                                             "content_length": status_doc.content_length,
                                             "created_at": status_doc.created_at,
@@ -1035,6 +1199,8 @@ class LightRAG:
                 entity_vdb=self.entities_vdb,
                 relationships_vdb=self.relationships_vdb,
                 llm_response_cache=self.llm_response_cache,
+                doc_chunks_index=self.doc_chunks_index,
+                chunk_graph_index=self.chunk_graph_index,
                 global_config=asdict(self),
             )
         except Exception as e:
@@ -1043,17 +1209,28 @@ class LightRAG:
         end_time = time.perf_counter()
         logging.info(f"\n\n⏳ Time to extract entity and relation for chunk: {(end_time - start_time):.4f} s")
 
+    async def _upsert_text_chunks(self, chunks: dict[str, dict[str, Any]]) -> None:
+        """Store chunks in text_chunks and index them in the lexical index"""
+        await self.text_chunks.upsert(chunks)
+        if self.lexical_index is not None:
+            await self.lexical_index.upsert(chunks)
+
     async def _insert_done(self) -> None:
         tasks = [
             cast(StorageNameSpace, storage_inst).index_done_callback()
             for storage_inst in [  # type: ignore
                 self.full_docs,
+                self.doc_status,
                 self.text_chunks,
                 self.llm_response_cache,
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
                 self.chunk_entity_relation_graph,
+                self.doc_chunks_index,
+                self.chunk_graph_index,
+                self.lexical_index,
+                self.attribute_store,
             ]
             if storage_inst is not None
         ]
@@ -1078,19 +1255,33 @@ class LightRAG:
     async def ainsert_custom_kg(
         self, custom_kg: dict[str, Any], full_doc_id: str = None
     ) -> None:
+        """Insert a prebuilt knowledge graph in bulk.
+
+        Entities and relationships are deduplicated in memory (later records
+        win, their source_ids are merged) and written with one batched graph
+        upsert and one vector upsert per namespace. Sources already in the
+        storage are deleted first so re-inserting them replaces their data.
+        Optional "attributes" records ({"source_id", "name", <numeric columns>})
+        go to the attribute store when it is enabled.
+        """
         update_storage = False
+        start_time = time.perf_counter()
 
-        source_ids = {chunk["source_id"] for chunk in custom_kg.get("chunks", [])}
-        # try:
-        #     await asyncio.gather(*(self.adelete_by_doc_id(source_id) for source_id in source_ids))
-        # except Exception as e:
-        #     raise Exception(f"Failed to delete documents for source_ids: {str(e)}")
+        source_ids = list(
+            dict.fromkeys(chunk["source_id"] for chunk in custom_kg.get("chunks", []))
+        )
         try:
-            for source_id in source_ids:
-                await self.adelete_by_doc_id(source_id)
+            await self.adelete_by_doc_ids(source_ids)
         except Exception as e:
             raise Exception(f"Failed to delete documents for source_ids: {str(e)}")
-        
+
+        def merge_source_ids(*source_id_fields: str | None) -> str:
+            sources = {}
+            for field_value in source_id_fields:
+                if field_value:
+                    sources.update(dict.fromkeys(field_value.split(GRAPH_FIELD_SEP)))
+            return GRAPH_FIELD_SEP.join(sources)
+
         try:
             # Insert chunks into vector storage
             all_chunks_data: dict[str, dict[str, str]] = {}
@@ -1127,15 +1318,32 @@ class LightRAG:
             if all_chunks_data:
                 await asyncio.gather(
                     self.chunks_vdb.upsert(all_chunks_data),
-                    self.text_chunks.upsert(all_chunks_data),
+                    self._upsert_text_chunks(all_chunks_data),
                 )
 
-            # Insert entities into knowledge graph
-            all_entities_data: list[dict[str, str]] = []
+            # Numeric attributes of the books, keyed by the source id of their chunk
+            if self.attribute_store is not None and custom_kg.get("attributes"):
+                await self.attribute_store.upsert(
+                    {
+                        record["source_id"]: {
+                            **record,
+                            "chunk_id": chunk_to_source_map.get(record["source_id"], ""),
+                        }
+                        for record in custom_kg["attributes"]
+                    }
+                )
+                update_storage = True
+
+            # chunk id -> entities / relations, for the deletion index
+            chunk_graph: dict[str, dict[str, set]] = {
+                chunk_id: {"entities": set(), "relations": set()}
+                for chunk_id in all_chunks_data
+            }
+
+            # Deduplicate entities
+            nodes: dict[str, dict[str, str]] = {}
             for entity_data in custom_kg.get("entities", []):
                 entity_name = entity_data["entity_name"]
-                entity_type = entity_data.get("entity_type", "UNKNOWN")
-                description = entity_data.get("description", "No description provided")
                 source_chunk_id = entity_data.get("source_id", "UNKNOWN")
                 source_id = chunk_to_source_map.get(source_chunk_id, "UNKNOWN")
 
@@ -1145,28 +1353,27 @@ class LightRAG:
                         f"Entity '{entity_name}' has an UNKNOWN source_id. Please check the source mapping."
                     )
 
-                # Prepare node data
-                node_data: dict[str, str] = {
-                    "entity_type": entity_type,
-                    "description": description,
-                    "source_id": source_id,
-                }
-                # Insert node data into the knowledge graph
-                await self.chunk_entity_relation_graph.upsert_node(
-                    entity_name, node_data=node_data
+                previous = nodes.get(entity_name, {})
+                nodes[entity_name] = with_description_tokens(
+                    {
+                        "entity_type": entity_data.get("entity_type", "UNKNOWN"),
+                        "description": entity_data.get(
+                            "description", "No description provided"
+                        ),
+                        "source_id": merge_source_ids(
+                            previous.get("source_id"), source_id
+                        ),
+                    }
                 )
-                node_data["entity_name"] = entity_name
-                all_entities_data.append(node_data)
-                update_storage = True
+                if source_id in chunk_graph:
+                    chunk_graph[source_id]["entities"].add(entity_name)
 
-            # Insert relationships into knowledge graph
-            all_relationships_data: list[dict[str, str]] = []
+            # Deduplicate relationships
+            edges: dict[tuple[str, str], dict[str, Any]] = {}
+            endpoint_sources: dict[str, str] = {}
             for relationship_data in custom_kg.get("relationships", []):
                 src_id = relationship_data["src_id"]
                 tgt_id = relationship_data["tgt_id"]
-                description = relationship_data["description"]
-                keywords = relationship_data["keywords"]
-                weight = relationship_data.get("weight", 1.0)
                 source_chunk_id = relationship_data.get("source_id", "UNKNOWN")
                 source_id = chunk_to_source_map.get(source_chunk_id, "UNKNOWN")
 
@@ -1176,70 +1383,116 @@ class LightRAG:
                         f"Relationship from '{src_id}' to '{tgt_id}' has an UNKNOWN source_id. Please check the source mapping."
                     )
 
-                # Check if nodes exist in the knowledge graph
-                for need_insert_id in [src_id, tgt_id]:
-                    if not (
-                        await self.chunk_entity_relation_graph.has_node(need_insert_id)
-                    ):
-                        await self.chunk_entity_relation_graph.upsert_node(
-                            need_insert_id,
-                            node_data={
-                                "source_id": source_id,
-                                "description": "UNKNOWN",
-                                "entity_type": "UNKNOWN",
-                            },
+                previous = edges.get((src_id, tgt_id), {})
+                edges[(src_id, tgt_id)] = with_description_tokens(
+                    {
+                        "weight": relationship_data.get("weight", 1.0),
+                        "description": relationship_data["description"],
+                        "keywords": relationship_data["keywords"],
+                        "source_id": merge_source_ids(
+                            previous.get("source_id"), source_id
+                        ),
+                    }
+                )
+                for need_insert_id in (src_id, tgt_id):
+                    if need_insert_id not in nodes:
+                        endpoint_sources[need_insert_id] = merge_source_ids(
+                            endpoint_sources.get(need_insert_id), source_id
                         )
-
-                # Insert edge into the knowledge graph
-                await self.chunk_entity_relation_graph.upsert_edge(
-                    src_id,
-                    tgt_id,
-                    edge_data={
-                        "weight": weight,
-                        "description": description,
-                        "keywords": keywords,
+                if source_id in chunk_graph:
+                    chunk_graph[source_id]["entities"].update((src_id, tgt_id))
+                    chunk_graph[source_id]["relations"].add((src_id, tgt_id))
+
+            # Merge with what other sources already put in the graph
+            graph = self.chunk_entity_relation_graph
+            existing_nodes, existing_edges = await asyncio.gather(
+                graph.get_nodes_batch(list(nodes.keys() | endpoint_sources.keys())),
+                graph.get_edges_batch(list(edges)),
+            )
+            for entity_name, node_data in nodes.items():
+                if entity_name in existing_nodes:
+                    node_data["source_id"] = merge_source_ids(
+                        existing_nodes[entity_name].get("source_id"),
+                        node_data["source_id"],
+                    )
+            for pair, edge_data in edges.items():
+                if pair in existing_edges:
+                    edge_data["source_id"] = merge_source_ids(
+                        existing_edges[pair].get("source_id"), edge_data["source_id"]
+                    )
+            # Relationship endpoints that are not entities of any source yet
+            placeholder_nodes = {
+                node_id: with_description_tokens(
+                    {
                         "source_id": source_id,
-                    },
+                        "description": "UNKNOWN",
+                        "entity_type": "UNKNOWN",
+                    }
                 )
-                edge_data: dict[str, str] = {
-                    "src_id": src_id,
-                    "tgt_id": tgt_id,
-                    "description": description,
-                    "keywords": keywords,
-                    "source_id": source_id,
-                    "weight": weight,
-                }
-                all_relationships_data.append(edge_data)
+                for node_id, source_id in endpoint_sources.items()
+                if node_id not in nodes and node_id not in existing_nodes
+            }
+
+            # Insert entities and relationships into knowledge graph
+            if nodes or placeholder_nodes:
+                await graph.upsert_nodes_batch({**placeholder_nodes, **nodes})
+                update_storage = True
+            if edges:
+                await graph.upsert_edges_batch(edges)
                 update_storage = True
 
             # Insert entities into vector storage with consistent format
             data_for_vdb = {
-                compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
-                    "content": dp["entity_name"] + "\n" + dp["description"],
-                    "entity_name": dp["entity_name"],
+                compute_mdhash_id(entity_name, prefix="ent-"): {
+                    "content": entity_name + "\n" + dp["description"],
+                    "entity_name": entity_name,
                     "source_id": dp["source_id"],
                     "description": dp["description"],
                     "entity_type": dp["entity_type"],
                 }
-                for dp in all_entities_data
+                for entity_name, dp in nodes.items()
             }
             await self.entities_vdb.upsert(data_for_vdb)
 
             # Insert relationships into vector storage with consistent format
             data_for_vdb = {
-                compute_mdhash_id(dp["src_id"] + dp["tgt_id"], prefix="rel-"): {
-                    "src_id": dp["src_id"],
-                    "tgt_id": dp["tgt_id"],
+                compute_mdhash_id(src_id + tgt_id, prefix="rel-"): {
+                    "src_id": src_id,
+                    "tgt_id": tgt_id,
                     "source_id": dp["source_id"],
-                    "content": f"{dp['keywords']}\t{dp['src_id']}\n{dp['tgt_id']}\n{dp['description']}",
+                    "content": f"{dp['keywords']}\t{src_id}\n{tgt_id}\n{dp['description']}",
                     "keywords": dp["keywords"],
                     "description": dp["description"],
                     "weight": dp["weight"],
                 }
-                for dp in all_relationships_data
+                for (src_id, tgt_id), dp in edges.items()
             }
             await self.relationships_vdb.upsert(data_for_vdb)
 
+            await update_deletion_index(
+                {
+                    chunk_id: {
+                        "entities": sorted(elements["entities"]),
+                        "relations": [list(pair) for pair in sorted(elements["relations"])],
+                    }
+                    for chunk_id, elements in chunk_graph.items()
+                },
+                {
+                    chunk_id: chunk["full_doc_id"]
+                    for chunk_id, chunk in all_chunks_data.items()
+                },
+                self.doc_chunks_index,
+                self.chunk_graph_index,
+            )
+            await self.ainvalidate_cache_for(
+                entities={
+                    *nodes,
+                    *placeholder_nodes,
+                    *(n for pair in edges for n in pair),
+                },
+                chunks=all_chunks_data,
+            )
+
         except Exception as e:
             logger.error(f"Error in ainsert_custom_kg: {e}")
             raise
@@ -1247,6 +1500,13 @@ class LightRAG:
             if update_storage:
                 await self._insert_done()
 
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"Inserted custom KG: {len(source_ids)} sources, {len(nodes)} entities, "
+            f"{len(edges)} relationships in {elapsed:.2f}s "
+            f"({len(source_ids) / elapsed if elapsed else 0:.1f} sources/s)"
+        )
+
     def query(
         self,
         query: str,
@@ -1275,6 +1535,18 @@ class LightRAG:
 
         return result
 
+    def query_batch(
+        self,
+        queries: list[str],
+        param: QueryParam = QueryParam(),
+        system_prompt: str | None = None,
+    ) -> list[str]:
+        """Answer several queries with the same parameters, see aquery_batch"""
+        loop = always_get_an_event_loop()
+        return loop.run_until_complete(
+            self.aquery_batch(queries, param, system_prompt)
+        )
+
     async def aquery(
         self,
         query: str,
@@ -1292,13 +1564,147 @@ class LightRAG:
         Returns:
             str: The result of the query execution.
         """
+        if self.attribute_store is not None:
+            facet_response, param = await self._apply_facets(query, param)
+            if facet_response is not None:
+                return facet_response
+
+        scope = RequestScope() if self.enable_request_cache else None
+        response = await self._run_query(
+            query, param, system_prompt, self._query_storages(scope)
+        )
+        if scope is not None:
+            scope.log_stats()
+        await self._query_done()
+        return response
+
+    async def aquery_batch(
+        self,
+        queries: list[str],
+        param: QueryParam = QueryParam(),
+        system_prompt: str | None = None,
+    ) -> list[str]:
+        """
+        Answer several queries with the same parameters.
+
+        Args:
+            queries (list[str]): The queries, duplicates are answered once.
+            param (QueryParam): Configuration parameters for every query, not modified. Answers are never streamed.
+            system_prompt (Optional[str]): Custom prompts for fine-tuned control over the system's behavior. Defaults to None, which uses PROMPTS["rag_response"].
+
+        Returns:
+            list[str]: The answers, in the order of queries.
+        """
+        answers: dict[str, str] = {}
+        stream = self.aquery_batch_stream(queries, param, system_prompt)
+        try:
+            async for query, answer in stream:
+                if isinstance(answer, Exception):
+                    raise answer
+                answers[query] = answer
+        finally:
+            # Cancels the queries still running when one failed
+            await stream.aclose()
+        return [answers[query.strip()] for query in queries]
+
+    async def aquery_batch_stream(
+        self,
+        queries: list[str],
+        param: QueryParam = QueryParam(),
+        system_prompt: str | None = None,
+    ) -> AsyncIterator[tuple[str, str | Exception]]:
+        """Answer several queries, yielding (query, answer) as the answers complete.
+
+        The keywords of all the queries are extracted up front, at most
+        query_batch_concurrency at a time, and their entity and relation
+        searches are run as one batch per vector storage. Each query is then
+        answered in its own RequestScope, forked from the batch one so that
+        it finds its searches there, and dropped once the query is done. A
+        query that fails yields its exception, the other queries go on.
+        """
+        unique = list(dict.fromkeys(query.strip() for query in queries))
+        params = {
+            query: replace(
+                param,
+                stream=False,
+                hl_keywords=list(param.hl_keywords),
+                ll_keywords=list(param.ll_keywords),
+            )
+            for query in unique
+        }
+        answers: asyncio.Queue[tuple[str, str | Exception]] = asyncio.Queue()
+        if self.attribute_store is not None:
+            for query in unique:
+                try:
+                    facet_response, params[query] = await self._apply_facets(
+                        query, params[query]
+                    )
+                except Exception as e:
+                    facet_response = e
+                if facet_response is not None:
+                    del params[query]
+                    answers.put_nowait((query, facet_response))
+
+        scope = RequestScope() if self.enable_request_cache else None
+        graph, entities_vdb, relationships_vdb, _, _ = self._query_storages(scope)
+        await prepare_query_batch(
+            list(params),
+            list(params.values()),
+            graph,
+            entities_vdb,
+            relationships_vdb,
+            asdict(self),
+            hashing_kv=self.llm_response_cache,
+            max_concurrency=self.query_batch_concurrency,
+        )
+
+        semaphore = asyncio.Semaphore(self.query_batch_concurrency)
+
+        async def answer(query: str, query_param: QueryParam) -> None:
+            query_scope = None if scope is None else scope.fork()
+            try:
+                async with semaphore:
+                    result = await self._run_query(
+                        query,
+                        query_param,
+                        system_prompt,
+                        self._query_storages(query_scope),
+                    )
+            except Exception as e:
+                logger.error(f"Batch query {query!r} failed: {e}")
+                result = e
+            finally:
+                if query_scope is not None:
+                    scope.add_stats(query_scope)
+            answers.put_nowait((query, result))
+
+        tasks = [asyncio.create_task(answer(q, p)) for q, p in params.items()]
+        try:
+            for _ in range(len(unique)):
+                yield await answers.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if scope is not None:
+                scope.log_stats()
+            await self._query_done()
+
+    async def _run_query(
+        self,
+        query: str,
+        param: QueryParam,
+        system_prompt: str | None,
+        storages: tuple,
+    ) -> str | AsyncIterator[str]:
+        """Answer a query in param.mode from the storages given by _query_storages"""
+        graph, entities_vdb, relationships_vdb, chunks_vdb, text_chunks = storages
         if param.mode in ["local", "global", "hybrid"]:
             response = await kg_query(
                 query.strip(),
-                self.chunk_entity_relation_graph,
-                self.entities_vdb,
-                self.relationships_vdb,
-                self.text_chunks,
+                graph,
+                entities_vdb,
+                relationships_vdb,
+                text_chunks,
                 param,
                 asdict(self),
                 hashing_kv=self.llm_response_cache
@@ -1316,8 +1722,8 @@ class LightRAG:
         elif param.mode == "naive":
             response = await naive_query(
                 query.strip(),
-                self.chunks_vdb,
-                self.text_chunks,
+                chunks_vdb,
+                text_chunks,
                 param,
                 asdict(self),
                 hashing_kv=self.llm_response_cache
@@ -1331,15 +1737,16 @@ class LightRAG:
                     embedding_func=self.embedding_func,
                 ),
                 system_prompt=system_prompt,
+                lexical_index=self.lexical_index,
             )
         elif param.mode == "mix":
             response = await mix_kg_vector_query(
                 query.strip(),
-                self.chunk_entity_relation_graph,
-                self.entities_vdb,
-                self.relationships_vdb,
-                self.chunks_vdb,
-                self.text_chunks,
+                graph,
+                entities_vdb,
+                relationships_vdb,
+                chunks_vdb,
+                text_chunks,
                 param,
                 asdict(self),
                 hashing_kv=self.llm_response_cache
@@ -1353,12 +1760,70 @@ class LightRAG:
                     embedding_func=self.embedding_func,
                 ),
                 system_prompt=system_prompt,
+                lexical_index=self.lexical_index,
             )
         else:
             raise ValueError(f"Unknown mode {param.mode}")
-        await self._query_done()
         return response
 
+    def _query_storages(self, scope: RequestScope | None) -> tuple:
+        """Graph, entity, relation and chunk vector storages and text chunks read by a query.
+
+        With a scope, the storages are wrapped so that the reads are memoized
+        for the lifetime of the query.
+        """
+        storages = (
+            self.chunk_entity_relation_graph,
+            self.entities_vdb,
+            self.relationships_vdb,
+            self.chunks_vdb,
+            self.text_chunks,
+        )
+        if scope is None:
+            return storages
+        graph, entities_vdb, relationships_vdb, chunks_vdb, text_chunks = storages
+        return (
+            scope.graph(graph),
+            scope.vector(entities_vdb),
+            scope.vector(relationships_vdb),
+            scope.vector(chunks_vdb),
+            scope.kv(text_chunks),
+        )
+
+    async def _apply_facets(
+        self, query: str, param: QueryParam
+    ) -> tuple[str | None, QueryParam]:
+        """Resolve the attribute filters of a query.
+
+        A question made only of facets ("books under 100k rated above 4.5")
+        is answered from the attribute store and its answer returned. Otherwise
+        None is returned with the param to query with: a copy restricted by
+        chunk_filter when there are filters, param itself otherwise. The
+        caller's param is never modified, it may be reused by later queries.
+        """
+        facet = parse_facet_query(query)
+        filters = {
+            **(facet.filters if facet else {}),
+            **{column: tuple(bounds) for column, bounds in param.attribute_filter.items()},
+        }
+        if facet and facet.pure and param.facet_fast_path:
+            books = await self.attribute_store.query(
+                filters,
+                sort_by=facet.sort_by or "quantity_sold",
+                descending=facet.descending if facet.sort_by else True,
+                limit=facet.limit or param.top_k,
+            )
+            logger.info(f"Answered facet query {filters} with {len(books)} books")
+            answer = format_facet_answer(books) if books else PROMPTS["fail_response"]
+            return answer, param
+        if filters:
+            chunk_ids = await self.attribute_store.matching_chunk_ids(filters)
+            logger.info(
+                f"Attribute filter {filters} restricts retrieval to {len(chunk_ids)} chunks"
+            )
+            param = replace(param, chunk_filter=chunk_ids)
+        return None, param
+
     def query_with_separate_keyword_extraction(
         self, query: str, prompt: str, param: QueryParam = QueryParam()
     ):
@@ -1444,6 +1909,7 @@ class LightRAG:
                     global_config=asdict(self),
                     embedding_func=self.embedding_func,
                 ),
+                lexical_index=self.lexical_index,
             )
         elif param.mode == "mix":
             response = await mix_kg_vector_query(
@@ -1465,6 +1931,7 @@ class LightRAG:
                     global_config=asdict(self),
                     embedding_func=self.embedding_func,
                 ),
+                lexical_index=self.lexical_index,
             )
         else:
             raise ValueError(f"Unknown mode {param.mode}")
@@ -1484,6 +1951,7 @@ class LightRAG:
             await self.entities_vdb.delete_entity(entity_name)
             await self.relationships_vdb.delete_entity_relation(entity_name)
             await self.chunk_entity_relation_graph.delete_node(entity_name)
+            await self.ainvalidate_cache_for(entities=[entity_name])
 
             logger.info(
                 f"Entity '{entity_name}' and its relationships have been deleted."
@@ -1544,6 +2012,7 @@ class LightRAG:
             await self.chunk_entity_relation_graph.remove_edges(
                 [(source_entity, target_entity)]
             )
+            await self.ainvalidate_cache_for(entities=[source_entity, target_entity])
 
             logger.info(
                 f"Successfully deleted relation from '{source_entity}' to '{target_entity}'"
@@ -1599,180 +2068,270 @@ class LightRAG:
         """
         return await self.doc_status.get_docs_by_status(status)
 
+    async def _get_indexed_chunk_ids(self, doc_id: str) -> set[str] | None:
+        """Chunk ids of a document from the deletion index, None if it cannot be read"""
+        try:
+            if not await self._deletion_index_complete():
+                return None
+            record = await self.doc_chunks_index.get_by_id(doc_id)
+        except Exception as e:
+            logger.warning(f"Failed to read the deletion index for {doc_id}: {e}")
+            return None
+        # Every document is indexed, a missing entry means a document without chunks
+        return set(record["chunk_ids"]) if record else set()
+
+    async def _deletion_index_complete(self) -> bool:
+        """Index the chunks of the documents inserted before the deletion index existed.
+
+        The chunk storage is scanned once, then a marker record tells later
+        processes that every document has an entry.
+        """
+        if self._doc_chunks_indexed:
+            return True
+        async with self._doc_chunks_index_lock:
+            if self._doc_chunks_indexed:
+                return True
+            if not await self.doc_chunks_index.get_by_id(DELETION_INDEX_MARKER):
+                all_chunks = await self.text_chunks.get_all()
+                await update_deletion_index(
+                    {},
+                    {
+                        chunk_id: chunk["full_doc_id"]
+                        for chunk_id, chunk in all_chunks.items()
+                        if isinstance(chunk, dict) and chunk.get("full_doc_id")
+                    },
+                    self.doc_chunks_index,
+                    None,
+                )
+                await self.doc_chunks_index.upsert(
+                    {DELETION_INDEX_MARKER: {"chunk_ids": []}}
+                )
+                await self.doc_chunks_index.index_done_callback()
+                logger.info(
+                    f"Added {len(all_chunks)} existing chunks to the deletion index"
+                )
+            self._doc_chunks_indexed = True
+        return True
+
+    async def _get_indexed_chunk_graph(
+        self, chunk_ids: set[str]
+    ) -> tuple[set[str], set[tuple[str, str]]] | None:
+        """Entities and relations extracted from the chunks, None if a chunk is not indexed"""
+        try:
+            records = await asyncio.gather(
+                *[self.chunk_graph_index.get_by_id(c) for c in chunk_ids]
+            )
+        except Exception as e:
+            logger.warning(f"Failed to read the deletion index: {e}")
+            return None
+        if not all(records):
+            return None
+        entities: set[str] = set()
+        relations: set[tuple[str, str]] = set()
+        for record in records:
+            entities.update(record.get("entities") or [])
+            relations.update(tuple(pair) for pair in record.get("relations") or [])
+        return entities, relations
+
+    async def _scan_chunk_graph(
+        self,
+    ) -> tuple[dict[str, dict[str, str]], dict[tuple[str, str], dict[str, str]]]:
+        """Read every node and edge of the graph, for documents missing from the deletion index"""
+        graph = self.chunk_entity_relation_graph
+        all_labels = await graph.get_all_labels()
+        nodes = await graph.get_nodes_batch(all_labels)
+        node_edges = await graph.get_nodes_edges_batch(all_labels)
+        pairs = list({pair for edges in node_edges.values() for pair in edges})
+        edges = await graph.get_edges_batch(pairs)
+        return nodes, edges
+
     async def adelete_by_doc_id(self, doc_id: str) -> None:
         """Delete a document and all its related data
 
         Args:
             doc_id: Document ID to delete
         """
-        try:
-            # 1. Get the document status and related data
-            # doc_status = await self.doc_status.get_by_id(doc_id)
-            # if not doc_status:
-            #     logger.warning(f"Document {doc_id} not found")
-            #     return
-
-            logging.info(f"Starting deletion for document {doc_id}")
-
-            # 2. Get all chunks related to this document
-            # Find all chunks where full_doc_id equals the current doc_id
-            all_chunks = await self.text_chunks.get_all()
-            related_chunks = {
-                chunk_id: chunk_data
-                for chunk_id, chunk_data in all_chunks.items()
-                if isinstance(chunk_data, dict)
-                and chunk_data.get("full_doc_id") == doc_id
-            }
+        await self.adelete_by_doc_ids([doc_id])
 
-            if not related_chunks:
-                logger.warning(f"No chunks found for document {doc_id}")
-                return
+    async def adelete_by_doc_ids(self, doc_ids: list[str]) -> None:
+        """Delete several documents and all their related data in one pass
 
-            # Get all related chunk IDs
-            chunk_ids = set(related_chunks.keys())
-            logger.debug(f"Found {len(chunk_ids)} chunks to delete")
+        The chunks of the documents and the entities and relations extracted
+        from them are looked up in the deletion index, so only the affected
+        records are read. Documents inserted before the index existed are
+        added to it by a one-time scan of the chunk storage; the storages are
+        only scanned per call when the index cannot be read.
 
-            # 3. Before deleting, check the related entities and relationships for these chunks
-            for chunk_id in chunk_ids:
-                # Check entities
-                entities_storage = await self.entities_vdb.client_storage
-                entities = [
-                    dp
-                    for dp in entities_storage["data"]
-                    if chunk_id in dp.get("source_id")
-                ]
-                logger.debug(f"Chunk {chunk_id} has {len(entities)} related entities")
+        Args:
+            doc_ids: Document IDs to delete
+        """
+        if not doc_ids:
+            return
+        docs_label = ", ".join(doc_ids)
+        try:
+            logging.info(f"Starting deletion for document {docs_label}")
 
-                # Check relationships
-                relationships_storage = await self.relationships_vdb.client_storage
-                relations = [
-                    dp
-                    for dp in relationships_storage["data"]
-                    if chunk_id in dp.get("source_id")
-                ]
-                logger.debug(f"Chunk {chunk_id} has {len(relations)} related relations")
+            # 1. Get all chunks related to these documents
+            indexed_chunk_ids = await asyncio.gather(
+                *[self._get_indexed_chunk_ids(d) for d in doc_ids]
+            )
+            chunk_ids = set()
+            unindexed_doc_ids = set()
+            for d, ids in zip(doc_ids, indexed_chunk_ids):
+                if ids is None:
+                    unindexed_doc_ids.add(d)
+                else:
+                    chunk_ids.update(ids)
+            if unindexed_doc_ids:
+                # Find all chunks where full_doc_id is one of the unindexed doc_ids
+                all_chunks = await self.text_chunks.get_all()
+                chunk_ids.update(
+                    chunk_id
+                    for chunk_id, chunk_data in all_chunks.items()
+                    if isinstance(chunk_data, dict)
+                    and chunk_data.get("full_doc_id") in unindexed_doc_ids
+                )
 
-            # Continue with the original deletion process...
+            if not chunk_ids:
+                logger.warning(f"No chunks found for document {docs_label}")
+                return
+            logger.debug(f"Found {len(chunk_ids)} chunks to delete")
 
-            # 4. Delete chunks from vector database
-            if chunk_ids:
-                await self.chunks_vdb.delete(chunk_ids)
-                await self.text_chunks.delete(chunk_ids)
+            # 2. Delete chunks from vector database
+            await self.chunks_vdb.delete(chunk_ids)
+            await self.text_chunks.delete(chunk_ids)
+            if self.lexical_index is not None:
+                await self.lexical_index.delete(chunk_ids)
+            if self.attribute_store is not None:
+                await self.attribute_store.delete_by_chunk_ids(chunk_ids)
+
+            # 3. Find the entities and relationships that have these chunks as source
+            graph = self.chunk_entity_relation_graph
+            chunk_graph = await self._get_indexed_chunk_graph(chunk_ids)
+            indexed = chunk_graph is not None
+            if indexed:
+                candidate_entities, candidate_relations = chunk_graph
+                nodes, edges = await asyncio.gather(
+                    graph.get_nodes_batch(list(candidate_entities)),
+                    graph.get_edges_batch(list(candidate_relations)),
+                )
+            else:
+                nodes, edges = await self._scan_chunk_graph()
 
-            # 5. Find and process entities and relationships that have these chunks as source
-            # Get all nodes and edges from the graph storage using storage-agnostic methods
             entities_to_delete = set()
-            entities_to_update = {}  # entity_name -> new_source_id
+            entities_to_update = {}  # entity_name -> node data with the new source_id
             relationships_to_delete = set()
-            relationships_to_update = {}  # (src, tgt) -> new_source_id
-
-            # Process entities - use storage-agnostic methods
-            all_labels = await self.chunk_entity_relation_graph.get_all_labels()
-            for node_label in all_labels:
-                node_data = await self.chunk_entity_relation_graph.get_node(node_label)
-                if node_data and "source_id" in node_data:
-                    # Split source_id using GRAPH_FIELD_SEP
-                    sources = set(node_data["source_id"].split(GRAPH_FIELD_SEP))
-                    sources.difference_update(chunk_ids)
-                    if not sources:
-                        entities_to_delete.add(node_label)
-                        logger.debug(
-                            f"Entity {node_label} marked for deletion - no remaining sources"
-                        )
-                    else:
-                        new_source_id = GRAPH_FIELD_SEP.join(sources)
-                        entities_to_update[node_label] = new_source_id
-                        logger.debug(
-                            f"Entity {node_label} will be updated with new source_id: {new_source_id}"
-                        )
+            relationships_to_update = {}  # (src, tgt) -> edge data with the new source_id
 
-            # Process relationships
-            for node_label in all_labels:
-                node_edges = await self.chunk_entity_relation_graph.get_node_edges(
-                    node_label
-                )
-                if node_edges:
-                    for src, tgt in node_edges:
-                        edge_data = await self.chunk_entity_relation_graph.get_edge(
-                            src, tgt
-                        )
-                        if edge_data and "source_id" in edge_data:
-                            # Split source_id using GRAPH_FIELD_SEP
-                            sources = set(edge_data["source_id"].split(GRAPH_FIELD_SEP))
-                            sources.difference_update(chunk_ids)
-                            if not sources:
-                                relationships_to_delete.add((src, tgt))
-                                logger.debug(
-                                    f"Relationship {src}-{tgt} marked for deletion - no remaining sources"
-                                )
-                            else:
-                                new_source_id = GRAPH_FIELD_SEP.join(sources)
-                                relationships_to_update[(src, tgt)] = new_source_id
-                                logger.debug(
-                                    f"Relationship {src}-{tgt} will be updated with new source_id: {new_source_id}"
-                                )
+            for node_label, node_data in nodes.items():
+                if "source_id" not in node_data:
+                    continue
+                # Split source_id using GRAPH_FIELD_SEP
+                sources = set(node_data["source_id"].split(GRAPH_FIELD_SEP))
+                if sources.isdisjoint(chunk_ids):
+                    continue
+                sources.difference_update(chunk_ids)
+                if not sources:
+                    entities_to_delete.add(node_label)
+                    logger.debug(
+                        f"Entity {node_label} marked for deletion - no remaining sources"
+                    )
+                else:
+                    new_source_id = GRAPH_FIELD_SEP.join(sources)
+                    entities_to_update[node_label] = {
+                        **node_data,
+                        "source_id": new_source_id,
+                    }
+                    logger.debug(
+                        f"Entity {node_label} will be updated with new source_id: {new_source_id}"
+                    )
 
-            # Delete entities
+            for (src, tgt), edge_data in edges.items():
+                if "source_id" not in edge_data:
+                    continue
+                sources = set(edge_data["source_id"].split(GRAPH_FIELD_SEP))
+                if sources.isdisjoint(chunk_ids):
+                    continue
+                sources.difference_update(chunk_ids)
+                if not sources:
+                    relationships_to_delete.add((src, tgt))
+                    logger.debug(
+                        f"Relationship {src}-{tgt} marked for deletion - no remaining sources"
+                    )
+                else:
+                    new_source_id = GRAPH_FIELD_SEP.join(sources)
+                    relationships_to_update[(src, tgt)] = {
+                        **edge_data,
+                        "source_id": new_source_id,
+                    }
+                    logger.debug(
+                        f"Relationship {src}-{tgt} will be updated with new source_id: {new_source_id}"
+                    )
+
+            # 4. Delete entities
             if entities_to_delete:
-                for entity in entities_to_delete:
-                    await self.entities_vdb.delete_entity(entity)
-                    logger.debug(f"Deleted entity {entity} from vector DB")
-                await self.chunk_entity_relation_graph.remove_nodes(
-                    list(entities_to_delete)
+                await self.entities_vdb.delete(
+                    [
+                        compute_mdhash_id(entity, prefix="ent-")
+                        for entity in entities_to_delete
+                    ]
                 )
+                await graph.remove_nodes(list(entities_to_delete))
                 logger.debug(f"Deleted {len(entities_to_delete)} entities from graph")
 
             # Update entities
-            for entity, new_source_id in entities_to_update.items():
-                node_data = await self.chunk_entity_relation_graph.get_node(entity)
-                if node_data:
-                    node_data["source_id"] = new_source_id
-                    await self.chunk_entity_relation_graph.upsert_node(
-                        entity, node_data
-                    )
-                    logger.debug(
-                        f"Updated entity {entity} with new source_id: {new_source_id}"
-                    )
+            for entity, node_data in entities_to_update.items():
+                await graph.upsert_node(entity, node_data)
 
             # Delete relationships
             if relationships_to_delete:
+                rel_ids = []
                 for src, tgt in relationships_to_delete:
-                    rel_id_0 = compute_mdhash_id(src + tgt, prefix="rel-")
-                    rel_id_1 = compute_mdhash_id(tgt + src, prefix="rel-")
-                    await self.relationships_vdb.delete([rel_id_0, rel_id_1])
-                    logger.debug(f"Deleted relationship {src}-{tgt} from vector DB")
-                await self.chunk_entity_relation_graph.remove_edges(
-                    list(relationships_to_delete)
-                )
+                    rel_ids.append(compute_mdhash_id(src + tgt, prefix="rel-"))
+                    rel_ids.append(compute_mdhash_id(tgt + src, prefix="rel-"))
+                await self.relationships_vdb.delete(rel_ids)
+                await graph.remove_edges(list(relationships_to_delete))
                 logger.debug(
                     f"Deleted {len(relationships_to_delete)} relationships from graph"
                 )
 
             # Update relationships
-            for (src, tgt), new_source_id in relationships_to_update.items():
-                edge_data = await self.chunk_entity_relation_graph.get_edge(src, tgt)
-                if edge_data:
-                    edge_data["source_id"] = new_source_id
-                    await self.chunk_entity_relation_graph.upsert_edge(
-                        src, tgt, edge_data
-                    )
-                    logger.debug(
-                        f"Updated relationship {src}-{tgt} with new source_id: {new_source_id}"
-                    )
+            for (src, tgt), edge_data in relationships_to_update.items():
+                await graph.upsert_edge(src, tgt, edge_data)
+
+            await self.ainvalidate_cache_for(
+                entities={
+                    *entities_to_delete,
+                    *entities_to_update,
+                    *(n for pair in relationships_to_delete for n in pair),
+                    *(n for pair in relationships_to_update for n in pair),
+                },
+                chunks=chunk_ids,
+            )
 
-            # 6. Delete original document and status
-            await self.full_docs.delete([doc_id])
-            await self.doc_status.delete([doc_id])
+            # 5. Delete original document, status and index records
+            await self.full_docs.delete(doc_ids)
+            await self.doc_status.delete(doc_ids)
+            try:
+                await self.doc_chunks_index.delete(doc_ids)
+                await self.chunk_graph_index.delete(list(chunk_ids))
+            except Exception as e:
+                logger.warning(f"Failed to clean the deletion index for {docs_label}: {e}")
 
-            # 7. Ensure all indexes are updated
+            # 6. Ensure all indexes are updated
             await self._insert_done()
 
             logger.info(
-                f"Successfully deleted document {doc_id} and related data. "
+                f"Successfully deleted document {docs_label} and related data. "
                 f"Deleted {len(entities_to_delete)} entities and {len(relationships_to_delete)} relationships. "
                 f"Updated {len(entities_to_update)} entities and {len(relationships_to_update)} relationships."
             )
 
+            if indexed:
+                # The vector records only keep source_id as metadata, queries
+                # read the sources from the graph
+                return
+
             async def process_data(data_type, vdb, chunk_id):
                 # Check data (entities or relationships)
                 storage = await vdb.client_storage
@@ -1824,9 +2383,10 @@ class LightRAG:
 
             # Add verification step
             async def verify_deletion():
-                # Verify if the document has been deleted
-                if await self.full_docs.get_by_id(doc_id):
-                    logger.warning(f"Document {doc_id} still exists in full_docs")
+                # Verify if the documents have been deleted
+                for d in doc_ids:
+                    if await self.full_docs.get_by_id(d):
+                        logger.warning(f"Document {d} still exists in full_docs")
 
                 # Verify if chunks have been deleted
                 all_remaining_chunks = await self.text_chunks.get_all()
@@ -1834,7 +2394,7 @@ class LightRAG:
                     chunk_id: chunk_data
                     for chunk_id, chunk_data in all_remaining_chunks.items()
                     if isinstance(chunk_data, dict)
-                    and chunk_data.get("full_doc_id") == doc_id
+                    and chunk_data.get("full_doc_id") in doc_ids
                 }
 
                 if remaining_related_chunks:
@@ -1852,7 +2412,7 @@ class LightRAG:
             await verify_deletion()
 
         except Exception as e:
-            logger.error(f"Error while deleting document {doc_id}: {e}")
+            logger.error(f"Error while deleting document {docs_label}: {e}")
 
     async def get_entity_info(
         self, entity_name: str, include_vector_data: bool = False
@@ -1947,13 +2507,45 @@ class LightRAG:
                 f"environment variables: {', '.join(missing_vars)}"
             )
 
-    async def aclear_cache(self, modes: list[str] | None = None) -> None:
+    async def ainvalidate_cache_for(
+        self,
+        entities: Iterable[str] | None = None,
+        chunks: Iterable[str] | None = None,
+    ) -> int:
+        """Delete the cached query answers whose context used any of the given records.
+
+        Every cached answer records the entities and chunks its context was
+        built from, so a knowledge graph update only drops the answers that
+        read the changed records. Keyword and extraction caches are kept.
+
+        Args:
+            entities: Names of the entities that changed or were deleted.
+            chunks: Ids of the chunks that changed or were deleted.
+
+        Returns:
+            Number of cached answers deleted.
+        """
+        entities = list(entities or ())
+        # The entity linker indexes node ids, keep it in step with the graph
+        await refresh_entity_linker(self.chunk_entity_relation_graph, entities)
+        if not self.llm_response_cache:
+            return 0
+        return await invalidate_query_cache(
+            self.llm_response_cache, entities, chunks or ()
+        )
+
+    async def aclear_cache(
+        self, modes: list[str] | None = None, cache_types: list[str] | None = None
+    ) -> None:
         """Clear cache data from the LLM response cache storage.
 
         Args:
             modes (list[str] | None): Modes of cache to clear. Options: ["default", "naive", "local", "global", "hybrid", "mix"].
                              "default" represents extraction cache.
                              If None, clears all cache.
+            cache_types (list[str] | None): Only clear entries of these cache types
+                             ("query", "keywords", "extract") within the modes.
+                             If None, clears every entry of the modes.
 
         Example:
             # Clear all cache
@@ -1964,35 +2556,90 @@ class LightRAG:
 
             # Clear extraction cache
             await rag.aclear_cache(modes=["default"])
+
+            # Clear query answers, keep the keyword and extraction caches warm
+            await rag.aclear_cache(cache_types=["query"])
         """
         if not self.llm_response_cache:
             logger.warning("No cache storage configured")
             return
 
-        valid_modes = ["default", "naive", "local", "global", "hybrid", "mix"]
+        valid_modes = LLM_CACHE_MODES
 
         # Validate input
         if modes and not all(mode in valid_modes for mode in modes):
             raise ValueError(f"Invalid mode. Valid modes are: {valid_modes}")
 
+        cache_manager = get_llm_cache_manager(self.llm_response_cache)
         try:
-            # Reset the cache storage for specified mode
-            if modes:
-                await self.llm_response_cache.delete(modes)
-                logger.info(f"Cleared cache for modes: {modes}")
+            if cache_types:
+                await self._clear_cache_types(modes or valid_modes, cache_types)
             else:
-                # Clear all modes
-                await self.llm_response_cache.delete(valid_modes)
-                logger.info("Cleared all cache")
+                # Reset the cache storage for specified mode
+                if modes:
+                    await self.llm_response_cache.delete(modes)
+                    logger.info(f"Cleared cache for modes: {modes}")
+                else:
+                    # Clear all modes
+                    await self.llm_response_cache.delete(valid_modes)
+                    logger.info("Cleared all cache")
+                invalidate_semantic_cache_index(
+                    self.llm_response_cache.namespace, modes
+                )
+                if cache_manager:
+                    cache_manager.forget_modes(modes)
 
             await self.llm_response_cache.index_done_callback()
 
         except Exception as e:
             logger.error(f"Error while clearing cache: {e}")
 
-    def clear_cache(self, modes: list[str] | None = None) -> None:
+    async def _clear_cache_types(
+        self, modes: list[str], cache_types: list[str]
+    ) -> None:
+        cache = self.llm_response_cache
+        if not exists_func(cache, "delete_by_mode_and_ids"):
+            logger.warning(
+                f"{type(cache).__name__} cannot delete single cache entries, "
+                f"cache types {cache_types} not cleared"
+            )
+            return
+        cache_manager = get_llm_cache_manager(cache)
+        cleared = 0
+        for mode in modes:
+            mode_cache = await cache.get_by_id(mode)
+            if not isinstance(mode_cache, dict):
+                continue
+            ids = [
+                cache_id
+                for cache_id, entry in mode_cache.items()
+                if isinstance(entry, dict)
+                and cache_entry_type(mode, entry) in cache_types
+            ]
+            if not ids:
+                continue
+            await cache.delete_by_mode_and_ids(mode, ids)
+            invalidate_semantic_cache_index(cache.namespace, [mode])
+            if cache_manager:
+                cache_manager.forget([(mode, cache_id) for cache_id in ids])
+            cleared += len(ids)
+        logger.info(f"Cleared {cleared} cache entries of types {cache_types}")
+
+    def get_cache_stats(self) -> dict[str, dict[str, int]]:
+        """Hits, misses, evictions, expirations and size of the LLM cache per cache_type.
+
+        Counters are kept per process since it started.
+        """
+        cache_manager = get_llm_cache_manager(self.llm_response_cache)
+        return cache_manager.get_stats() if cache_manager else {}
+
+    def clear_cache(
+        self, modes: list[str] | None = None, cache_types: list[str] | None = None
+    ) -> None:
         """Synchronous version of aclear_cache."""
-        return always_get_an_event_loop().run_until_complete(self.aclear_cache(modes))
+        return always_get_an_event_loop().run_until_complete(
+            self.aclear_cache(modes, cache_types)
+        )
 
     async def aedit_entity(
         self, entity_name: str, updated_data: dict[str, str], allow_rename: bool = True
@@ -2018,6 +2665,7 @@ class LightRAG:
             # Check if entity is being renamed
             new_entity_name = updated_data.get("entity_name", entity_name)
             is_renaming = new_entity_name != entity_name
+            edited_entities = {entity_name, new_entity_name}
 
             # If renaming, check if new name already exists
             if is_renaming:
@@ -2035,7 +2683,7 @@ class LightRAG:
                     )
 
             # 2. Update entity information in the graph
-            new_node_data = {**node_data, **updated_data}
+            new_node_data = with_description_tokens({**node_data, **updated_data})
             if "entity_name" in new_node_data:
                 del new_node_data[
                     "entity_name"
@@ -2148,6 +2796,7 @@ class LightRAG:
 
             # Update vector database
             await self.entities_vdb.upsert(entity_data)
+            await self.ainvalidate_cache_for(entities=edited_entities)
 
             # 4. Save changes
             await self._edit_entity_done()
@@ -2225,7 +2874,7 @@ class LightRAG:
             )
 
             # 2. Update relation information in the graph
-            new_edge_data = {**edge_data, **updated_data}
+            new_edge_data = with_description_tokens({**edge_data, **updated_data})
             await self.chunk_entity_relation_graph.upsert_edge(
                 source_entity, target_entity, new_edge_data
             )
@@ -2259,6 +2908,7 @@ class LightRAG:
 
             # Update vector database
             await self.relationships_vdb.upsert(relation_data)
+            await self.ainvalidate_cache_for(entities=[source_entity, target_entity])
 
             # 4. Save changes
             await self._edit_relation_done()
@@ -2328,11 +2978,13 @@ class LightRAG:
                 raise ValueError(f"Entity '{entity_name}' already exists")
 
             # Prepare node data with defaults if missing
-            node_data = {
-                "entity_type": entity_data.get("entity_type", "UNKNOWN"),
-                "description": entity_data.get("description", ""),
-                "source_id": entity_data.get("source_id", "manual"),
-            }
+            node_data = with_description_tokens(
+                {
+                    "entity_type": entity_data.get("entity_type", "UNKNOWN"),
+                    "description": entity_data.get("description", ""),
+                    "source_id": entity_data.get("source_id", "manual"),
+                }
+            )
 
             # Add entity to knowledge graph
             await self.chunk_entity_relation_graph.upsert_node(entity_name, node_data)
@@ -2359,6 +3011,9 @@ class LightRAG:
 
             # Update vector database
             await self.entities_vdb.upsert(entity_data_for_vdb)
+            await refresh_entity_linker(
+                self.chunk_entity_relation_graph, [entity_name]
+            )
 
             # Save changes
             await self._edit_entity_done()
@@ -2425,12 +3080,14 @@ class LightRAG:
                 )
 
             # Prepare edge data with defaults if missing
-            edge_data = {
-                "description": relation_data.get("description", ""),
-                "keywords": relation_data.get("keywords", ""),
-                "source_id": relation_data.get("source_id", "manual"),
-                "weight": float(relation_data.get("weight", 1.0)),
-            }
+            edge_data = with_description_tokens(
+                {
+                    "description": relation_data.get("description", ""),
+                    "keywords": relation_data.get("keywords", ""),
+                    "source_id": relation_data.get("source_id", "manual"),
+                    "weight": float(relation_data.get("weight", 1.0)),
+                }
+            )
 
             # Add relation to knowledge graph
             await self.chunk_entity_relation_graph.upsert_edge(
@@ -2466,6 +3123,7 @@ class LightRAG:
 
             # Update vector database
             await self.relationships_vdb.upsert(relation_data_for_vdb)
+            await self.ainvalidate_cache_for(entities=[source_entity, target_entity])
 
             # Save changes
             await self._edit_relation_done()
@@ -2577,6 +3235,7 @@ class LightRAG:
             # Apply any explicitly provided target entity data (overrides merged data)
             for key, value in target_entity_data.items():
                 merged_entity_data[key] = value
+            with_description_tokens(merged_entity_data)
 
             # 4. Get all relationships of the source entities
             all_relations = []
@@ -2667,7 +3326,9 @@ class LightRAG:
             # Apply relationship updates
             for rel_data in relation_updates.values():
                 await self.chunk_entity_relation_graph.upsert_edge(
-                    rel_data["src"], rel_data["tgt"], rel_data["data"]
+                    rel_data["src"],
+                    rel_data["tgt"],
+                    with_description_tokens(rel_data["data"]),
                 )
                 logger.info(
                     f"Created or updated relationship: {rel_data['src']} -> {rel_data['tgt']}"
@@ -2746,6 +3407,8 @@ class LightRAG:
                     f"Deleted source entity '{entity_name}' and its vector embedding from database"
                 )
 
+            await self.ainvalidate_cache_for(entities=[*source_entities, target_entity])
+
             # 10. Save changes
             await self._merge_entities_done()
 
@@ -7,6 +7,10 @@ class NameSpace:
     KV_STORE_FULL_DOCS = "full_docs"
     KV_STORE_TEXT_CHUNKS = "text_chunks"
     KV_STORE_LLM_RESPONSE_CACHE = "llm_response_cache"
+    KV_STORE_DOC_CHUNKS_INDEX = "doc_chunks_index"
+    KV_STORE_CHUNK_GRAPH_INDEX = "chunk_graph_index"
+    LEXICAL_INDEX_CHUNKS = "lexical_index_chunks"
+    ATTRIBUTE_STORE_BOOKS = "attribute_store_books"
 
     VECTOR_STORE_ENTITIES = "entities"
     VECTOR_STORE_RELATIONSHIPS = "relationships"
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+import inspect
 import json
+import os
 import re
 import logging
-from typing import Any, AsyncIterator
+from dataclasses import asdict, replace
+from typing import Any, AsyncIterator, Callable
 from collections import Counter, defaultdict
 
+import numpy as np
+
 from .utils import (
     logger,
     clean_str,
@@ -18,11 +23,19 @@ from .utils import (
     pack_user_ass_to_openai_messages,
     split_string_by_multi_markers,
     truncate_list_by_token_size,
-    process_combine_contexts,
+    with_description_tokens,
     compute_args_hash,
     handle_cache,
     save_to_cache,
+    cache_answer,
+    replay_cached_answer,
     CacheData,
+    invalidate_query_cache,
+    record_cache_dependencies,
+    start_cache_dependencies,
+    run_single_flight,
+    single_flight,
+    use_embedding_cache,
     statistic_data,
     get_conversation_turns,
     verbose_debug,
@@ -35,6 +48,8 @@ from .base import (
     TextChunkSchema,
     QueryParam,
 )
+from .entity_linker import link_query_entities, refresh_entity_linker
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
 import time
 from dotenv import load_dotenv
@@ -224,10 +239,12 @@ async def _merge_nodes_then_upsert(
     description = await _handle_entity_relation_summary(
         entity_name, description, global_config
     )
-    node_data = dict(
-        entity_type=entity_type,
-        description=description,
-        source_id=source_id,
+    node_data = with_description_tokens(
+        dict(
+            entity_type=entity_type,
+            description=description,
+            source_id=source_id,
+        )
     )
     await knowledge_graph_inst.upsert_node(
         entity_name,
@@ -305,11 +322,13 @@ async def _merge_edges_then_upsert(
         if not (await knowledge_graph_inst.has_node(need_insert_id)):
             await knowledge_graph_inst.upsert_node(
                 need_insert_id,
-                node_data={
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                },
+                node_data=with_description_tokens(
+                    {
+                        "source_id": source_id,
+                        "description": description,
+                        "entity_type": "UNKNOWN",
+                    }
+                ),
             )
     description = await _handle_entity_relation_summary(
         f"({src_id}, {tgt_id})", description, global_config
@@ -317,11 +336,13 @@ async def _merge_edges_then_upsert(
     await knowledge_graph_inst.upsert_edge(
         src_id,
         tgt_id,
-        edge_data=dict(
-            weight=weight,
-            description=description,
-            keywords=keywords,
-            source_id=source_id,
+        edge_data=with_description_tokens(
+            dict(
+                weight=weight,
+                description=description,
+                keywords=keywords,
+                source_id=source_id,
+            )
         ),
     )
 
@@ -336,6 +357,60 @@ async def _merge_edges_then_upsert(
     return edge_data
 
 
+async def _merge_index_records(
+    index: BaseKVStorage, records: dict[str, dict[str, list]]
+) -> None:
+    """Union `records` into the list fields of the existing index entries"""
+    existing = await asyncio.gather(*[index.get_by_id(k) for k in records])
+    replaced = []
+    for (key, record), old in zip(records.items(), existing):
+        if not old:
+            continue
+        for field_name, values in record.items():
+            # Relations are [src, tgt] lists, hash them as tuples
+            merged = {
+                tuple(v) if isinstance(v, list) else v
+                for v in (old.get(field_name) or []) + values
+            }
+            record[field_name] = [
+                list(v) if isinstance(v, tuple) else v for v in sorted(merged)
+            ]
+        replaced.append(key)
+    if replaced and hasattr(index, "delete"):
+        # Some KV backends only insert new keys, drop the stale entries first
+        await index.delete(replaced)
+    await index.upsert(records)
+
+
+# Key of the doc -> chunks index record telling that every document has an entry
+DELETION_INDEX_MARKER = "__all_docs_indexed__"
+
+
+async def update_deletion_index(
+    chunk_graph: dict[str, dict[str, list]],
+    chunk_docs: dict[str, str],
+    doc_chunks_index: BaseKVStorage | None,
+    chunk_graph_index: BaseKVStorage | None,
+) -> None:
+    """Record the chunks of each document and the graph elements of each chunk.
+
+    Args:
+        chunk_graph: chunk id -> {"entities": [name], "relations": [[src, tgt]]}
+        chunk_docs: chunk id -> full doc id
+    """
+    doc_chunks: dict[str, dict[str, list]] = {}
+    for chunk_id, doc_id in chunk_docs.items():
+        doc_chunks.setdefault(doc_id, {"chunk_ids": []})["chunk_ids"].append(chunk_id)
+    try:
+        if chunk_graph_index is not None and chunk_graph:
+            await _merge_index_records(chunk_graph_index, chunk_graph)
+        if doc_chunks_index is not None and doc_chunks:
+            await _merge_index_records(doc_chunks_index, doc_chunks)
+    except Exception as e:
+        # Deletion falls back to scanning the storages for unindexed documents
+        logger.warning(f"Failed to update the deletion index: {e}")
+
+
 async def extract_entities(
     chunks: dict[str, TextChunkSchema],
     knowledge_graph_inst: BaseGraphStorage,
@@ -343,6 +418,8 @@ async def extract_entities(
     relationships_vdb: BaseVectorStorage,
     global_config: dict[str, str],
     llm_response_cache: BaseKVStorage | None = None,
+    doc_chunks_index: BaseKVStorage | None = None,
+    chunk_graph_index: BaseKVStorage | None = None,
 ) -> None:
     from lightrag.kg.shared_storage import get_namespace_data
 
@@ -406,35 +483,47 @@ async def extract_entities(
                 _prompt = input_text
 
             arg_hash = compute_args_hash(_prompt)
-            cached_return, _1, _2, _3 = await handle_cache(
-                llm_response_cache,
-                arg_hash,
-                _prompt,
-                "default",
-                cache_type="extract",
-                force_llm_cache=True,
-            )
-            if cached_return:
-                logger.debug(f"Found cache for {arg_hash}")
-                statistic_data["llm_cache"] += 1
-                return cached_return
-            statistic_data["llm_call"] += 1
-            if history_messages:
-                res: str = await use_llm_func(
-                    input_text, history_messages=history_messages
-                )
-            else:
-                res: str = await use_llm_func(input_text)
-            await save_to_cache(
-                llm_response_cache,
-                CacheData(
-                    args_hash=arg_hash,
-                    content=res,
-                    prompt=_prompt,
+
+            async def _call_with_cache() -> str:
+                cached_return, _1, _2, _3 = await handle_cache(
+                    llm_response_cache,
+                    arg_hash,
+                    _prompt,
+                    "default",
                     cache_type="extract",
+                    force_llm_cache=True,
+                )
+                if cached_return:
+                    logger.debug(f"Found cache for {arg_hash}")
+                    statistic_data["llm_cache"] += 1
+                    return cached_return
+                statistic_data["llm_call"] += 1
+                if history_messages:
+                    res: str = await use_llm_func(
+                        input_text, history_messages=history_messages
+                    )
+                else:
+                    res: str = await use_llm_func(input_text)
+                await save_to_cache(
+                    llm_response_cache,
+                    CacheData(
+                        args_hash=arg_hash,
+                        content=res,
+                        prompt=_prompt,
+                        cache_type="extract",
+                    ),
+                )
+                return res
+
+            # Identical chunks extracted concurrently share one LLM call
+            return await run_single_flight(
+                "extract:{}:{}:{}".format(
+                    global_config.get("working_dir", ""),
+                    llm_response_cache.namespace,
+                    arg_hash,
                 ),
+                _call_with_cache,
             )
-            return res
 
         if history_messages:
             return await use_llm_func(input_text, history_messages=history_messages)
@@ -538,6 +627,28 @@ async def extract_entities(
         ]
     )
 
+    chunk_graph = {}
+    for (chunk_key, _), (m_nodes, m_edges) in zip(ordered_chunks, results):
+        relations = {tuple(sorted(k)) for k in m_edges}
+        # Edge endpoints missing from the graph are inserted with the edge's sources
+        entities = set(m_nodes) | {n for pair in relations for n in pair}
+        chunk_graph[chunk_key] = {
+            "entities": sorted(entities),
+            "relations": [list(pair) for pair in sorted(relations)],
+        }
+    await update_deletion_index(
+        chunk_graph,
+        {k: dp["full_doc_id"] for k, dp in ordered_chunks if dp.get("full_doc_id")},
+        doc_chunks_index,
+        chunk_graph_index,
+    )
+    # Cached answers built from the merged entities are stale now
+    merged_entities = {n for record in chunk_graph.values() for n in record["entities"]}
+    await invalidate_query_cache(
+        llm_response_cache, entities=merged_entities, chunks=chunks.keys()
+    )
+    await refresh_entity_linker(knowledge_graph_inst, merged_entities)
+
     if not (all_entities_data or all_relationships_data):
         log_message = "Didn't extract any entities and relationships."
         logger.info(log_message)
@@ -597,6 +708,214 @@ async def extract_entities(
         await relationships_vdb.upsert(data_for_vdb)
 
 
+def _search_kwargs(vdb: BaseVectorStorage, query_param: QueryParam) -> dict[str, Any]:
+    """The ANN search knobs of query_param that the backend of vdb accepts"""
+    search_kwargs = {
+        name: value
+        for name, value in (
+            ("nprobe", query_param.nprobe),
+            ("ef_search", query_param.ef_search),
+        )
+        if value is not None
+    }
+    if search_kwargs:
+        accepted = inspect.signature(vdb.query).parameters
+        search_kwargs = {k: v for k, v in search_kwargs.items() if k in accepted}
+    return search_kwargs
+
+
+async def _query_vdb(
+    vdb: BaseVectorStorage, query: str, top_k: int, query_param: QueryParam
+) -> list[dict[str, Any]]:
+    """Query a vector storage, passing the ANN search knobs of query_param to backends that accept them"""
+    return await vdb.query(query, top_k=top_k, **_search_kwargs(vdb, query_param))
+
+
+async def _speculative_prefetch(
+    query: str,
+    knowledge_graph_inst: BaseGraphStorage,
+    entities_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    query_param: QueryParam,
+) -> dict[str, Any]:
+    """Retrieve with the raw query while the keywords are being extracted.
+
+    The entities and relations closest to the query are searched and their
+    graph records read ahead, so the keyword search only reads what the raw
+    query did not find. A failure only disables the prefetch.
+    """
+    try:
+        entity_results, relation_results = await asyncio.gather(
+            _query_vdb(entities_vdb, query, query_param.top_k, query_param),
+            _query_vdb(relationships_vdb, query, query_param.top_k, query_param),
+        )
+        entity_names = [r["entity_name"] for r in entity_results]
+        pairs = [(r["src_id"], r["tgt_id"]) for r in relation_results]
+        nodes, node_degrees, edges, edge_degrees = await asyncio.gather(
+            knowledge_graph_inst.get_nodes_batch(entity_names),
+            knowledge_graph_inst.node_degrees_batch(entity_names),
+            knowledge_graph_inst.get_edges_batch(pairs),
+            knowledge_graph_inst.edge_degrees_batch(pairs),
+        )
+    except Exception as e:
+        logger.warning(f"Speculative retrieval failed: {e}")
+        return {}
+    return {
+        "entities": entity_results,
+        "relationships": relation_results,
+        "nodes": nodes,
+        "node_degrees": node_degrees,
+        "edges": edges,
+        "edge_degrees": edge_degrees,
+    }
+
+
+def _start_speculative_prefetch(
+    query: str,
+    knowledge_graph_inst: BaseGraphStorage,
+    entities_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    query_param: QueryParam,
+) -> asyncio.Task | None:
+    if not query_param.speculative_retrieval:
+        return None
+    return asyncio.create_task(
+        _speculative_prefetch(
+            query, knowledge_graph_inst, entities_vdb, relationships_vdb, query_param
+        )
+    )
+
+
+async def _collect_speculative_prefetch(
+    task: asyncio.Task | None, use: bool = True
+) -> dict[str, Any] | None:
+    """Wait for the prefetch, or cancel it when the query ends early"""
+    if task is None:
+        return None
+    if not use:
+        task.cancel()
+        return None
+    return await task
+
+
+# Searches restricted by an attribute filter fetch this many times top_k before filtering
+CHUNK_FILTER_OVERFETCH = int(os.getenv("CHUNK_FILTER_OVERFETCH", 4))
+
+
+def _search_top_k(top_k: int, query_param: QueryParam) -> int:
+    return top_k if query_param.chunk_filter is None else top_k * CHUNK_FILTER_OVERFETCH
+
+
+def _restrict_to_chunks(
+    results: list[dict[str, Any]],
+    query_param: QueryParam,
+    top_k: int,
+    sources: Callable[[dict[str, Any]], str] = lambda r: r.get("source_id") or "",
+) -> list[dict[str, Any]]:
+    """Keep the results coming from a chunk of query_param.chunk_filter"""
+    allowed = query_param.chunk_filter
+    if allowed is None:
+        return results
+    kept = [
+        r
+        for r in results
+        if not allowed.isdisjoint(
+            split_string_by_multi_markers(sources(r), [GRAPH_FIELD_SEP])
+        )
+    ]
+    return kept[:top_k]
+
+
+async def _retrieve_chunks(
+    query: str,
+    chunks_vdb: BaseVectorStorage,
+    lexical_index: LexicalIndex | None,
+    top_k: int,
+    query_param: QueryParam,
+) -> list[dict[str, Any]]:
+    """Chunk search of naive and mix modes, following query_param.chunk_retrieval"""
+    allowed = query_param.chunk_filter
+    if allowed is not None and len(allowed) <= top_k:
+        # Few enough matching chunks to use them all without searching
+        return [{"id": chunk_id} for chunk_id in sorted(allowed)]
+    search_k = _search_top_k(top_k, query_param)
+    if lexical_index is None or query_param.chunk_retrieval == "vector":
+        results = await _query_vdb(chunks_vdb, query, search_k, query_param)
+    else:
+        lexical_results = await lexical_index.search(query, search_k)
+        if query_param.chunk_retrieval == "lexical":
+            results = lexical_results
+        elif lexical_results and lexical_results[0].get("exact"):
+            logger.info("Exact lexical match, skipping the chunk vector search")
+            results = lexical_results
+        else:
+            vector_results = await _query_vdb(chunks_vdb, query, search_k, query_param)
+            # Vector results first, so that their created_at is kept
+            results = reciprocal_rank_fusion([vector_results, lexical_results], search_k)
+    return _restrict_to_chunks(results, query_param, top_k, lambda r: r["id"])
+
+
+def _merge_speculative_results(
+    results: list[dict[str, Any]],
+    speculative: list[dict[str, Any]] | None,
+    key: Callable[[dict[str, Any]], Any],
+    top_k: int,
+) -> list[dict[str, Any]]:
+    """Merge the raw query hits into the keyword hits, keeping the top_k most similar"""
+    if not speculative:
+        return results
+    merged = {key(r): r for r in speculative}
+    # On duplicates the keyword hit wins
+    merged.update((key(r), r) for r in results)
+    ranked = sorted(merged.values(), key=lambda r: r.get("distance") or 0, reverse=True)
+    return ranked[:top_k]
+
+
+def _flight_scope(arguments: dict[str, Any]) -> str:
+    """Working directory and cache namespace of a call, so that two instances
+    in the same process never share a flight"""
+    hashing_kv = arguments.get("hashing_kv")
+    return "{}:{}".format(
+        arguments["global_config"].get("working_dir", ""),
+        hashing_kv.namespace if hashing_kv is not None else "",
+    )
+
+
+def _query_flight_key(arguments: dict[str, Any]) -> str | None:
+    """Single-flight key of a query: its cache key plus the parameters shaping the answer"""
+    query_param: QueryParam = arguments["query_param"]
+    if query_param.stream:
+        # A stream can only be consumed once
+        return None
+    return compute_args_hash(
+        _flight_scope(arguments),
+        query_param.mode,
+        arguments["query"],
+        json.dumps(
+            asdict(query_param),
+            sort_keys=True,
+            ensure_ascii=False,
+            default=lambda o: sorted(o) if isinstance(o, set) else str(o),
+        ),
+        arguments.get("system_prompt") or "",
+        cache_type="query",
+    )
+
+
+def _keywords_flight_key(arguments: dict[str, Any]) -> str:
+    param: QueryParam = arguments["param"]
+    return compute_args_hash(
+        _flight_scope(arguments),
+        param.mode,
+        arguments["text"],
+        json.dumps(param.conversation_history, ensure_ascii=False),
+        param.history_turns,
+        cache_type="keywords",
+    )
+
+
+@single_flight(_query_flight_key)
+@use_embedding_cache
 async def kg_query(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -616,12 +935,36 @@ async def kg_query(
         hashing_kv, args_hash, query, query_param.mode, cache_type="query"
     )
     if cached_response is not None:
+        if query_param.stream:
+            return replay_cached_answer(cached_response)
         return cached_response
+    dependencies = start_cache_dependencies()
 
-    # Extract keywords using extract_keywords_only function which already supports conversation history
-    hl_keywords, ll_keywords = await extract_keywords_only(
-        query, query_param, global_config, hashing_kv
-    )
+    prefetch = None
+    linked_entities: list[str] = []
+    if query_param.hl_keywords or query_param.ll_keywords:
+        # Set by the caller, e.g. extracted for a whole batch by prepare_query_batch
+        hl_keywords, ll_keywords = query_param.hl_keywords, query_param.ll_keywords
+    else:
+        # Local retrieval only uses low-level keywords, entities named in the
+        # query seed it without asking the LLM for keywords
+        if query_param.mode == "local":
+            linked_entities = await link_query_entities(knowledge_graph_inst, query)
+        if linked_entities:
+            logger.info(f"Entity linker matched {linked_entities}, skipping keyword extraction")
+            hl_keywords, ll_keywords = [], linked_entities
+        else:
+            prefetch = _start_speculative_prefetch(
+                query, knowledge_graph_inst, entities_vdb, relationships_vdb, query_param
+            )
+            # Extract keywords using extract_keywords_only function which already supports conversation history
+            try:
+                hl_keywords, ll_keywords = await extract_keywords_only(
+                    query, query_param, global_config, hashing_kv
+                )
+            except BaseException:
+                await _collect_speculative_prefetch(prefetch, use=False)
+                raise
     logging.info(f"ll: {ll_keywords}, hl: {hl_keywords} ")
 
     logger.debug(f"High-level keywords: {hl_keywords}")
@@ -630,19 +973,21 @@ async def kg_query(
     # Handle empty keywords
     if hl_keywords == [] and ll_keywords == []:
         logger.warning("low_level_keywords and high_level_keywords is empty")
+        await _collect_speculative_prefetch(prefetch, use=False)
         return PROMPTS["fail_response"]
     if ll_keywords == [] and query_param.mode in ["local", "hybrid"]:
         logger.warning(
             "low_level_keywords is empty, switching from %s mode to global mode",
             query_param.mode,
         )
-        query_param.mode = "global"
+        # The caller's param may be shared, e.g. the default QueryParam()
+        query_param = replace(query_param, mode="global")
     if hl_keywords == [] and query_param.mode in ["global", "hybrid"]:
         logger.warning(
             "high_level_keywords is empty, switching from %s mode to local mode",
             query_param.mode,
         )
-        query_param.mode = "local"
+        query_param = replace(query_param, mode="local")
 
     ll_keywords_str = ", ".join(ll_keywords) if ll_keywords else ""
     hl_keywords_str = ", ".join(hl_keywords) if hl_keywords else ""
@@ -656,6 +1001,11 @@ async def kg_query(
         relationships_vdb,
         text_chunks_db,
         query_param,
+        prefetched=(
+            {"seed_entities": linked_entities}
+            if linked_entities
+            else await _collect_speculative_prefetch(prefetch)
+        ),
     )
     logging.info(f"\n\n-----KG Context-----\n{context}")
     end_time = time.time()
@@ -725,8 +1075,8 @@ async def kg_query(
             .strip()
         )
 
-    # Save to cache
-    await save_to_cache(
+    # Save to cache, a streamed answer once it has been read to the end
+    response = await cache_answer(
         hashing_kv,
         CacheData(
             args_hash=args_hash,
@@ -737,6 +1087,7 @@ async def kg_query(
             max_val=max_val,
             mode=query_param.mode,
             cache_type="query",
+            dependencies=dependencies,
         ),
     )
     
@@ -745,6 +1096,8 @@ async def kg_query(
     return response
 
 
+@single_flight(_keywords_flight_key)
+@use_embedding_cache
 async def extract_keywords_only(
     text: str,
     param: QueryParam,
@@ -840,6 +1193,80 @@ async def extract_keywords_only(
     return hl_keywords, ll_keywords
 
 
+@use_embedding_cache
+async def prepare_query_batch(
+    queries: list[str],
+    params: list[QueryParam],
+    knowledge_graph_inst: BaseGraphStorage,
+    entities_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    global_config: dict[str, str],
+    hashing_kv: BaseKVStorage | None = None,
+    max_concurrency: int = 8,
+) -> None:
+    """Extract the keywords of a batch of queries and run their searches ahead.
+
+    The keywords of each KG or mix query are stored in its param, so that
+    kg_query and mix_kg_vector_query do not extract them again, with at most
+    max_concurrency extractions in flight. The entity and relation searches
+    of all the keywords are then made with one `query_batch` per storage;
+    through storages wrapped by a RequestScope the queries find them
+    memoized. A failure only leaves the work to the queries themselves.
+    """
+    kg_modes = ("local", "global", "hybrid", "mix")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def extract(query: str, param: QueryParam) -> None:
+        if param.mode not in kg_modes or param.hl_keywords or param.ll_keywords:
+            return
+        try:
+            # kg_query seeds these from the linked entities without any search
+            if param.mode == "local" and await link_query_entities(
+                knowledge_graph_inst, query
+            ):
+                return
+            async with semaphore:
+                hl_keywords, ll_keywords = await extract_keywords_only(
+                    query, param, global_config, hashing_kv
+                )
+            param.hl_keywords, param.ll_keywords = hl_keywords, ll_keywords
+        except Exception as e:
+            logger.warning(f"Keyword extraction failed for batch query {query!r}: {e}")
+
+    await asyncio.gather(*(extract(q, p) for q, p in zip(queries, params)))
+
+    # Keyword strings by storage and top_k, as _get_node_data and _get_edge_data search them
+    searches: dict[tuple[str, int], tuple[QueryParam, list[str]]] = {}
+    for param in params:
+        if param.mode not in kg_modes:
+            continue
+        search_k = _search_top_k(param.top_k, param)
+        if param.ll_keywords and (param.mode != "global" or not param.hl_keywords):
+            searches.setdefault(("entities", search_k), (param, []))[1].append(
+                ", ".join(param.ll_keywords)
+            )
+        if param.hl_keywords and (param.mode != "local" or not param.ll_keywords):
+            searches.setdefault(("relationships", search_k), (param, []))[1].append(
+                ", ".join(param.hl_keywords)
+            )
+    vdbs = {"entities": entities_vdb, "relationships": relationships_vdb}
+    try:
+        await asyncio.gather(
+            *(
+                vdbs[name].query_batch(
+                    list(dict.fromkeys(texts)),
+                    top_k=search_k,
+                    **_search_kwargs(vdbs[name], param),
+                )
+                for (name, search_k), (param, texts) in searches.items()
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Batched keyword search failed: {e}")
+
+
+@single_flight(_query_flight_key)
+@use_embedding_cache
 async def mix_kg_vector_query(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -851,6 +1278,7 @@ async def mix_kg_vector_query(
     global_config: dict[str, str],
     hashing_kv: BaseKVStorage | None = None,
     system_prompt: str | None = None,
+    lexical_index: LexicalIndex | None = None,
 ) -> str | AsyncIterator[str]:
     start_time = time.time()
     """
@@ -868,7 +1296,10 @@ async def mix_kg_vector_query(
         hashing_kv, args_hash, query, "mix", cache_type="query"
     )
     if cached_response is not None:
+        if query_param.stream:
+            return replay_cached_answer(cached_response)
         return cached_response
+    dependencies = start_cache_dependencies()
 
     # Process conversation history
     history_context = ""
@@ -879,15 +1310,29 @@ async def mix_kg_vector_query(
 
     # 2. Execute knowledge graph and vector searches in parallel
     async def get_kg_context():
+        preset = bool(query_param.hl_keywords or query_param.ll_keywords)
+        # The chunk vector search below already overlaps keyword extraction,
+        # the prefetch does the same for entities and relations
+        prefetch = (
+            None
+            if preset
+            else _start_speculative_prefetch(
+                query, knowledge_graph_inst, entities_vdb, relationships_vdb, query_param
+            )
+        )
         try:
             start_time = time.perf_counter()
-            # Extract keywords using extract_keywords_only function which already supports conversation history
-            hl_keywords, ll_keywords = await extract_keywords_only(
-                query, query_param, global_config, hashing_kv
-            )
+            if preset:
+                hl_keywords, ll_keywords = query_param.hl_keywords, query_param.ll_keywords
+            else:
+                # Extract keywords using extract_keywords_only function which already supports conversation history
+                hl_keywords, ll_keywords = await extract_keywords_only(
+                    query, query_param, global_config, hashing_kv
+                )
 
             if not hl_keywords and not ll_keywords:
                 logger.warning("Both high-level and low-level keywords are empty")
+                await _collect_speculative_prefetch(prefetch, use=False)
                 return None
 
             # Convert keyword lists to strings
@@ -896,6 +1341,7 @@ async def mix_kg_vector_query(
 
             # Set query mode based on available keywords
             if not ll_keywords_str and not hl_keywords_str:
+                await _collect_speculative_prefetch(prefetch, use=False)
                 return None
             elif not ll_keywords_str:
                 query_param.mode = "global"
@@ -913,6 +1359,7 @@ async def mix_kg_vector_query(
                 relationships_vdb,
                 text_chunks_db,
                 query_param,
+                prefetched=await _collect_speculative_prefetch(prefetch),
             )
             
             end_time = time.perf_counter()
@@ -921,6 +1368,7 @@ async def mix_kg_vector_query(
 
         except Exception as e:
             logger.error(f"Error in get_kg_context: {str(e)}")
+            await _collect_speculative_prefetch(prefetch, use=False)
             return None
 
     async def get_vector_context():
@@ -933,7 +1381,9 @@ async def mix_kg_vector_query(
         try:
             # Reduce top_k for vector search in hybrid mode since we have structured information from KG
             mix_topk = min(10, query_param.top_k)
-            results = await chunks_vdb.query(augmented_query, top_k=mix_topk)
+            results = await _retrieve_chunks(
+                augmented_query, chunks_vdb, lexical_index, mix_topk, query_param
+            )
             if not results:
                 return None
 
@@ -945,7 +1395,9 @@ async def mix_kg_vector_query(
                 if chunk is not None and "content" in chunk:
                     # Merge chunk content and time metadata
                     chunk_with_time = {
+                        "id": result["id"],
                         "content": chunk["content"],
+                        "tokens": chunk.get("tokens"),
                         "created_at": result.get("created_at", None),
                     }
                     valid_chunks.append(chunk_with_time)
@@ -957,10 +1409,12 @@ async def mix_kg_vector_query(
                 valid_chunks,
                 key=lambda x: x["content"],
                 max_token_size=query_param.max_token_for_text_unit,
+                token_count=lambda x: x.get("tokens"),
             )
 
             if not maybe_trun_chunks:
                 return None
+            record_cache_dependencies(chunks=[c["id"] for c in maybe_trun_chunks])
 
             # Include time information in content
             formatted_chunks = []
@@ -1026,8 +1480,9 @@ async def mix_kg_vector_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[mix_kg_vector_query]Prompt Tokens: {len_of_prompts}")
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[mix_kg_vector_query]Prompt Tokens: {len_of_prompts}")
 
     # 6. Generate response
     response = await use_model_func(
@@ -1048,20 +1503,21 @@ async def mix_kg_vector_query(
             .strip()
         )
 
-        # 7. Save cache - Only cache after collecting complete response
-        await save_to_cache(
-            hashing_kv,
-            CacheData(
-                args_hash=args_hash,
-                content=response,
-                prompt=query,
-                quantized=quantized,
-                min_val=min_val,
-                max_val=max_val,
-                mode="mix",
-                cache_type="query",
-            ),
-        )
+    # 7. Save cache, a streamed answer once it has been read to the end
+    response = await cache_answer(
+        hashing_kv,
+        CacheData(
+            args_hash=args_hash,
+            content=response,
+            prompt=query,
+            quantized=quantized,
+            min_val=min_val,
+            max_val=max_val,
+            mode="mix",
+            cache_type="query",
+            dependencies=dependencies,
+        ),
+    )
         
     end_time = time.time()
     logging.info(f"\n\n⏳ Time for mix_kg_vector_query -> response: {(end_time - start_time):.4f} s")
@@ -1077,71 +1533,58 @@ async def _build_query_context(
     relationships_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
+    prefetched: dict[str, Any] | None = None,
 ):
+    """Retrieve and render the KG context.
+
+    `prefetched` holds the raw query retrieval of `_speculative_prefetch`,
+    merged into the keyword hits when speculative retrieval is enabled, or the
+    `seed_entities` found by the entity linker, used instead of the entity search.
+    """
     if query_param.mode == "local":
-        entities_context, relations_context, text_units_context = await _get_node_data(
+        entities, relations, text_units = await _get_node_data(
             ll_keywords,
             knowledge_graph_inst,
             entities_vdb,
             text_chunks_db,
             query_param,
+            prefetched,
         )
     elif query_param.mode == "global":
-        entities_context, relations_context, text_units_context = await _get_edge_data(
+        entities, relations, text_units = await _get_edge_data(
             hl_keywords,
             knowledge_graph_inst,
             relationships_vdb,
             text_chunks_db,
             query_param,
+            prefetched,
         )
     else:  # hybrid mode
-        entities_context, relations_context, text_units_context = await _get_node_data(
-            ll_keywords,
-            # hl_keywords,
-            knowledge_graph_inst,
-            entities_vdb,
-            # relationships_vdb,
-            text_chunks_db,
-            query_param,
+        ll_data, hl_data = await asyncio.gather(
+            _get_node_data(
+                ll_keywords,
+                knowledge_graph_inst,
+                entities_vdb,
+                text_chunks_db,
+                query_param,
+                prefetched,
+            ),
+            _get_edge_data(
+                hl_keywords,
+                knowledge_graph_inst,
+                relationships_vdb,
+                text_chunks_db,
+                query_param,
+                prefetched,
+            ),
         )
-        # ll_data, hl_data = await asyncio.gather(
-        #     _get_node_data(
-        #         ll_keywords,
-        #         knowledge_graph_inst,
-        #         entities_vdb,
-        #         text_chunks_db,
-        #         query_param,
-        #     ),
-        #     _get_edge_data(
-        #         hl_keywords,
-        #         knowledge_graph_inst,
-        #         relationships_vdb,
-        #         text_chunks_db,
-        #         query_param,
-        #     ),
-        # )
-
-        # (
-        #     ll_entities_context,
-        #     ll_relations_context,
-        #     ll_text_units_context,
-        # ) = ll_data
-
-        # (
-        #     hl_entities_context,
-        #     hl_relations_context,
-        #     hl_text_units_context,
-        # ) = hl_data
-
-        # entities_context, relations_context, text_units_context = combine_contexts(
-        #     [hl_entities_context, ll_entities_context],
-        #     [hl_relations_context, ll_relations_context],
-        #     [hl_text_units_context, ll_text_units_context],
-        # )
+        entities, relations, text_units = _combine_context_rows(hl_data, ll_data)
+
     # not necessary to use LLM to generate a response
-    if not entities_context.strip() and not relations_context.strip():
+    if not entities and not relations:
         return None
 
+    entities_context, relations_context = _render_context_rows(entities, relations)
     result = f"""
     -----Entities-----
     ```csv
@@ -1155,38 +1598,140 @@ async def _build_query_context(
     return result
 
 
+def _combine_context_rows(
+    hl_data: tuple[list[dict], list[dict], list[dict]],
+    ll_data: tuple[list[dict], list[dict], list[dict]],
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """Merge the global and local retrieval rows, dropping duplicates by id"""
+
+    def merge(first: list[dict], second: list[dict], key) -> list[dict]:
+        seen = set()
+        merged = []
+        for row in first + second:
+            row_key = key(row)
+            if row_key not in seen:
+                seen.add(row_key)
+                merged.append(row)
+        return merged
+
+    return (
+        merge(hl_data[0], ll_data[0], lambda n: n["entity_name"]),
+        merge(
+            hl_data[1], ll_data[1], lambda e: tuple(sorted((e["src_id"], e["tgt_id"])))
+        ),
+        # Chunk ids are the hash of their content
+        merge(hl_data[2], ll_data[2], lambda t: t["content"]),
+    )
+
+
+def _format_created_at(created_at: Any) -> Any:
+    if isinstance(created_at, (int, float)):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
+    return "UNKNOWN" if created_at is None else created_at
+
+
+def _render_context_rows(
+    entities: list[dict], relations: list[dict]
+) -> tuple[str, str]:
+    """Render the retrieved rows as the CSV sections of the prompt"""
+    entities_section_list = [
+        ["id", "entity", "type", "description", "rank", "created_at"]
+    ]
+    for i, n in enumerate(entities):
+        entities_section_list.append(
+            [
+                i,
+                n["entity_name"],
+                n.get("entity_type", "UNKNOWN"),
+                n.get("description", "UNKNOWN"),
+                n["rank"],
+                _format_created_at(n.get("created_at")),
+            ]
+        )
+
+    relations_section_list = [
+        [
+            "id",
+            "source",
+            "target",
+            "description",
+            "keywords",
+            "weight",
+            "rank",
+            "created_at",
+        ]
+    ]
+    for i, e in enumerate(relations):
+        relations_section_list.append(
+            [
+                i,
+                e["src_id"],
+                e["tgt_id"],
+                e["description"],
+                e["keywords"],
+                e["weight"],
+                e["rank"],
+                _format_created_at(e.get("created_at")),
+            ]
+        )
+
+    return (
+        list_of_list_to_csv(entities_section_list),
+        list_of_list_to_csv(relations_section_list),
+    )
+
+
 async def _get_node_data(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
     entities_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
-):
+    prefetched: dict[str, Any] | None = None,
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """Local retrieval: entities matching the keywords, their relations and chunks"""
     start_time = time.perf_counter()
+    prefetched = prefetched or {}
     # get similar entities
     logger.info(
         f"Query nodes: {query}, top_k: {query_param.top_k}, cosine: {entities_vdb.cosine_better_than_threshold}"
     )
-    results = await entities_vdb.query(query, top_k=query_param.top_k)
+    if prefetched.get("seed_entities"):
+        results = [{"entity_name": name} for name in prefetched["seed_entities"]]
+    else:
+        search_k = _search_top_k(query_param.top_k, query_param)
+        results = await _query_vdb(entities_vdb, query, search_k, query_param)
+        results = _merge_speculative_results(
+            results,
+            prefetched.get("entities"),
+            lambda r: r["entity_name"],
+            search_k,
+        )
+        results = _restrict_to_chunks(results, query_param, query_param.top_k)
     if not len(results):
-        return "", "", ""
-    # get entity information
-    node_datas, node_degrees = await asyncio.gather(
-        asyncio.gather(
-            *[knowledge_graph_inst.get_node(r["entity_name"]) for r in results]
-        ),
-        asyncio.gather(
-            *[knowledge_graph_inst.node_degree(r["entity_name"]) for r in results]
-        ),
-    )
-
-    if not all([n is not None for n in node_datas]):
+        return [], [], []
+    # get entity information, the prefetch already read part of it
+    entity_names = [r["entity_name"] for r in results]
+    known_nodes = prefetched.get("nodes", {})
+    known_degrees = prefetched.get("node_degrees", {})
+    missing = [name for name in entity_names if name not in known_degrees]
+    nodes_dict, degrees_dict = await asyncio.gather(
+        knowledge_graph_inst.get_nodes_batch(missing),
+        knowledge_graph_inst.node_degrees_batch(missing),
+    )
+    for name in entity_names:
+        if name in known_degrees:
+            degrees_dict[name] = known_degrees[name]
+            if name in known_nodes:
+                nodes_dict[name] = known_nodes[name]
+
+    if not all(name in nodes_dict for name in entity_names):
         logger.warning("Some nodes are missing, maybe the storage is damaged")
 
     node_datas = [
-        {**n, "entity_name": k["entity_name"], "rank": d}
-        for k, n, d in zip(results, node_datas, node_degrees)
-        if n is not None
+        {**nodes_dict[name], "entity_name": name, "rank": degrees_dict.get(name, 0)}
+        for name in entity_names
+        if name in nodes_dict
     ]  # what is this text_chunks_db doing.  dont remember it in airvx.  check the diagram.
     # get entitytext chunk
     use_text_units, use_relations = await asyncio.gather(
@@ -1203,6 +1748,7 @@ async def _get_node_data(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1211,75 +1757,19 @@ async def _get_node_data(
     logger.info(
         f"Local query uses {len(node_datas)} entites, {len(use_relations)} relations, {len(use_text_units)} chunks"
     )
+    record_cache_dependencies(
+        entities=[n["entity_name"] for n in node_datas]
+        + [name for e in use_relations for name in e["src_tgt"]]
+    )
 
-    # build prompt
-    entites_section_list = [
-        [
-            "id",
-            "entity",
-            "type",
-            "description",
-            "rank" "created_at",
-        ]
-    ]
-    for i, n in enumerate(node_datas):
-        created_at = n.get("created_at", "UNKNOWN")
-        if isinstance(created_at, (int, float)):
-            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
-        entites_section_list.append(
-            [
-                i,
-                n["entity_name"],
-                n.get("entity_type", "UNKNOWN"),
-                n.get("description", "UNKNOWN"),
-                n["rank"],
-                created_at,
-            ]
-        )
-    # entites_section_list[1:] = sorted(entites_section_list[1:], key=lambda x: x[4], reverse=True)[:query_param.top_k] 
-    entities_context = list_of_list_to_csv(entites_section_list)
-
-    relations_section_list = [
-        [
-            "id",
-            "source",
-            "target",
-            "description",
-            "keywords",
-            "weight",
-            "rank",
-            "created_at",
-        ]
-    ]
-    for i, e in enumerate(use_relations):
-        created_at = e.get("created_at", "UNKNOWN")
-        # Convert timestamp to readable format
-        if isinstance(created_at, (int, float)):
-            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
-        relations_section_list.append(
-            [
-                i,
-                e["src_tgt"][0],
-                e["src_tgt"][1],
-                e["description"],
-                e["keywords"],
-                e["weight"],
-                e["rank"],
-                created_at,
-            ]
-        )
-    # relations_section_list[1:] = sorted(relations_section_list[1:], key=lambda x: (x[6], x[5]), reverse=True)[:query_param.top_k] 
-    relations_context = list_of_list_to_csv(relations_section_list)
-
-    text_units_section_list = [["id", "content"]]
-    for i, t in enumerate(use_text_units):
-        text_units_section_list.append([i, t["content"]])
-    # text_units_section_list[1:] = text_units_section_list[1:query_param.top_k + 1] 
-    text_units_context = list_of_list_to_csv(text_units_section_list)
-    
     end_time = time.perf_counter()
     logging.info(f"\n\n⏳ Time for get_node_data: {(end_time - start_time):.4f} s")
-    return entities_context, relations_context, text_units_context
+    relations = [
+        {**e, "src_id": e["src_tgt"][0], "tgt_id": e["src_tgt"][1]}
+        for e in use_relations
+    ]
+    return node_datas, relations, use_text_units
+
 
 async def _get_node_data_new(
     query: str,
@@ -1294,18 +1784,16 @@ async def _get_node_data_new(
     logger.info(
         f"Query nodes: {query}, top_k: {query_param.top_k}, cosine: {entities_vdb.cosine_better_than_threshold}"
     )
-    results = await entities_vdb.query(query, top_k=query_param.top_k)
+    results = await _query_vdb(entities_vdb, query, query_param.top_k, query_param)
     if not len(results):
         return "", "", ""
     # get entity information
-    node_datas, node_degrees = await asyncio.gather(
-        asyncio.gather(
-            *[knowledge_graph_inst.get_node(r["entity_name"]) for r in results]
-        ),
-        asyncio.gather(
-            *[knowledge_graph_inst.node_degree(r["entity_name"]) for r in results]
-        ),
+    entity_names = [r["entity_name"] for r in results]
+    node_datas, degrees_dict = await asyncio.gather(
+        asyncio.gather(*[knowledge_graph_inst.get_node(n) for n in entity_names]),
+        knowledge_graph_inst.node_degrees_batch(entity_names),
     )
+    node_degrees = [degrees_dict.get(n, 0) for n in entity_names]
 
     if not all([n is not None for n in node_datas]):
         logger.warning("Some nodes are missing, maybe the storage is damaged")
@@ -1332,6 +1820,7 @@ async def _get_node_data_new(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1423,7 +1912,7 @@ async def _get_node_data_new1(
 
     # Step 1: Truy vấn thực thể liên quan từ vector DB
     logger.info(f"Query nodes: {ll_keywords}, top_k: {query_param.top_k}")
-    entity_results = await entities_vdb.query(ll_keywords, top_k=query_param.top_k)
+    entity_results = await _query_vdb(entities_vdb, ll_keywords, query_param.top_k, query_param)
     if not entity_results:
         return "", "", ""
 
@@ -1445,7 +1934,9 @@ async def _get_node_data_new1(
         return "", "", ""
 
     # Step 3: Lấy top-k quan hệ từ hl_keywords để đối chiếu cho từng thực thể
-    rel_y_candidates = await relationships_vdb.query(hl_keywords, top_k=query_param.top_k)
+    rel_y_candidates = await _query_vdb(
+        relationships_vdb, hl_keywords, query_param.top_k, query_param
+    )
     logging.info(f"rel-vector: {rel_y_candidates}")
     use_relations = []
     for ent in node_datas:
@@ -1468,6 +1959,7 @@ async def _get_node_data_new1(
         node_datas,
         key=lambda x: x["description"] or "",
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
 
     # Step 6: Build context đầu ra (CSV sections)
@@ -1516,12 +2008,12 @@ async def _find_most_related_edges_from_entities_new(
     knowledge_graph_inst: BaseGraphStorage,
 ) -> list[dict]:
     # Truy xuất tất cả cạnh liên quan đến các thực thể
-    all_related_edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
+    all_related_edges = await knowledge_graph_inst.get_nodes_top_edges_batch(
+        [dp["entity_name"] for dp in node_datas], query_param.max_edges_per_node
     )
     all_edges = []
     seen = set()
-    for this_edges in all_related_edges:
+    for this_edges in all_related_edges.values():
         for e in this_edges:
             sorted_edge = tuple(sorted(e))
             if sorted_edge not in seen:
@@ -1559,6 +2051,7 @@ async def _find_most_related_edges_from_entities_new(
         filtered_edges,
         key=lambda x: x.get("description", ""),
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
 
     logger.debug(
@@ -1567,38 +2060,91 @@ async def _find_most_related_edges_from_entities_new(
     return filtered_edges
 
 
+def _relation_vector_ids(relation: dict) -> list[str]:
+    """Ids the relation may be stored under in the relationships vector storage"""
+    if relation.get("id"):
+        return [relation["id"]]
+    src, tgt = relation.get("src_tgt") or (relation["src_id"], relation["tgt_id"])
+    # Relations are undirected, the stored id follows the extraction order
+    return [
+        compute_mdhash_id(src + tgt, prefix="rel-"),
+        compute_mdhash_id(tgt + src, prefix="rel-"),
+    ]
 
-from sklearn.metrics.pairwise import cosine_similarity
 
 async def find_best_relation_by_description_embedding(
     use_relations: list[dict],
     rel_y_description: str,
     relationships_vdb: BaseVectorStorage,
 ) -> list[dict]:
+    """Keep the relation closest to rel_y_description, by cosine similarity.
+
+    The relations are scored with the vectors already in relationships_vdb,
+    in one matrix product; only the description and the relations without a
+    stored vector are embedded.
+    """
     if not use_relations or not rel_y_description:
         return use_relations
 
-    # Tạo vector cho rel-Y
-    rel_y_vector = (await relationships_vdb.embedding_func([rel_y_description]))[0]
-
-    # Lấy mô tả các rel-X
-    rel_x_descriptions = [rel["description"] for rel in use_relations]
-
-    # Nhúng toàn bộ rel-Xs
-    rel_x_vectors = await relationships_vdb.embedding_func(rel_x_descriptions)
-
-    # So sánh cosine
-    best_score = -1
-    best_idx = -1
-    for i, vec in enumerate(rel_x_vectors):
-        score = cosine_similarity([rel_y_vector], [vec])[0][0]
-        if score > best_score:
-            best_score = score
-            best_idx = i
-
-    if best_idx >= 0:
-        return [use_relations[best_idx]]
-    return use_relations
+    candidate_ids = [_relation_vector_ids(rel) for rel in use_relations]
+    stored = await relationships_vdb.get_vectors_by_ids(
+        [id for ids in candidate_ids for id in ids]
+    )
+    vectors = [
+        next((stored[id] for id in ids if id in stored), None) for ids in candidate_ids
+    ]
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    embeddings = await relationships_vdb.embedding_func(
+        [rel_y_description]
+        + [use_relations[i].get("description") or "" for i in missing]
+    )
+    for i, vec in zip(missing, embeddings[1:]):
+        vectors[i] = vec
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    target = np.asarray(embeddings[0], dtype=np.float32)
+    target /= np.linalg.norm(target) + 1e-12
+    return [use_relations[int(np.argmax(matrix @ target))]]
+
+
+async def _load_chunks_within_budget(
+    chunk_ids: list[str], text_chunks_db: BaseKVStorage, max_token_size: int
+) -> list[tuple[str, dict]]:
+    """Load the leading chunks of a ranked id list that fit in max_token_size.
+
+    The budget is checked on the "tokens" stored with each chunk, so only the
+    chunks kept are read, with a single get_by_ids call. Chunks without a
+    stored count are counted from their content once loaded, missing chunks
+    are skipped. Returns (chunk id, chunk) pairs in rank order.
+    """
+    if max_token_size <= 0 or not chunk_ids:
+        return []
+    token_counts = await text_chunks_db.get_field_by_ids(chunk_ids, "tokens")
+    selected = []
+    total = 0
+    for c_id, tokens in zip(chunk_ids, token_counts):
+        try:
+            total += int(tokens)
+        except (TypeError, ValueError):
+            # Unknown for now, truncate_list_by_token_size counts the content
+            pass
+        if total > max_token_size:
+            break
+        selected.append(c_id)
+
+    chunks = await text_chunks_db.get_by_ids(selected)
+    loaded = [
+        (c_id, data)
+        for c_id, data in zip(selected, chunks)
+        if data is not None and "content" in data
+    ]
+    return truncate_list_by_token_size(
+        loaded,
+        key=lambda x: x[1]["content"],
+        max_token_size=max_token_size,
+        token_count=lambda x: x[1].get("tokens"),
+    )
 
 
 async def _find_most_related_text_unit_from_entities(
@@ -1611,82 +2157,55 @@ async def _find_most_related_text_unit_from_entities(
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in node_datas
     ]
-    edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
+    edges_dict = await knowledge_graph_inst.get_nodes_top_edges_batch(
+        [dp["entity_name"] for dp in node_datas], query_param.max_edges_per_node
     )
+    edges = [edges_dict.get(dp["entity_name"]) for dp in node_datas]
     all_one_hop_nodes = set()
     for this_edges in edges:
         if not this_edges:
             continue
         all_one_hop_nodes.update([e[1] for e in this_edges])
 
-    all_one_hop_nodes = list(all_one_hop_nodes)
-    all_one_hop_nodes_data = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(e) for e in all_one_hop_nodes]
+    all_one_hop_nodes_data = await knowledge_graph_inst.get_nodes_batch(
+        list(all_one_hop_nodes)
     )
 
     # Add null check for node data
     all_one_hop_text_units_lookup = {
         k: set(split_string_by_multi_markers(v["source_id"], [GRAPH_FIELD_SEP]))
-        for k, v in zip(all_one_hop_nodes, all_one_hop_nodes_data)
+        for k, v in all_one_hop_nodes_data.items()
         if v is not None and "source_id" in v  # Add source_id check
     }
 
+    # Rank the chunk ids first, only the chunks within the budget are loaded
     all_text_units_lookup = {}
-    tasks = []
-
     for index, (this_text_units, this_edges) in enumerate(zip(text_units, edges)):
         for c_id in this_text_units:
-            if c_id not in all_text_units_lookup:
-                all_text_units_lookup[c_id] = index
-                tasks.append((c_id, index, this_edges))
+            if c_id in all_text_units_lookup:
+                continue
+            relation_counts = sum(
+                1
+                for e in this_edges or ()
+                if c_id in all_one_hop_text_units_lookup.get(e[1], ())
+            )
+            all_text_units_lookup[c_id] = (index, -relation_counts)
 
-    results = await asyncio.gather(
-        *[text_chunks_db.get_by_id(c_id) for c_id, _, _ in tasks]
+    ranked_ids = sorted(all_text_units_lookup, key=all_text_units_lookup.get)
+    all_text_units = await _load_chunks_within_budget(
+        ranked_ids, text_chunks_db, query_param.max_token_for_text_unit
     )
 
-    for (c_id, index, this_edges), data in zip(tasks, results):
-        all_text_units_lookup[c_id] = {
-            "data": data,
-            "order": index,
-            "relation_counts": 0,
-        }
-
-        if this_edges:
-            for e in this_edges:
-                if (
-                    e[1] in all_one_hop_text_units_lookup
-                    and c_id in all_one_hop_text_units_lookup[e[1]]
-                ):
-                    all_text_units_lookup[c_id]["relation_counts"] += 1
-
-    # Filter out None values and ensure data has content
-    all_text_units = [
-        {"id": k, **v}
-        for k, v in all_text_units_lookup.items()
-        if v is not None and v.get("data") is not None and "content" in v["data"]
-    ]
-
     if not all_text_units:
         logger.warning("No valid text units found")
         return []
 
-    all_text_units = sorted(
-        all_text_units, key=lambda x: (x["order"], -x["relation_counts"])
-    )
-
-    all_text_units = truncate_list_by_token_size(
-        all_text_units,
-        key=lambda x: x["data"]["content"],
-        max_token_size=query_param.max_token_for_text_unit,
-    )
-
     logger.debug(
-        f"Truncate chunks from {len(all_text_units_lookup)} to {len(all_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
+        f"Truncate chunks from {len(ranked_ids)} to {len(all_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
     )
 
-    all_text_units = [t["data"] for t in all_text_units]
-    return all_text_units
+    record_cache_dependencies(chunks=[c_id for c_id, _ in all_text_units])
+    return [data for _, data in all_text_units]
 
 
 async def _find_most_related_edges_from_entities(
@@ -1694,14 +2213,15 @@ async def _find_most_related_edges_from_entities(
     query_param: QueryParam,
     knowledge_graph_inst: BaseGraphStorage,
 ):
-    all_related_edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
+    # Hubs such as a shared price only contribute their best ranked edges
+    all_related_edges = await knowledge_graph_inst.get_nodes_top_edges_batch(
+        [dp["entity_name"] for dp in node_datas], query_param.max_edges_per_node
     )
-    
+
     all_edges = []
     seen = set()
 
-    for this_edges in all_related_edges:
+    for this_edges in all_related_edges.values():
         for e in this_edges:
             sorted_edge = tuple(sorted(e))
             if sorted_edge not in seen:
@@ -1709,16 +2229,14 @@ async def _find_most_related_edges_from_entities(
                 all_edges.append(sorted_edge)
 
     all_edges_pack, all_edges_degree = await asyncio.gather(
-        asyncio.gather(*[knowledge_graph_inst.get_edge(e[0], e[1]) for e in all_edges]),
-        asyncio.gather(
-            *[knowledge_graph_inst.edge_degree(e[0], e[1]) for e in all_edges]
-        ),
+        knowledge_graph_inst.get_edges_batch(all_edges),
+        knowledge_graph_inst.edge_degrees_batch(all_edges),
     )
     logging.info(f"all_edges_pack: {all_edges_pack}")
     all_edges_data = [
-        {"src_tgt": k, "rank": d, **v}
-        for k, v, d in zip(all_edges, all_edges_pack, all_edges_degree)
-        if v is not None
+        {"src_tgt": k, "rank": all_edges_degree.get(k, 0), **all_edges_pack[k]}
+        for k in all_edges
+        if k in all_edges_pack
     ]
     logging.info(f"all_edges_data: {all_edges_data}")
     all_edges_data = sorted(
@@ -1728,6 +2246,7 @@ async def _find_most_related_edges_from_entities(
         all_edges_data,
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
 
     logger.debug(
@@ -1743,38 +2262,52 @@ async def _get_edge_data(
     relationships_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
-):
+    prefetched: dict[str, Any] | None = None,
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """Global retrieval: relations matching the keywords, their entities and chunks"""
     start_time = time.time()
+    prefetched = prefetched or {}
     logger.info(
         f"Query edges: {keywords}, top_k: {query_param.top_k}, cosine: {relationships_vdb.cosine_better_than_threshold}"
     )
-    results = await relationships_vdb.query(keywords, top_k=query_param.top_k)
+    search_k = _search_top_k(query_param.top_k, query_param)
+    results = await _query_vdb(relationships_vdb, keywords, search_k, query_param)
+    results = _merge_speculative_results(
+        results,
+        prefetched.get("relationships"),
+        lambda r: (r["src_id"], r["tgt_id"]),
+        search_k,
+    )
+    results = _restrict_to_chunks(results, query_param, query_param.top_k)
 
     if not len(results):
-        return "", "", ""
-
-    edge_datas, edge_degree = await asyncio.gather(
-        asyncio.gather(
-            *[knowledge_graph_inst.get_edge(r["src_id"], r["tgt_id"]) for r in results]
-        ),
-        asyncio.gather(
-            *[
-                knowledge_graph_inst.edge_degree(r["src_id"], r["tgt_id"])
-                for r in results
-            ]
-        ),
-    )
+        return [], [], []
+
+    # the prefetch already read part of the edges
+    pairs = [(r["src_id"], r["tgt_id"]) for r in results]
+    known_edges = prefetched.get("edges", {})
+    known_degrees = prefetched.get("edge_degrees", {})
+    missing = [pair for pair in pairs if pair not in known_degrees]
+    edges_dict, edge_degrees = await asyncio.gather(
+        knowledge_graph_inst.get_edges_batch(missing),
+        knowledge_graph_inst.edge_degrees_batch(missing),
+    )
+    for pair in pairs:
+        if pair in known_degrees:
+            edge_degrees[pair] = known_degrees[pair]
+            if pair in known_edges:
+                edges_dict[pair] = known_edges[pair]
 
     edge_datas = [
         {
             "src_id": k["src_id"],
             "tgt_id": k["tgt_id"],
-            "rank": d,
+            "rank": edge_degrees.get(pair, 0),
             "created_at": k.get("__created_at__", None),
-            **v,
+            **edges_dict[pair],
         }
-        for k, v, d in zip(results, edge_datas, edge_degree)
-        if v is not None
+        for k, pair in zip(results, pairs)
+        if pair in edges_dict
     ]
     # logging.info(f"\n\n-----Embed_relationship-----\n{edge_datas}")
     edge_datas = sorted(
@@ -1784,6 +2317,7 @@ async def _get_edge_data(
         edge_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     use_entities, use_text_units = await asyncio.gather(
         _find_most_related_entities_from_relationships(
@@ -1796,67 +2330,14 @@ async def _get_edge_data(
     logger.info(
         f"Global query uses {len(use_entities)} entites, {len(edge_datas)} relations, {len(use_text_units)} chunks"
     )
-
-    relations_section_list = [
-        [
-            "id",
-            "source",
-            "target",
-            "description",
-            "keywords",
-            "weight",
-            "rank",
-            "created_at",
-        ]
-    ]
-    for i, e in enumerate(edge_datas):
-        created_at = e.get("created_at", "Unknown")
-        # Convert timestamp to readable format
-        if isinstance(created_at, (int, float)):
-            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
-        relations_section_list.append(
-            [
-                i,
-                e["src_id"],
-                e["tgt_id"],
-                e["description"],
-                e["keywords"],
-                e["weight"],
-                e["rank"],
-                created_at,
-            ]
-        )
-    # relations_section_list[1:] = sorted(relations_section_list[1:], key=lambda x: (x[6], x[5]), reverse=True)[:query_param.top_k] 
-    relations_context = list_of_list_to_csv(relations_section_list)
-
-    entites_section_list = [["id", "entity", "type", "description", "rank"]]
-    for i, n in enumerate(use_entities):
-        created_at = e.get("created_at", "Unknown")
-        # Convert timestamp to readable format
-        if isinstance(created_at, (int, float)):
-            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
-        entites_section_list.append(
-            [
-                i,
-                n["entity_name"],
-                n.get("entity_type", "UNKNOWN"),
-                n.get("description", "UNKNOWN"),
-                n["rank"],
-                created_at,
-            ]
-        )
-    # entites_section_list[1:] = sorted(entites_section_list[1:], key=lambda x: x[4], reverse=True)[:query_param.top_k] 
-    entities_context = list_of_list_to_csv(entites_section_list)
-
-    text_units_section_list = [["id", "content"]]
-    for i, t in enumerate(use_text_units):
-        text_units_section_list.append([i, t["content"]])
-    # text_units_section_list[1:] = text_units_section_list[1:query_param.top_k + 1] 
-    text_units_context = list_of_list_to_csv(text_units_section_list)
+    record_cache_dependencies(
+        entities=[n["entity_name"] for n in use_entities]
+        + [name for e in edge_datas for name in (e["src_id"], e["tgt_id"])]
+    )
 
     end_time = time.time()
     logging.info(f"\n\n⏳ Time for get_edge_data: {(end_time - start_time):.4f} s")
-    return entities_context, relations_context, text_units_context
+    return use_entities, edge_datas, use_text_units
 
 
 async def _find_most_related_entities_from_relationships(
@@ -1875,23 +2356,14 @@ async def _find_most_related_entities_from_relationships(
             entity_names.append(e["tgt_id"])
             seen.add(e["tgt_id"])
 
-    node_datas, node_degrees = await asyncio.gather(
-        asyncio.gather(
-            *[
-                knowledge_graph_inst.get_node(entity_name)
-                for entity_name in entity_names
-            ]
-        ),
-        asyncio.gather(
-            *[
-                knowledge_graph_inst.node_degree(entity_name)
-                for entity_name in entity_names
-            ]
-        ),
+    nodes_dict, degrees_dict = await asyncio.gather(
+        knowledge_graph_inst.get_nodes_batch(entity_names),
+        knowledge_graph_inst.node_degrees_batch(entity_names),
     )
     node_datas = [
-        {**n, "entity_name": k, "rank": d}
-        for k, n, d in zip(entity_names, node_datas, node_degrees)
+        {**nodes_dict[k], "entity_name": k, "rank": degrees_dict.get(k, 0)}
+        for k in entity_names
+        if k in nodes_dict
     ]
 
     len_node_datas = len(node_datas)
@@ -1899,6 +2371,7 @@ async def _find_most_related_entities_from_relationships(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1917,75 +2390,28 @@ async def _find_related_text_unit_from_relationships(
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in edge_datas
     ]
-    all_text_units_lookup = {}
-
-    async def fetch_chunk_data(c_id, index):
-        if c_id not in all_text_units_lookup:
-            chunk_data = await text_chunks_db.get_by_id(c_id)
-            # Only store valid data
-            if chunk_data is not None and "content" in chunk_data:
-                all_text_units_lookup[c_id] = {
-                    "data": chunk_data,
-                    "order": index,
-                }
-
-    tasks = []
-    for index, unit_list in enumerate(text_units):
-        for c_id in unit_list:
-            tasks.append(fetch_chunk_data(c_id, index))
-
-    await asyncio.gather(*tasks)
+    # Chunks in the order of the relations they come from
+    ranked_ids = list(dict.fromkeys(c_id for units in text_units for c_id in units))
+    truncated_text_units = await _load_chunks_within_budget(
+        ranked_ids, text_chunks_db, query_param.max_token_for_text_unit
+    )
 
-    if not all_text_units_lookup:
+    if not truncated_text_units:
         logger.warning("No valid text chunks found")
         return []
 
-    all_text_units = [{"id": k, **v} for k, v in all_text_units_lookup.items()]
-    all_text_units = sorted(all_text_units, key=lambda x: x["order"])
-
-    # Ensure all text chunks have content
-    valid_text_units = [
-        t for t in all_text_units if t["data"] is not None and "content" in t["data"]
-    ]
-
-    if not valid_text_units:
-        logger.warning("No valid text chunks after filtering")
-        return []
-
-    truncated_text_units = truncate_list_by_token_size(
-        valid_text_units,
-        key=lambda x: x["data"]["content"],
-        max_token_size=query_param.max_token_for_text_unit,
-    )
-
     logger.debug(
-        f"Truncate chunks from {len(valid_text_units)} to {len(truncated_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
+        f"Truncate chunks from {len(ranked_ids)} to {len(truncated_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
     )
 
-    all_text_units: list[TextChunkSchema] = [t["data"] for t in truncated_text_units]
+    record_cache_dependencies(chunks=[c_id for c_id, _ in truncated_text_units])
+    all_text_units: list[TextChunkSchema] = [data for _, data in truncated_text_units]
 
     return all_text_units
 
 
-def combine_contexts(entities, relationships, sources):
-    # Function to extract entities, relationships, and sources from context strings
-    hl_entities, ll_entities = entities[0], entities[1]
-    hl_relationships, ll_relationships = relationships[0], relationships[1]
-    hl_sources, ll_sources = sources[0], sources[1]
-    # Combine and deduplicate the entities
-    combined_entities = process_combine_contexts(hl_entities, ll_entities)
-
-    # Combine and deduplicate the relationships
-    combined_relationships = process_combine_contexts(
-        hl_relationships, ll_relationships
-    )
-
-    # Combine and deduplicate the sources
-    combined_sources = process_combine_contexts(hl_sources, ll_sources)
-
-    return combined_entities, combined_relationships, combined_sources
-
-
+@single_flight(_query_flight_key)
+@use_embedding_cache
 async def naive_query(
     query: str,
     chunks_vdb: BaseVectorStorage,
@@ -1994,6 +2420,7 @@ async def naive_query(
     global_config: dict[str, str],
     hashing_kv: BaseKVStorage | None = None,
     system_prompt: str | None = None,
+    lexical_index: LexicalIndex | None = None,
 ) -> str | AsyncIterator[str]:
     # Handle cache
     start_time = time.time()
@@ -2004,8 +2431,11 @@ async def naive_query(
     )
     if cached_response is not None:
         return cached_response
+    dependencies = start_cache_dependencies()
 
-    results = await chunks_vdb.query(query, top_k=query_param.top_k)
+    results = await _retrieve_chunks(
+        query, chunks_vdb, lexical_index, query_param.top_k, query_param
+    )
 
 
 
@@ -2022,6 +2452,7 @@ async def naive_query(
         return PROMPTS["fail_response"]
 
     chunks_ids = [r["id"] for r in results]
+    record_cache_dependencies(chunks=chunks_ids)
     chunks = await text_chunks_db.get_by_ids(chunks_ids)
 
     # Filter out invalid chunks
@@ -2037,6 +2468,7 @@ async def naive_query(
         valid_chunks,
         key=lambda x: x["content"],
         max_token_size=query_param.max_token_for_text_unit,
+        token_count=lambda x: x.get("tokens"),
     )
 
     if not maybe_trun_chunks:
@@ -2078,8 +2510,9 @@ async def naive_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
 
     response = await use_model_func(
         query,
@@ -2110,6 +2543,7 @@ async def naive_query(
             max_val=max_val,
             mode=query_param.mode,
             cache_type="query",
+            dependencies=dependencies,
         ),
     )
 
@@ -2118,6 +2552,7 @@ async def naive_query(
     return response
 
 
+@use_embedding_cache
 async def kg_query_with_keywords(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -2143,7 +2578,10 @@ async def kg_query_with_keywords(
         hashing_kv, args_hash, query, query_param.mode, cache_type="query"
     )
     if cached_response is not None:
+        if query_param.stream:
+            return replay_cached_answer(cached_response)
         return cached_response
+    dependencies = start_cache_dependencies()
 
     # ---------------------------
     # 2) RETRIEVE KEYWORDS FROM query_param
@@ -2222,8 +2660,9 @@ async def kg_query_with_keywords(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
 
     response = await use_model_func(
         query,
@@ -2243,19 +2682,20 @@ async def kg_query_with_keywords(
             .strip()
         )
 
-        # 7. Save cache - 只有在收集完整响应后才缓存
-        await save_to_cache(
-            hashing_kv,
-            CacheData(
-                args_hash=args_hash,
-                content=response,
-                prompt=query,
-                quantized=quantized,
-                min_val=min_val,
-                max_val=max_val,
-                mode=query_param.mode,
-                cache_type="query",
-            ),
-        )
+    # 7. Save cache, a streamed answer once it has been read to the end
+    response = await cache_answer(
+        hashing_kv,
+        CacheData(
+            args_hash=args_hash,
+            content=response,
+            prompt=query,
+            quantized=quantized,
+            min_val=min_val,
+            max_val=max_val,
+            mode=query_param.mode,
+            cache_type="query",
+            dependencies=dependencies,
+        ),
+    )
 
     return response
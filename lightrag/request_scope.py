@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from .base import BaseGraphStorage, BaseKVStorage, BaseVectorStorage
+from .utils import logger
+
+
+class RequestScope:
+    """Read-through cache of the storage reads made while answering one query.
+
+    The retrieval stages of a query read the same records several times: the
+    entities found by `_get_node_data` are read again by the text unit and
+    edge finders, and their one-hop neighbors are read once per finder.
+    `graph`, `kv` and `vector` wrap a storage in a proxy that memoizes these
+    reads by key for the lifetime of the scope, so every backend is hit at
+    most once per record and query. Concurrent reads of the same key share
+    the storage call in flight.
+
+    Only reads are cached, a scope must not outlive the query it was created
+    for. `stats` reports the storage reads made and the duplicates avoided.
+    """
+
+    def __init__(self):
+        self.reads: Counter[str] = Counter()
+        self.avoided: Counter[str] = Counter()
+        self._cache: dict[tuple[str, Hashable], dict[Hashable, asyncio.Future]] = {}
+
+    def graph(self, storage: BaseGraphStorage | None):
+        return None if storage is None else _GraphReader(storage, self)
+
+    def kv(self, storage: BaseKVStorage | None):
+        return None if storage is None else _KVReader(storage, self)
+
+    def vector(self, storage: BaseVectorStorage | None):
+        return None if storage is None else _VectorReader(storage, self)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {"reads": dict(self.reads), "avoided": dict(self.avoided)}
+
+    def fork(self) -> RequestScope:
+        """A new scope that starts with the vector searches of this one.
+
+        The searches already made, such as a batch run for several queries,
+        are shared with the new scope, the other reads are not. Reads of the
+        new scope are not added back, so it can be dropped on its own.
+        """
+        scope = RequestScope()
+        for (op, variant), cache in self._cache.items():
+            if op.startswith("query:"):
+                scope._cache[(op, variant)] = dict(cache)
+        return scope
+
+    def add_stats(self, other: RequestScope) -> None:
+        self.reads.update(other.reads)
+        self.avoided.update(other.avoided)
+
+    def log_stats(self) -> None:
+        if self.avoided:
+            logger.info(
+                f"Request cache: {sum(self.reads.values())} storage reads, "
+                f"{sum(self.avoided.values())} duplicates avoided {dict(self.avoided)}"
+            )
+
+    async def read(
+        self,
+        op: str,
+        keys: Iterable[Hashable],
+        fetch: Callable[[list], Awaitable[dict]],
+        variant: Hashable = None,
+    ) -> dict[Hashable, Any]:
+        """Values of keys for op, calling fetch(missing keys) -> {key: value} once.
+
+        Keys absent from the fetched dict are cached as None. `variant` tells
+        apart reads of the same op with different arguments, e.g. a limit.
+        """
+        cache = self._cache.setdefault((op, variant), {})
+        keys = list(dict.fromkeys(keys))
+        missing = [key for key in keys if key not in cache]
+        if len(missing) < len(keys):
+            self.avoided[op] += len(keys) - len(missing)
+        if missing:
+            self.reads[op] += len(missing)
+            # Not cancelled with the caller, other readers may wait for it
+            task = asyncio.ensure_future(fetch(missing))
+            task.add_done_callback(lambda t: self._forget_failed(cache, missing, t))
+            for key in missing:
+                cache[key] = task
+        tasks = {key: cache[key] for key in keys}
+        for task in set(tasks.values()):
+            await asyncio.shield(task)
+        return {key: task.result().get(key) for key, task in tasks.items()}
+
+    @staticmethod
+    def _forget_failed(cache: dict, keys: list, task: asyncio.Future) -> None:
+        if task.cancelled() or task.exception() is not None:
+            for key in keys:
+                if cache.get(key) is task:
+                    del cache[key]
+
+
+class _StorageReader:
+    """Forward everything but the memoized reads to the wrapped storage"""
+
+    def __init__(self, storage, scope: RequestScope):
+        self._storage = storage
+        self._scope = scope
+
+    def __getattr__(self, name: str):
+        return getattr(self._storage, name)
+
+
+class _GraphReader(_StorageReader):
+    async def _nodes(self, node_ids: list[str]) -> dict[str, dict | None]:
+        return await self._scope.read(
+            f"get_node:{self.namespace}", node_ids, self._storage.get_nodes_batch
+        )
+
+    async def get_node(self, node_id: str) -> dict[str, str] | None:
+        return (await self._nodes([node_id]))[node_id]
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict[str, str]]:
+        nodes = await self._nodes(node_ids)
+        return {n: data for n, data in nodes.items() if data is not None}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        degrees = await self._scope.read(
+            f"node_degree:{self.namespace}",
+            node_ids,
+            self._storage.node_degrees_batch,
+        )
+        return {n: d or 0 for n, d in degrees.items()}
+
+    async def node_degree(self, node_id: str) -> int:
+        return (await self.node_degrees_batch([node_id]))[node_id]
+
+    async def edge_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        # Same definition as BaseGraphStorage, through the memoized node degrees
+        node_ids = list({n for pair in pairs for n in pair})
+        degrees = await self.node_degrees_batch(node_ids)
+        return {(s, t): degrees[s] + degrees[t] for s, t in pairs}
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return (await self.edge_degrees_batch([(src_id, tgt_id)]))[(src_id, tgt_id)]
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict[str, str]]:
+        edges = await self._scope.read(
+            f"get_edge:{self.namespace}", pairs, self._storage.get_edges_batch
+        )
+        return {pair: data for pair, data in edges.items() if data is not None}
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> dict[str, str] | None:
+        pair = (source_node_id, target_node_id)
+        return (await self.get_edges_batch([pair])).get(pair)
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        edges = await self._scope.read(
+            f"get_node_edges:{self.namespace}",
+            node_ids,
+            self._storage.get_nodes_edges_batch,
+        )
+        return {n: e or [] for n, e in edges.items()}
+
+    async def get_node_edges(self, source_node_id: str) -> list[tuple[str, str]] | None:
+        return (await self.get_nodes_edges_batch([source_node_id]))[source_node_id]
+
+    async def get_nodes_top_edges_batch(
+        self, node_ids: list[str], limit: int
+    ) -> dict[str, list[tuple[str, str]]]:
+        edges = await self._scope.read(
+            f"get_node_top_edges:{self.namespace}",
+            node_ids,
+            lambda ids: self._storage.get_nodes_top_edges_batch(ids, limit),
+            variant=limit,
+        )
+        return {n: e or [] for n, e in edges.items()}
+
+
+class _KVReader(_StorageReader):
+    async def _fetch(self, ids: list[str]) -> dict[str, dict | None]:
+        return dict(zip(ids, await self._storage.get_by_ids(ids)))
+
+    async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any] | None]:
+        values = await self._scope.read(f"get_by_id:{self.namespace}", ids, self._fetch)
+        # Callers may update the records they get, hand out copies
+        return [None if values[id] is None else dict(values[id]) for id in ids]
+
+    async def get_by_id(self, id: str) -> dict[str, Any] | None:
+        return (await self.get_by_ids([id]))[0]
+
+    async def get_field_by_ids(self, ids: list[str], field: str) -> list[Any]:
+        async def fetch(missing: list[str]) -> dict[str, Any]:
+            values = await self._storage.get_field_by_ids(missing, field)
+            return dict(zip(missing, values))
+
+        values = await self._scope.read(
+            f"get_field_by_ids:{self.namespace}", ids, fetch, variant=field
+        )
+        return [values[id] for id in ids]
+
+
+class _VectorReader(_StorageReader):
+    def __init__(self, storage, scope: RequestScope):
+        super().__init__(storage, scope)
+        query = storage.query
+
+        # Keep the signature of the storage, _query_vdb inspects it for ANN knobs
+        @wraps(query)
+        async def memoized_query(*args, **kwargs):
+            key = self._query_key(args, kwargs)
+
+            async def fetch(keys):
+                return {key: await query(*args, **kwargs)}
+
+            results = await scope.read(f"query:{self.namespace}", [key], fetch)
+            # Callers may annotate the hits, hand out copies
+            return [dict(r) for r in results[key]]
+
+        self.query = memoized_query
+
+    @staticmethod
+    def _query_key(args: tuple, kwargs: dict) -> Hashable:
+        return args, tuple(sorted(kwargs.items()))
+
+    async def query_batch(
+        self, queries: list[str], top_k: int, **kwargs: Any
+    ) -> list[list[dict[str, Any]]]:
+        """Search the queries not searched yet in one batch, memoized like `query`.
+
+        A later `query(text, top_k=top_k, **kwargs)` of the scope is then
+        answered from the batch.
+        """
+        keys = {
+            query: self._query_key((query,), {"top_k": top_k, **kwargs})
+            for query in queries
+        }
+
+        async def fetch(missing: list) -> dict:
+            texts = [key[0][0] for key in missing]
+            results = await self._storage.query_batch(texts, top_k=top_k, **kwargs)
+            return dict(zip(missing, results))
+
+        results = await self._scope.read(
+            f"query:{self.namespace}", list(keys.values()), fetch
+        )
+        return [[dict(r) for r in results[keys[query]]] for query in queries]
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import html
+import inspect
 import io
 import csv
 import json
@@ -9,10 +10,14 @@ import logging
 import logging.handlers
 import os
 import re
+import time
+import unicodedata
+from collections import OrderedDict
+from contextvars import ContextVar
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
-from typing import Any, Callable
+from typing import Any, AsyncIterator, Callable, Iterable
 import xml.etree.ElementTree as ET
 import numpy as np
 import tiktoken
@@ -177,15 +182,198 @@ class UnlimitedSemaphore:
 ENCODER = None
 
 
+class EmbeddingCache:
+    """Process-wide LRU of text embeddings keyed by (model, md5 of the text).
+
+    It is shared by every EmbeddingFunc, so a query already embedded for one
+    vector storage or for the LLM cache lookup is not sent to the embedding
+    server again. Only calls made by the query functions decorated with
+    `use_embedding_cache` go through it: the texts embedded by storage
+    upserts are rarely embedded twice and would only evict the queries.
+    Vectors are kept as float32. When `file_name` is set the cache is loaded
+    from that .npz file, and persisted to it every `flush_every` new
+    embeddings and when the storages are finalized.
+    """
+
+    def __init__(
+        self, max_size: int, file_name: str | None = None, flush_every: int = 1000
+    ):
+        self.max_size = max_size
+        self.file_name = file_name
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[tuple[str, bytes], np.ndarray] = OrderedDict()
+        self._pending = 0
+        self._persisting = False
+        if file_name:
+            self._load()
+
+    @staticmethod
+    def key(model: str, text: str) -> tuple[str, bytes]:
+        return model, md5(text.encode("utf-8")).digest()
+
+    def get(self, key: tuple[str, bytes]) -> np.ndarray | None:
+        vector = self._data.get(key)
+        if vector is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, key: tuple[str, bytes], vector: np.ndarray) -> None:
+        self._data[key] = vector
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        self._pending += 1
+
+    def _load(self) -> None:
+        if not os.path.exists(self.file_name):
+            return
+        try:
+            with np.load(self.file_name, allow_pickle=False) as stored:
+                for i, model in enumerate(stored["models"]):
+                    vectors = stored[f"vectors{i}"].astype(np.float32, copy=False)
+                    for key, vector in zip(stored[f"keys{i}"], vectors):
+                        self._data[(str(model), key.tobytes())] = vector
+        except Exception as e:
+            logger.warning(f"Failed to load embedding cache {self.file_name}: {e}")
+            return
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        logger.info(f"Loaded {len(self._data)} cached embeddings from {self.file_name}")
+
+    def _write(self, items: list[tuple[tuple[str, bytes], np.ndarray]]) -> None:
+        by_model: dict[str, tuple[list[bytes], list[np.ndarray]]] = {}
+        for (model, digest), vector in items:
+            keys, vectors = by_model.setdefault(model, ([], []))
+            keys.append(digest)
+            vectors.append(vector)
+        arrays = {"models": np.array(list(by_model))}
+        for i, (keys, vectors) in enumerate(by_model.values()):
+            arrays[f"keys{i}"] = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(
+                len(keys), -1
+            )
+            arrays[f"vectors{i}"] = np.stack(vectors)
+        tmp_file_name = self.file_name + ".tmp"
+        with open(tmp_file_name, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_file_name, self.file_name)
+
+    def should_persist(self) -> bool:
+        return bool(self.file_name) and self._pending >= self.flush_every
+
+    async def persist(self) -> None:
+        """Write the cache file off the event loop, if anything changed"""
+        if not self.file_name or not self._pending or self._persisting:
+            return
+        self._persisting = True
+        # Entries are never mutated, the item list is a stable snapshot
+        items = list(self._data.items())
+        self._pending = 0
+        try:
+            await asyncio.to_thread(self._write, items)
+        except Exception as e:
+            logger.error(f"Error persisting embedding cache {self.file_name}: {e}")
+        finally:
+            self._persisting = False
+
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 4096))
+_embedding_cache: EmbeddingCache | None = None
+_embedding_cache_enabled: ContextVar[bool] = ContextVar(
+    "embedding_cache_enabled", default=False
+)
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """The process-wide embedding cache, None when EMBEDDING_CACHE_SIZE is 0"""
+    global _embedding_cache
+    if _embedding_cache is None and EMBEDDING_CACHE_SIZE > 0:
+        _embedding_cache = EmbeddingCache(
+            EMBEDDING_CACHE_SIZE,
+            os.getenv("EMBEDDING_CACHE_FILE") or None,
+            int(os.getenv("EMBEDDING_CACHE_FLUSH_EVERY", 1000)),
+        )
+    return _embedding_cache
+
+
+def use_embedding_cache(func):
+    """Send the embeddings computed while running `func` through the embedding cache"""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _embedding_cache_enabled.set(True)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _embedding_cache_enabled.reset(token)
+
+    return wrapper
+
+
+async def persist_embedding_cache() -> None:
+    if _embedding_cache is not None:
+        await _embedding_cache.persist()
+
+
 @dataclass
 class EmbeddingFunc:
     embedding_dim: int
     max_token_size: int
     func: callable
     # concurrent_limit: int = 16
+    model_name: str | None = None
+    """Identifies the model in the embedding cache, defaults to the function name and embedding_dim"""
+    use_cache: bool = True
+    """Look up and store the embedded texts in the process-wide EmbeddingCache,
+    for the calls made under `use_embedding_cache`"""
 
     async def __call__(self, *args, **kwargs) -> np.ndarray:
-        return await self.func(*args, **kwargs)
+        cache = (
+            get_embedding_cache()
+            if self.use_cache and _embedding_cache_enabled.get()
+            else None
+        )
+        if (
+            cache is None
+            or kwargs
+            or len(args) != 1
+            or not isinstance(args[0], list)
+            or not args[0]
+            or not all(isinstance(text, str) for text in args[0])
+        ):
+            return await self.func(*args, **kwargs)
+        return await self._call_cached(args[0], cache)
+
+    async def _call_cached(self, texts: list[str], cache: EmbeddingCache) -> np.ndarray:
+        model = self.model_name or (
+            f"{getattr(self.func, '__module__', '')}."
+            f"{getattr(self.func, '__qualname__', '')}:{self.embedding_dim}"
+        )
+        keys = [EmbeddingCache.key(model, text) for text in texts]
+        vectors = [cache.get(key) for key in keys]
+        # Only the distinct misses are sent to the embedding server
+        missing: dict[tuple[str, bytes], str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            computed = np.asarray(
+                await self.func(list(missing.values())), dtype=np.float32
+            )
+            fresh = {key: vector.copy() for key, vector in zip(missing, computed)}
+            for key, vector in fresh.items():
+                cache.put(key, vector)
+            vectors = [
+                vector if vector is not None else fresh[key]
+                for key, vector in zip(keys, vectors)
+            ]
+            if cache.should_persist():
+                await cache.persist()
+        return np.stack(vectors)
 
 
 def locate_json_string_body_from_string(content: str) -> str | None:
@@ -270,6 +458,142 @@ def limit_async_func_call(max_size: int):
     return final_decro
 
 
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+# Coalesce across gunicorn workers too, through the shared_storage manager
+SINGLE_FLIGHT_SHARED = os.getenv("SINGLE_FLIGHT_SHARED", "false").lower() == "true"
+# Longest wait for the result of another worker
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 300))
+# The leading worker renews its claim at this interval, a claim missing three
+# renewals is considered abandoned by a dead worker
+SINGLE_FLIGHT_HEARTBEAT = float(os.getenv("SINGLE_FLIGHT_HEARTBEAT", 5))
+SINGLE_FLIGHT_POLL_INTERVAL = 0.1
+
+# key -> task computing the result, shared by the concurrent callers
+_single_flights: dict[str, asyncio.Task] = {}
+
+
+async def _keep_flight_claimed(key: str) -> None:
+    from lightrag.kg import shared_storage
+
+    while True:
+        await asyncio.sleep(SINGLE_FLIGHT_HEARTBEAT)
+        await shared_storage.refresh_flight(key)
+
+
+async def _lead_single_flight(
+    key: str, func: Callable[[], Any], shared: bool
+) -> Any:
+    from lightrag.kg import shared_storage
+
+    if not (shared and SINGLE_FLIGHT_SHARED and shared_storage.is_multiprocess):
+        return await func()
+
+    # Another worker computing the same key stores its result in the LLM
+    # cache, wait for it so that func() finds the cached answer
+    claim_ttl = 3 * SINGLE_FLIGHT_HEARTBEAT
+    deadline = time.monotonic() + SINGLE_FLIGHT_TIMEOUT
+    claimed = await shared_storage.try_claim_flight(key, claim_ttl)
+    while not claimed and time.monotonic() < deadline:
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        claimed = await shared_storage.try_claim_flight(key, claim_ttl)
+    heartbeat = asyncio.create_task(_keep_flight_claimed(key)) if claimed else None
+    try:
+        return await func()
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+            await shared_storage.release_flight(key)
+
+
+async def run_single_flight(
+    key: str, func: Callable[[], Any], shared: bool = True
+) -> Any:
+    """Run `func()` once for all concurrent callers with the same key.
+
+    The first caller starts a task, the others await the same task. The task is
+    shielded, so a cancelled caller does not cancel the work of the others.
+    With SINGLE_FLIGHT_SHARED, callers in other workers wait for the first one
+    unless `shared` is False, e.g. when the result is not cached and waiting
+    would not save the computation.
+    """
+    task = _single_flights.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_lead_single_flight(key, func, shared))
+        _single_flights[key] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            if _single_flights.get(key) is finished:
+                del _single_flights[key]
+            if not finished.cancelled():
+                # Avoid "exception was never retrieved" once all callers left
+                finished.exception()
+
+        task.add_done_callback(_done)
+    else:
+        logger.debug(f"Joining in-flight call {key}")
+    return await asyncio.shield(task)
+
+
+def single_flight(
+    key_func: Callable[[dict[str, Any]], str | None], cache_arg: str = "hashing_kv"
+):
+    """Coalesce concurrent calls of an async function with the same key.
+
+    `key_func` receives the bound arguments of a call by name and returns the
+    key, or None for calls that must not be shared (e.g. streamed responses).
+    Calls only wait across workers when the LLM cache passed as `cache_arg`
+    is enabled, since the other worker hands over its result through it.
+    """
+
+    def final_decro(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wait_func(*args, **kwargs):
+            key = None
+            if SINGLE_FLIGHT_ENABLED:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = key_func(bound.arguments)
+            if key is None:
+                return await func(*args, **kwargs)
+            hashing_kv = bound.arguments.get(cache_arg)
+            return await run_single_flight(
+                f"{func.__name__}:{key}",
+                lambda: func(*args, **kwargs),
+                shared=hashing_kv is not None
+                and bool(hashing_kv.global_config.get("enable_llm_cache")),
+            )
+
+        return wait_func
+
+    return final_decro
+
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_search_text(text: str) -> str:
+    """Lowercase, strip Vietnamese diacritics and punctuation, collapse spaces.
+
+    Used to match query text against entity names and chunk contents.
+    """
+    text = unicodedata.normalize("NFD", str(text).replace("đ", "d").replace("Đ", "D"))
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def edge_weight(edge_data: dict[str, Any] | None) -> float:
+    """Weight of a graph edge, 0.0 when the edge or its weight is missing.
+
+    GraphML and SQL backends may return the weight as a string.
+    """
+    try:
+        return float((edge_data or {}).get("weight", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
 def wrap_embedding_func_with_attrs(**kwargs):
     """Wrap a function with attributes"""
 
@@ -312,6 +636,33 @@ def count_token_of_text(text: str | list[str], model_name: str = "gpt-4o") -> in
     else:
         raise TypeError("Input must be a string or list of strings.")
 
+# Token counts memoized by content hash, for texts without a stored count
+_token_count_cache: OrderedDict[bytes, int] = OrderedDict()
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", 100000))
+
+
+def count_tokens_cached(content: str) -> int:
+    """Number of tokens of a string, kept in a bounded LRU keyed by its md5"""
+    if not content:
+        return 0
+    key = md5(content.encode("utf-8")).digest()
+    count = _token_count_cache.get(key)
+    if count is not None:
+        _token_count_cache.move_to_end(key)
+        return count
+    count = len(encode_string_by_tiktoken(content))
+    _token_count_cache[key] = count
+    if len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+        _token_count_cache.popitem(last=False)
+    return count
+
+
+def with_description_tokens(data: dict[str, Any]) -> dict[str, Any]:
+    """Store the token count of a node or edge description next to it, see truncate_list_by_token_size"""
+    data["description_tokens"] = count_tokens_cached(data.get("description") or "")
+    return data
+
+
 def decode_tokens_by_tiktoken(tokens: list[int], model_name: str = "gpt-4o"):
     global ENCODER
     if ENCODER is None:
@@ -353,14 +704,33 @@ def is_float_regex(value: str) -> bool:
 
 
 def truncate_list_by_token_size(
-    list_data: list[Any], key: Callable[[Any], str], max_token_size: int
-) -> list[int]:
-    """Truncate a list of data by token size"""
+    list_data: list[Any],
+    key: Callable[[Any], str],
+    max_token_size: int,
+    token_count: Callable[[Any], int | str | None] | None = None,
+) -> list[Any]:
+    """Truncate a list of data by token size
+
+    `token_count` returns the token count stored with an item (a chunk's
+    `tokens`, a node's `description_tokens`), items without one are counted
+    from `key` through the token count cache.
+    """
     if max_token_size <= 0:
         return []
+
+    def _count(data: Any) -> int:
+        if token_count is not None:
+            stored = token_count(data)
+            if stored is not None and stored != "":
+                try:
+                    return int(stored)
+                except (TypeError, ValueError):
+                    pass
+        return count_tokens_cached(key(data))
+
     tokens = 0
     for i, data in enumerate(list_data):
-        tokens += len(encode_string_by_tiktoken(key(data)))
+        tokens += _count(data)
         if tokens > max_token_size:
             return list_data[:i]
     return list_data
@@ -514,40 +884,23 @@ async def get_best_cached_response(
     logger.debug(
         f"get_best_cached_response:  mode={mode} cache_type={cache_type} use_llm_check={use_llm_check}"
     )
+    # Read the version first, a write in between only causes a spare rebuild
+    version = await _get_mode_version(hashing_kv, mode)
     mode_cache = await hashing_kv.get_by_id(mode)
     if not mode_cache:
         return None
 
-    best_similarity = -1
-    best_response = None
-    best_prompt = None
-    best_cache_id = None
-
-    # Only iterate through cache entries for this mode
-    for cache_id, cache_data in mode_cache.items():
-        # Skip if cache_type doesn't match
-        if cache_type and cache_data.get("cache_type") != cache_type:
-            continue
-
-        if cache_data["embedding"] is None:
-            continue
-
-        # Convert cached embedding list to ndarray
-        cached_quantized = np.frombuffer(
-            bytes.fromhex(cache_data["embedding"]), dtype=np.uint8
-        ).reshape(cache_data["embedding_shape"])
-        cached_embedding = dequantize_embedding(
-            cached_quantized,
-            cache_data["embedding_min"],
-            cache_data["embedding_max"],
-        )
-
-        similarity = cosine_similarity(current_embedding, cached_embedding)
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_response = cache_data["return"]
-            best_prompt = cache_data["original_prompt"]
-            best_cache_id = cache_id
+    index = _get_semantic_cache_index(hashing_kv.namespace, mode, cache_type)
+    index.sync(mode_cache, version)
+    cache_manager = get_llm_cache_manager(hashing_kv)
+    best_cache_id, best_similarity = index.best_match(
+        current_embedding,
+        not_before=cache_manager.not_before(cache_type) if cache_manager else 0.0,
+    )
+    if best_cache_id is None or best_cache_id not in mode_cache:
+        return None
+    best_response = mode_cache[best_cache_id]["return"]
+    best_prompt = mode_cache[best_cache_id]["original_prompt"]
 
     if best_similarity > similarity_threshold:
         # If LLM check is enabled and all required parameters are provided
@@ -602,10 +955,484 @@ async def get_best_cached_response(
             "original_prompt": prompt_display,
         }
         logger.debug(json.dumps(log_data, ensure_ascii=False))
+        if cache_manager:
+            cache_manager.touch(mode, best_cache_id, cache_type)
         return best_response
     return None
 
 
+class _ModeCacheIndex:
+    """Index derived from the entries of one LLM cache mode.
+
+    `source_version` is the version of the mode cache the index matches, -1
+    until built; subclasses rebuild in `sync` when the cache moved on.
+    """
+
+    source_version: int = -1
+
+    def follow_write(
+        self, version_before: int | None, version_after: int | None, size_delta: int
+    ) -> None:
+        """Advance the version after a write of this process applied to the rows.
+
+        With a write counter the index stays in sync only if no other write
+        happened between the two reads; without one the entry count moves by
+        `size_delta`.
+        """
+        if self.source_version < 0:
+            return
+        if version_before is None or version_after is None:
+            self.source_version += size_delta
+        elif self.source_version != version_before:
+            return
+        elif version_after == version_before + 1:
+            self.source_version = version_after
+        elif version_after != version_before:
+            self.source_version = -1
+
+
+class SemanticCacheIndex(_ModeCacheIndex):
+    """In-memory matrix of the quantized embeddings cached for one (mode, cache_type).
+
+    Rows hold the uint8 codes with their per-row min/max, so the cosine
+    similarity with a query is computed for every entry with one
+    matrix-vector product instead of dequantizing entries one by one:
+
+        x = codes * scale + min,  scale = (max - min) / 255
+        q . x = scale * (codes @ q) + min * sum(q)
+
+    The dequantized norms are computed once per row. The index remembers
+    the version of the mode cache it was built from, the write counter of
+    storages with `get_mode_version`, else the number of entries, and is
+    rebuilt when the cache moved on behind its back (another process wrote,
+    or the cache was cleared). Writes of this process are applied to the
+    rows directly and advance the remembered version.
+    """
+
+    # Rows upcast to float per matrix-vector product, bounds the temporary memory
+    BLOCK_ROWS = 8192
+
+    def __init__(self, cache_type: str | None):
+        self.cache_type = cache_type
+        self._reset()
+
+    def _reset(self) -> None:
+        # Version of the mode cache the rows match, -1 until built
+        self.source_version = -1
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._codes: np.ndarray | None = None
+        self._mins = np.empty(0, dtype=np.float32)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._created = np.empty(0, dtype=np.float64)
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        capacity = 0 if self._codes is None else len(self._codes)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 64)
+        codes = np.zeros((capacity, dim), dtype=np.uint8)
+        mins = np.zeros(capacity, dtype=np.float32)
+        scales = np.zeros(capacity, dtype=np.float32)
+        norms = np.zeros(capacity, dtype=np.float32)
+        created = np.zeros(capacity, dtype=np.float64)
+        n = len(self._ids)
+        if self._codes is not None:
+            codes[:n] = self._codes[:n]
+            mins[:n] = self._mins[:n]
+            scales[:n] = self._scales[:n]
+            norms[:n] = self._norms[:n]
+            created[:n] = self._created[:n]
+        self._codes, self._mins, self._scales = codes, mins, scales
+        self._norms, self._created = norms, created
+
+    def add(self, cache_id: str, entry: dict[str, Any]) -> None:
+        if entry.get("embedding") is None:
+            return
+        if self.cache_type and entry.get("cache_type") != self.cache_type:
+            return
+        codes = np.frombuffer(bytes.fromhex(entry["embedding"]), dtype=np.uint8)
+        if self._codes is not None and codes.shape[0] != self._codes.shape[1]:
+            # Embedding model changed, entries of the other size cannot match
+            return
+        min_val = float(entry["embedding_min"])
+        scale = (float(entry["embedding_max"]) - min_val) / 255
+        # ||codes * scale + min||, without materializing the dequantized vector
+        codes_f = codes.astype(np.float32)
+        norm = np.sqrt(
+            scale * scale * float(codes_f @ codes_f)
+            + 2 * scale * min_val * float(codes_f.sum())
+            + codes.shape[0] * min_val * min_val
+        )
+        row = self._rows.get(cache_id)
+        if row is None:
+            row = len(self._ids)
+            self._reserve(row + 1, codes.shape[0])
+            self._ids.append(cache_id)
+            self._rows[cache_id] = row
+        self._codes[row] = codes
+        self._mins[row] = min_val
+        self._scales[row] = scale
+        self._norms[row] = norm
+        # Entries written before create_time was stored count from now on
+        self._created[row] = entry.get("create_time") or time.time()
+
+    def __contains__(self, cache_id: str) -> bool:
+        return cache_id in self._rows
+
+    def remove(self, cache_id: str) -> bool:
+        """Drop an entry deleted from the cache, moving the last row into its slot"""
+        row = self._rows.pop(cache_id, None)
+        if row is None:
+            return False
+        last = len(self._ids) - 1
+        if row != last:
+            last_id = self._ids[last]
+            self._ids[row] = last_id
+            self._rows[last_id] = row
+            for array in (self._codes, self._mins, self._scales, self._norms, self._created):
+                array[row] = array[last]
+        self._ids.pop()
+        return True
+
+    def sync(self, mode_cache: dict[str, Any], version: int | None = None) -> None:
+        """Rebuild from the mode cache if it changed behind the index's back.
+
+        `version` is the write counter of the mode read before `mode_cache`,
+        None if the storage has none and the entry count stands in for it.
+        """
+        source_version = len(mode_cache) if version is None else version
+        if source_version == self.source_version:
+            return
+        self._reset()
+        for cache_id, entry in mode_cache.items():
+            self.add(cache_id, entry)
+        self.source_version = source_version
+
+    def best_match(
+        self, embedding: np.ndarray, not_before: float = 0.0
+    ) -> tuple[str | None, float]:
+        """Return the most similar entry created at or after `not_before`"""
+        n = len(self._ids)
+        if not n:
+            return None, -1.0
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self._codes.shape[1]:
+            return None, -1.0
+        dots = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, n)
+            dots[start:end] = self._codes[start:end] @ query
+        dots = self._scales[:n] * dots + self._mins[:n] * query.sum()
+        denominators = self._norms[:n] * np.linalg.norm(query)
+        similarities = np.divide(
+            dots,
+            denominators,
+            out=np.full(n, -1.0, dtype=np.float32),
+            where=denominators > 0,
+        )
+        if not_before:
+            # Expired entries are never returned, the cache manager deletes them
+            similarities[self._created[:n] < not_before] = -1.0
+        best = int(np.argmax(similarities))
+        return self._ids[best], float(similarities[best])
+
+
+# (namespace, mode, cache_type) -> index, per process
+_semantic_cache_indexes: dict[tuple[str, str, str | None], SemanticCacheIndex] = {}
+
+
+def _get_semantic_cache_index(
+    namespace: str, mode: str, cache_type: str | None
+) -> SemanticCacheIndex:
+    key = (namespace, mode, cache_type)
+    if key not in _semantic_cache_indexes:
+        _semantic_cache_indexes[key] = SemanticCacheIndex(cache_type)
+    return _semantic_cache_indexes[key]
+
+
+def _semantic_cache_indexes_of(namespace: str, mode: str) -> list[SemanticCacheIndex]:
+    return [
+        index
+        for (index_namespace, index_mode, _), index in _semantic_cache_indexes.items()
+        if index_namespace == namespace and index_mode == mode
+    ]
+
+
+def _mode_cache_indexes_of(namespace: str, mode: str) -> list[_ModeCacheIndex]:
+    indexes: list[_ModeCacheIndex] = _semantic_cache_indexes_of(namespace, mode)
+    if dependency_index := _query_cache_dependency_indexes.get((namespace, mode)):
+        indexes.append(dependency_index)
+    return indexes
+
+
+async def _get_mode_version(hashing_kv, mode: str) -> int | None:
+    if exists_func(hashing_kv, "get_mode_version"):
+        return await hashing_kv.get_mode_version(mode)
+    return None
+
+
+async def _delete_cache_entries(hashing_kv, mode: str, cache_ids: list[str]) -> None:
+    """Delete entries of a cache mode and drop them from its semantic indexes"""
+    version_before = await _get_mode_version(hashing_kv, mode)
+    await hashing_kv.delete_by_mode_and_ids(mode, cache_ids)
+    version_after = await _get_mode_version(hashing_kv, mode)
+    for index in _mode_cache_indexes_of(hashing_kv.namespace, mode):
+        removed = sum(index.remove(cache_id) for cache_id in cache_ids)
+        index.follow_write(version_before, version_after, -removed)
+
+
+def invalidate_semantic_cache_index(
+    namespace: str, modes: list[str] | None = None
+) -> None:
+    """Drop the semantic cache indexes of a cache namespace, or only of some modes"""
+    for key in list(_semantic_cache_indexes):
+        if key[0] == namespace and (modes is None or key[1] in modes):
+            del _semantic_cache_indexes[key]
+
+
+LLM_CACHE_MODES = ["default", "naive", "local", "global", "hybrid", "mix"]
+
+
+def cache_entry_type(mode: str, entry: dict[str, Any]) -> str:
+    """cache_type of a cache entry, guessed from the mode for backends that do not store it"""
+    return entry.get("cache_type") or ("extract" if mode == "default" else "query")
+
+
+def _cache_entry_size(entry: dict[str, Any]) -> int:
+    """Approximate size of a cache entry, the length of its stored strings"""
+    return sum(
+        len(value)
+        for value in (entry.get(f) for f in ("return", "original_prompt", "embedding"))
+        if isinstance(value, str)
+    )
+
+
+class LLMCacheManager:
+    """Bounds the LLM response cache of one namespace per cache_type.
+
+    Configured by `llm_cache_config` in the global config, one section per
+    cache_type ("query", "keywords", "extract") with:
+
+    - max_entries: entries kept for the type, 0 for no limit
+    - max_bytes: approximate size kept for the type, 0 for no limit
+    - ttl: seconds an entry is served, 0 to keep it forever
+
+    and "eviction_policy" ("lru" or "lfu") to pick what goes when a limit is
+    exceeded. The entry list is loaded from the cache once per process and
+    then kept in step by save_to_cache, access times and hit counts are per
+    process. Evicting goes down to `low_watermark` of the limit so that a
+    full cache does not evict on every save.
+
+    Eviction deletes through `delete_by_mode_and_ids`, backends without it
+    only get the TTL check on reads.
+    """
+
+    def __init__(self, config: dict[str, Any]):
+        self.policy = str(config.get("eviction_policy", "lru")).lower()
+        if self.policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown LLM cache eviction policy: {self.policy}")
+        self.low_watermark = float(config.get("low_watermark", 0.9))
+        self.limits: dict[str, dict[str, float]] = {
+            cache_type: {
+                "max_entries": int(section.get("max_entries", 0) or 0),
+                "max_bytes": int(section.get("max_bytes", 0) or 0),
+                "ttl": float(section.get("ttl", 0) or 0),
+            }
+            for cache_type, section in config.items()
+            if isinstance(section, dict)
+        }
+        # cache_type -> (mode, id) -> [size, created, last_access, hits]
+        self._entries: dict[str, dict[tuple[str, str], list[float]]] = {}
+        self._bytes: dict[str, int] = {}
+        self.stats: dict[str, dict[str, int]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _limit(self, cache_type: str, name: str) -> float:
+        return self.limits.get(cache_type, {}).get(name, 0)
+
+    def _count(self, cache_type: str, counter: str, n: int = 1) -> None:
+        stats = self.stats.setdefault(
+            cache_type, {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        )
+        stats[counter] += n
+
+    def _bounded(self) -> bool:
+        return any(
+            limits["max_entries"] or limits["max_bytes"]
+            for limits in self.limits.values()
+        )
+
+    def not_before(self, cache_type: str | None) -> float:
+        """Creation time from which entries of the type are still fresh"""
+        ttl = self._limit(cache_type, "ttl") if cache_type else 0
+        return time.time() - ttl if ttl else 0.0
+
+    def is_expired(self, mode: str, cache_id: str, entry: dict[str, Any]) -> bool:
+        cache_type = cache_entry_type(mode, entry)
+        ttl = self._limit(cache_type, "ttl")
+        if not ttl:
+            return False
+        record = self._entries.get(cache_type, {}).get((mode, cache_id))
+        created = entry.get("create_time") or (record[1] if record else None)
+        if created is None:
+            # Legacy entry seen for the first time, its TTL starts now
+            self._track(mode, cache_id, entry)
+            return False
+        return created < time.time() - ttl
+
+    def _track(self, mode: str, cache_id: str, entry: dict[str, Any]) -> None:
+        cache_type = cache_entry_type(mode, entry)
+        entries = self._entries.setdefault(cache_type, {})
+        size = _cache_entry_size(entry)
+        old = entries.get((mode, cache_id))
+        now = time.time()
+        if old is not None:
+            self._bytes[cache_type] -= int(old[0])
+            old[0] = size
+            old[1] = entry.get("create_time") or old[1]
+        else:
+            entries[(mode, cache_id)] = [size, entry.get("create_time") or now, now, 0]
+        self._bytes[cache_type] = self._bytes.get(cache_type, 0) + size
+
+    def touch(self, mode: str, cache_id: str, cache_type: str | None) -> None:
+        """Record a cache hit"""
+        self._count(cache_type or "query", "hits")
+        for entries in self._entries.values():
+            record = entries.get((mode, cache_id))
+            if record is not None:
+                record[2] = time.time()
+                record[3] += 1
+                return
+
+    def miss(self, cache_type: str | None) -> None:
+        self._count(cache_type or "query", "misses")
+
+    def forget(self, keys: list[tuple[str, str]]) -> None:
+        """Stop tracking entries deleted from the cache"""
+        for cache_type, entries in self._entries.items():
+            for key in keys:
+                record = entries.pop(key, None)
+                if record is not None:
+                    self._bytes[cache_type] -= int(record[0])
+
+    def forget_modes(self, modes: list[str] | None) -> None:
+        for entries in self._entries.values():
+            self.forget([key for key in entries if modes is None or key[0] in modes])
+
+    async def _load(self, hashing_kv) -> None:
+        for mode in LLM_CACHE_MODES:
+            mode_cache = await hashing_kv.get_by_id(mode)
+            if not isinstance(mode_cache, dict):
+                continue
+            for cache_id, entry in mode_cache.items():
+                if isinstance(entry, dict) and "return" in entry:
+                    self._track(mode, cache_id, entry)
+        self._loaded = True
+
+    async def record_save(
+        self, hashing_kv, mode: str, cache_id: str, entry: dict[str, Any]
+    ) -> None:
+        """Track a new entry and evict from its type if a limit is exceeded"""
+        if not self._bounded():
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self._load(hashing_kv)
+            self._track(mode, cache_id, entry)
+            cache_type = cache_entry_type(mode, entry)
+            victims = self._select_victims(cache_type)
+        if victims:
+            await self.delete(hashing_kv, victims, "evictions", cache_type)
+
+    def _select_victims(self, cache_type: str) -> list[tuple[str, str]]:
+        entries = self._entries.get(cache_type, {})
+        max_entries = self._limit(cache_type, "max_entries")
+        max_bytes = self._limit(cache_type, "max_bytes")
+        if not (
+            (max_entries and len(entries) > max_entries)
+            or (max_bytes and self._bytes.get(cache_type, 0) > max_bytes)
+        ):
+            return []
+
+        # Expired entries go first, then by last access (LRU) or hit count (LFU)
+        expired_before = self.not_before(cache_type)
+        if self.policy == "lfu":
+            order = lambda item: (item[1][1] >= expired_before, item[1][3], item[1][2])  # noqa: E731
+        else:
+            order = lambda item: (item[1][1] >= expired_before, item[1][2])  # noqa: E731
+        target_entries = int(max_entries * self.low_watermark) if max_entries else None
+        target_bytes = int(max_bytes * self.low_watermark) if max_bytes else None
+        count, size = len(entries), self._bytes.get(cache_type, 0)
+        victims = []
+        for key, record in sorted(entries.items(), key=order):
+            if (target_entries is None or count <= target_entries) and (
+                target_bytes is None or size <= target_bytes
+            ):
+                break
+            victims.append(key)
+            count -= 1
+            size -= int(record[0])
+        return victims
+
+    async def delete(
+        self,
+        hashing_kv,
+        keys: list[tuple[str, str]],
+        counter: str,
+        cache_type: str,
+    ) -> None:
+        """Delete (mode, id) entries from the cache storage"""
+        if not exists_func(hashing_kv, "delete_by_mode_and_ids"):
+            return
+        by_mode: dict[str, list[str]] = {}
+        for mode, cache_id in keys:
+            by_mode.setdefault(mode, []).append(cache_id)
+        for mode, cache_ids in by_mode.items():
+            await _delete_cache_entries(hashing_kv, mode, cache_ids)
+        self.forget(keys)
+        self._count(cache_type, counter, len(keys))
+        if counter == "evictions":
+            logger.info(
+                f"Evicted {len(keys)} {cache_type} entries from {hashing_kv.namespace} "
+                f"({self.policy}, {len(self._entries.get(cache_type, {}))} kept)"
+            )
+
+    def get_stats(self) -> dict[str, dict[str, int]]:
+        """Hit/miss/eviction counters and current size per cache_type"""
+        result = {}
+        for cache_type in set(self.stats) | set(self._entries):
+            result[cache_type] = {
+                "hits": 0,
+                "misses": 0,
+                "evictions": 0,
+                "expired": 0,
+                **self.stats.get(cache_type, {}),
+                "entries": len(self._entries.get(cache_type, {})),
+                "bytes": self._bytes.get(cache_type, 0),
+            }
+        return result
+
+
+# namespace -> manager, per process
+_llm_cache_managers: dict[str, LLMCacheManager] = {}
+
+
+def get_llm_cache_manager(hashing_kv) -> LLMCacheManager | None:
+    """Cache manager of a cache storage, None when llm_cache_config is not set"""
+    if hashing_kv is None:
+        return None
+    config = getattr(hashing_kv, "global_config", {}).get("llm_cache_config")
+    if not config:
+        return None
+    manager = _llm_cache_managers.get(hashing_kv.namespace)
+    if manager is None:
+        manager = _llm_cache_managers[hashing_kv.namespace] = LLMCacheManager(config)
+    return manager
+
+
 def cosine_similarity(v1, v2):
     """Calculate cosine similarity between two vectors"""
     dot_product = np.dot(v1, v2)
@@ -684,6 +1511,8 @@ async def handle_cache(
             else:
                 # if caching keyword embedding is enabled, return the quantized embedding for saving it latter
                 logger.info(f"Embedding cached missed(mode:{mode} type:{cache_type})")
+                if cache_manager := get_llm_cache_manager(hashing_kv):
+                    cache_manager.miss(cache_type)
                 return None, quantized, min_val, max_val
 
     # For default mode or is_embedding_cache_enabled is False, use regular cache
@@ -692,11 +1521,26 @@ async def handle_cache(
         mode_cache = await hashing_kv.get_by_mode_and_id(mode, args_hash) or {}
     else:
         mode_cache = await hashing_kv.get_by_id(mode) or {}
+    cache_manager = get_llm_cache_manager(hashing_kv)
     if args_hash in mode_cache:
-        logger.info(f"Non-embedding cached hit(mode:{mode} type:{cache_type})")
-        return mode_cache[args_hash]["return"], None, None, None
+        entry = mode_cache[args_hash]
+        if cache_manager and cache_manager.is_expired(mode, args_hash, entry):
+            logger.info(f"Cache entry expired(mode:{mode} type:{cache_type})")
+            await cache_manager.delete(
+                hashing_kv,
+                [(mode, args_hash)],
+                "expired",
+                cache_entry_type(mode, entry),
+            )
+        else:
+            logger.info(f"Non-embedding cached hit(mode:{mode} type:{cache_type})")
+            if cache_manager:
+                cache_manager.touch(mode, args_hash, cache_type)
+            return entry["return"], None, None, None
 
     logger.info(f"Non-embedding cached missed(mode:{mode} type:{cache_type})")
+    if cache_manager:
+        cache_manager.miss(cache_type)
     return None, None, None, None
 
 
@@ -710,6 +1554,216 @@ class CacheData:
     max_val: float | None = None
     mode: str = "default"
     cache_type: str = "query"
+    dependencies: dict[str, set[str]] | None = None
+
+
+# Entities and chunks the context of the running query was built from
+_cache_dependencies: ContextVar[dict[str, set[str]] | None] = ContextVar(
+    "cache_dependencies", default=None
+)
+
+
+def start_cache_dependencies() -> dict[str, set[str]]:
+    """Start recording the graph and chunk records read by the current query.
+
+    The returned dict is filled by record_cache_dependencies while the
+    context is built, including from tasks started afterwards, and is saved
+    with the answer so that invalidate_query_cache can find it.
+    """
+    dependencies: dict[str, set[str]] = {"entities": set(), "chunks": set()}
+    _cache_dependencies.set(dependencies)
+    return dependencies
+
+
+def record_cache_dependencies(
+    entities: Iterable[str] = (), chunks: Iterable[str] = ()
+) -> None:
+    dependencies = _cache_dependencies.get()
+    if dependencies is None:
+        return
+    dependencies["entities"].update(entities)
+    dependencies["chunks"].update(chunks)
+
+
+def _depends_on(entry: dict[str, Any], entities: set[str], chunks: set[str]) -> bool:
+    dependencies = entry.get("dependencies")
+    if not dependencies:
+        # Cached before dependencies were recorded, or by a backend dropping them
+        return True
+    entry_entities = dependencies.get("entities") or ()
+    entry_chunks = dependencies.get("chunks") or ()
+    if not entry_entities and not entry_chunks:
+        # Answered without context, new records may answer it now
+        return True
+    return not entities.isdisjoint(entry_entities) or not chunks.isdisjoint(
+        entry_chunks
+    )
+
+
+class QueryCacheDependencyIndex(_ModeCacheIndex):
+    """Reverse index from entities and chunks to the cached answers of one
+    mode whose context used them, so invalidation only touches the affected
+    entries instead of reading every answer of the mode.
+
+    Answers cached without recorded dependencies depend on every record. The
+    index follows the write counter of the mode like SemanticCacheIndex;
+    without one it is rebuilt on every sync.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self) -> None:
+        self.source_version = -1
+        # (kind, record id) -> ids of the answers that used the record
+        self._dependents: dict[tuple[str, str], set[str]] = {}
+        self._unconditional: set[str] = set()
+        self._keys: dict[str, list[tuple[str, str]]] = {}
+
+    def add(self, mode: str, cache_id: str, entry: Any) -> None:
+        self.remove(cache_id)
+        if not isinstance(entry, dict) or cache_entry_type(mode, entry) != "query":
+            return
+        dependencies = entry.get("dependencies") or {}
+        keys = [
+            (kind, record_id)
+            for kind in ("entities", "chunks")
+            for record_id in dependencies.get(kind) or ()
+        ]
+        self._keys[cache_id] = keys
+        if not keys:
+            self._unconditional.add(cache_id)
+        for key in keys:
+            self._dependents.setdefault(key, set()).add(cache_id)
+
+    def remove(self, cache_id: str) -> bool:
+        keys = self._keys.pop(cache_id, None)
+        if keys is None:
+            return False
+        self._unconditional.discard(cache_id)
+        for key in keys:
+            cache_ids = self._dependents.get(key)
+            if cache_ids is not None:
+                cache_ids.discard(cache_id)
+                if not cache_ids:
+                    del self._dependents[key]
+        return True
+
+    def sync(self, mode: str, mode_cache: dict[str, Any], version: int | None) -> None:
+        """Rebuild from the mode cache read after `version`"""
+        self._reset()
+        for cache_id, entry in mode_cache.items():
+            self.add(mode, cache_id, entry)
+        self.source_version = -1 if version is None else version
+
+    def dependents(self, entities: set[str], chunks: set[str]) -> set[str]:
+        """Ids of the answers depending on any of the records"""
+        result = set(self._unconditional)
+        for kind, record_ids in (("entities", entities), ("chunks", chunks)):
+            for record_id in record_ids:
+                result.update(self._dependents.get((kind, record_id), ()))
+        return result
+
+
+# (namespace, mode) -> index, per process
+_query_cache_dependency_indexes: dict[tuple[str, str], QueryCacheDependencyIndex] = {}
+
+
+def _get_query_cache_dependency_index(
+    namespace: str, mode: str
+) -> QueryCacheDependencyIndex:
+    key = (namespace, mode)
+    if key not in _query_cache_dependency_indexes:
+        _query_cache_dependency_indexes[key] = QueryCacheDependencyIndex()
+    return _query_cache_dependency_indexes[key]
+
+
+async def invalidate_query_cache(
+    hashing_kv, entities: Iterable[str] = (), chunks: Iterable[str] = ()
+) -> int:
+    """Delete the cached query answers whose context used any of the given records.
+
+    Keyword and extraction entries do not depend on the graph and are kept.
+    Returns the number of answers deleted.
+    """
+    entities, chunks = set(entities), set(chunks)
+    if hashing_kv is None or not (entities or chunks):
+        return 0
+    try:
+        return await _invalidate_query_cache(hashing_kv, entities, chunks)
+    except Exception as e:
+        logger.error(f"Failed to invalidate the query cache: {e}")
+        return 0
+
+
+async def _invalidate_query_cache(
+    hashing_kv, entities: set[str], chunks: set[str]
+) -> int:
+    query_modes = [mode for mode in LLM_CACHE_MODES if mode != "default"]
+    cache_manager = get_llm_cache_manager(hashing_kv)
+    if not exists_func(hashing_kv, "delete_by_mode_and_ids"):
+        return await _rewrite_query_cache(
+            hashing_kv, query_modes, entities, chunks, cache_manager
+        )
+
+    invalidated = 0
+    for mode in query_modes:
+        index = _get_query_cache_dependency_index(hashing_kv.namespace, mode)
+        version = await _get_mode_version(hashing_kv, mode)
+        if version is None or version != index.source_version:
+            mode_cache = await hashing_kv.get_by_id(mode)
+            index.sync(mode, mode_cache if isinstance(mode_cache, dict) else {}, version)
+        stale = sorted(index.dependents(entities, chunks))
+        if not stale:
+            continue
+        await _delete_cache_entries(hashing_kv, mode, stale)
+        if cache_manager:
+            cache_manager.forget([(mode, cache_id) for cache_id in stale])
+        invalidated += len(stale)
+    logger.info(
+        f"Invalidated {invalidated} cached answers depending on "
+        f"{len(entities)} entities and {len(chunks)} chunks"
+    )
+    return invalidated
+
+
+async def _rewrite_query_cache(
+    hashing_kv,
+    query_modes: list[str],
+    entities: set[str],
+    chunks: set[str],
+    cache_manager,
+) -> int:
+    """Invalidate on backends that cannot delete single entries: write each
+    affected mode back without its stale answers, keywords are kept"""
+    invalidated = 0
+    for mode in query_modes:
+        mode_cache = await hashing_kv.get_by_id(mode)
+        if not isinstance(mode_cache, dict):
+            continue
+        stale = [
+            cache_id
+            for cache_id, entry in mode_cache.items()
+            if isinstance(entry, dict)
+            and cache_entry_type(mode, entry) == "query"
+            and _depends_on(entry, entities, chunks)
+        ]
+        if not stale:
+            continue
+        stale_ids = set(stale)
+        kept = {k: v for k, v in mode_cache.items() if k not in stale_ids}
+        await hashing_kv.delete([mode])
+        if kept:
+            await hashing_kv.upsert({mode: kept})
+        invalidate_semantic_cache_index(hashing_kv.namespace, [mode])
+        if cache_manager:
+            cache_manager.forget([(mode, cache_id) for cache_id in stale])
+        invalidated += len(stale)
+    logger.info(
+        f"Invalidated {invalidated} cached answers depending on "
+        f"{len(entities)} entities and {len(chunks)} chunks"
+    )
+    return invalidated
 
 
 async def save_to_cache(hashing_kv, cache_data: CacheData):
@@ -724,6 +1778,7 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
     else:
         mode_cache = await hashing_kv.get_by_id(cache_data.mode) or {}
 
+    is_new_entry = cache_data.args_hash not in mode_cache
     mode_cache[cache_data.args_hash] = {
         "return": cache_data.content,
         "cache_type": cache_data.cache_type,
@@ -736,10 +1791,83 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
         "embedding_min": cache_data.min_val,
         "embedding_max": cache_data.max_val,
         "original_prompt": cache_data.prompt,
+        "create_time": int(time.time()),
     }
+    if cache_data.dependencies is not None:
+        mode_cache[cache_data.args_hash]["dependencies"] = {
+            kind: sorted(ids) for kind, ids in cache_data.dependencies.items()
+        }
 
+    version_before = await _get_mode_version(hashing_kv, cache_data.mode)
     await hashing_kv.upsert({cache_data.mode: mode_cache})
 
+    version_after = await _get_mode_version(hashing_kv, cache_data.mode)
+    entry = mode_cache[cache_data.args_hash]
+    # Keep the versions in step so the next lookup does not rebuild
+    if cache_data.quantized is not None:
+        for index in _semantic_cache_indexes_of(hashing_kv.namespace, cache_data.mode):
+            index.add(cache_data.args_hash, entry)
+            index.follow_write(version_before, version_after, int(is_new_entry))
+    dependency_index = _query_cache_dependency_indexes.get(
+        (hashing_kv.namespace, cache_data.mode)
+    )
+    if dependency_index is not None:
+        dependency_index.add(cache_data.mode, cache_data.args_hash, entry)
+        dependency_index.follow_write(version_before, version_after, int(is_new_entry))
+
+    if cache_manager := get_llm_cache_manager(hashing_kv):
+        await cache_manager.record_save(
+            hashing_kv,
+            cache_data.mode,
+            cache_data.args_hash,
+            mode_cache[cache_data.args_hash],
+        )
+
+
+async def cache_answer(
+    hashing_kv, cache_data: CacheData
+) -> str | AsyncIterator[str]:
+    """Save a query answer to the cache and return it to the caller.
+
+    A streamed answer is returned wrapped in `tee_stream_to_cache`, so the
+    client still gets the tokens as they come and the answer is cached once
+    it has been read to the end.
+    """
+    if hasattr(cache_data.content, "__aiter__"):
+        return tee_stream_to_cache(cache_data.content, hashing_kv, cache_data)
+    await save_to_cache(hashing_kv, cache_data)
+    return cache_data.content
+
+
+async def tee_stream_to_cache(
+    stream: AsyncIterator[str], hashing_kv, cache_data: CacheData
+) -> AsyncIterator[str]:
+    """Yield the chunks of a streamed answer, then cache the whole answer.
+
+    Nothing is cached when the stream fails or is not read to the end, e.g.
+    when the client disconnects.
+    """
+    parts = []
+    async for chunk in stream:
+        if isinstance(chunk, str):
+            parts.append(chunk)
+        yield chunk
+    answer = "".join(parts).strip()
+    if hashing_kv is None or not answer:
+        return
+    cache_data.content = answer
+    await save_to_cache(hashing_kv, cache_data)
+    # The query already flushed the cache before the stream was read
+    await hashing_kv.index_done_callback()
+
+
+async def replay_cached_answer(
+    answer: str, chunk_size: int = 64
+) -> AsyncIterator[str]:
+    """Stream a cached answer to callers that asked for a stream"""
+    for i in range(0, len(answer), chunk_size):
+        yield answer[i : i + chunk_size]
+
 
 def safe_unicode_decode(content):
     # Regular expression to find all Unicode escape sequences of the form \uXXXX
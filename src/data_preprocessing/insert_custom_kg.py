@@ -16,7 +16,8 @@ def create_custom_kg_for_batch(csv_file, batch_size: int = 100) -> list[Dict[str
         custom_kg = {
             "chunks": [],
             "entities": [],
-            "relationships": []
+            "relationships": [],
+            "attributes": []
         }
 
         for index, row in batch_df.iterrows():
@@ -47,6 +48,17 @@ def create_custom_kg_for_batch(csv_file, batch_size: int = 100) -> list[Dict[str
                 "source_id": source_id
             })
 
+            # Numeric facets, kept typed in the attribute store for range filters
+            custom_kg["attributes"].append({
+                "source_id": source_id,
+                "name": book_name,
+                "current_price": book_data["current_price"],
+                "original_price": book_data["original_price"],
+                "discount_rate": book_data["discount_rate"],
+                "rating_average": book_data["rating_average"],
+                "quantity_sold": book_data["quantity_sold"]
+            })
+
             # Create entities for each column
             entities = [
                 {
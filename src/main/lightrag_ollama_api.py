@@ -1,6 +1,7 @@
 import asyncio
 import os
 import logging
+import time
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from lightrag import LightRAG, QueryParam
@@ -93,6 +94,7 @@ async def initialize_rag():
         embedding_func=EmbeddingFunc(
             embedding_dim=768,
             max_token_size=8192,
+            model_name=EMBED_MODEL,
             func=lambda texts: ollama_embed(
                 texts, embed_model=EMBED_MODEL, host="http://localhost:11434"
             ),
@@ -141,22 +143,37 @@ async def insert_custom_kg(request: InsertCustomtRequest):
         # Create custom_kg batches
         custom_kgs, df = create_custom_kg_for_batch(request.path, batch_size=request.batch_size)
         total_batches = len(custom_kgs)
+        start_time = time.perf_counter()
         
         # Insert each batch into LightRAG
         for idx, custom_kg in enumerate(custom_kgs):
+            batch_start = time.perf_counter()
             try:
                 await rag.ainsert_custom_kg(custom_kg)
-                logging.info(f"Successfully inserted batch {idx + 1}/{total_batches}")
+                batch_books = len(custom_kg["chunks"])
+                batch_time = time.perf_counter() - batch_start
+                logging.info(
+                    f"Successfully inserted batch {idx + 1}/{total_batches} "
+                    f"({batch_books / batch_time:.1f} books/sec)"
+                )
             except Exception as e:
                 logging.error(f"Failed to insert batch {idx + 1}: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Error inserting batch {idx + 1}: {str(e)}")
 
-        await rag.aclear_cache()
+        elapsed = time.perf_counter() - start_time
+        books_per_sec = len(df) / elapsed if elapsed else 0.0
+        logging.info(f"Inserted {len(df)} books in {elapsed:.2f}s ({books_per_sec:.1f} books/sec)")
+
+        # ainsert_custom_kg already dropped the cached answers built from the updated books
         is_just_updated_KG = True
         
         return JSONResponse(
             status_code=200,
-            content={"message": f"Successfully inserted {len(df)} books in {total_batches} batches"}
+            content={
+                "message": f"Successfully inserted {len(df)} books in {total_batches} batches",
+                "elapsed_seconds": round(elapsed, 2),
+                "books_per_sec": round(books_per_sec, 1),
+            }
         )
 
     except pd.errors.EmptyDataError:
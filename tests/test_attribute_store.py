@@ -0,0 +1,59 @@
+import pytest
+
+from lightrag.attribute_store import parse_facet_query
+
+
+@pytest.mark.parametrize(
+    "query, filters",
+    [
+        ("sách giá dưới 80000", {"current_price": (None, 80000.0)}),
+        ("gợi ý cho bạn sách dưới 100k", {"current_price": (None, 100000.0)}),
+        ("sách xuất bản dưới 50 nghìn", {"current_price": (None, 50000.0)}),
+        ("sách giảm giá dưới 50 nghìn", {"current_price": (None, 50000.0)}),
+        ("từ 50 đến 100 nghìn", {"current_price": (50000.0, 100000.0)}),
+        ("giảm giá trên 30%", {"discount_rate": (30.0, None)}),
+        ("đánh giá trên 4 sao", {"rating_average": (4.0, None)}),
+        ("sách có rating above 4", {"rating_average": (4.0, None)}),
+        ("sách đã bán trên 1000 cuốn", {"quantity_sold": (1000.0, None)}),
+        ("sách bán trên 500 bản", {"quantity_sold": (500.0, None)}),
+        (
+            "books under 100k VND rated above 4.5",
+            {"current_price": (None, 100000.0), "rating_average": (4.5, None)},
+        ),
+    ],
+)
+def test_bounds(query, filters):
+    facet = parse_facet_query(query)
+    assert facet is not None
+    assert facet.filters == filters
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        # A bare number says nothing about which attribute it bounds
+        "sách dưới 80000",
+        "truyện cho trẻ dưới 3 tuổi",
+        # "bàn" (desk) folds to the same letters as "bán" (sold)
+        "bàn học dưới 5",
+    ],
+)
+def test_unattributed_numbers_are_not_facets(query):
+    assert parse_facet_query(query) is None
+
+
+def test_pure_facet_query():
+    assert parse_facet_query("giảm giá trên 30%").pure
+    # Words left over after the facets still need retrieval
+    assert not parse_facet_query("sách xuất bản dưới 50 nghìn").pure
+
+
+def test_sort_and_limit():
+    facet = parse_facet_query("top 5 cheapest books")
+    assert facet.sort_by == "current_price"
+    assert not facet.descending
+    assert facet.limit == 5
+
+    facet = parse_facet_query("sách bán chạy nhất")
+    assert facet.sort_by == "quantity_sold"
+    assert facet.descending